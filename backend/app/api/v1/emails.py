@@ -1,20 +1,36 @@
 """Endpoints da API para submissão e listagem de emails."""
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query, Request, Header
+from fastapi.responses import StreamingResponse, Response, FileResponse
+from pydantic_core import to_json
 from sqlalchemy.orm import Session
-from typing import Optional
+from datetime import datetime
+from typing import List, Optional, Literal, Union
+import json
 
-from app.core.database import get_db_session
+from app.core.database import get_db_session, db_manager
+from app.core.events import event_broker
+from app.core.http_cache import build_etag, etag_matches, http_cache_metrics
+from app.core.responses import PydanticJSONResponse
 from app.schemas.email import (
     EmailSubmissionResponse, 
     EmailSubmissionList, 
+    EmailSubmissionSummaryList,
+    EmailFilters,
     TextEmailRequest, 
     DeleteEmailsRequest,
     DeleteEmailsResponse,
     EmailStatsResponse
 )
 from app.services.email_service import EmailService
+from app.services.idempotency_service import (
+    IdempotencyService,
+    IdempotencyKeyMismatchError,
+    IdempotencyKeyInProgressError
+)
+from app.utils.file_processor import FileProcessor
 from app.integrations.ai import OpenAIIntegration
 from app.repositories.email_repository import EmailRepository
+from app.repositories.idempotency_repository import IdempotencyRepository
 
 
 router = APIRouter()
@@ -22,6 +38,7 @@ router = APIRouter()
 @router.post("/text", response_model=EmailSubmissionResponse, status_code=status.HTTP_201_CREATED)
 async def submit_text_email(
     request: TextEmailRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
     db: Session = Depends(get_db_session)
 ):
     """
@@ -30,6 +47,9 @@ async def submit_text_email(
     Recebe JSON com:
     - email_title: título do email
     - content: conteúdo do email como texto direto
+    
+    Com o header `Idempotency-Key`, retentativas com a mesma chave recebem a
+    resposta original sem uma nova classificação.
     """
     try:
 
@@ -41,11 +61,28 @@ async def submit_text_email(
 
         email_repository = EmailRepository(db)
         service = EmailService(email_repository, OpenAIIntegration())
-        result = await service.submit_text_email(
-            email_title=request.email_title,
-            content=request.content.strip()
-        )
-        return result
+
+        async def submit():
+            return await service.submit_text_email(
+                email_title=request.email_title,
+                content=request.content.strip()
+            )
+
+        if idempotency_key:
+            fingerprint = IdempotencyService.fingerprint("text", request.email_title, request.content)
+            return await _run_idempotent(db, idempotency_key, fingerprint, submit)
+
+        return PydanticJSONResponse(await submit(), status_code=status.HTTP_201_CREATED)
+    except IdempotencyKeyMismatchError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        ) from e
+    except IdempotencyKeyInProgressError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        ) from e
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -63,6 +100,7 @@ async def submit_text_email(
 async def submit_file_email(
     email_title: str = Form(..., description="Título do email"),
     file: UploadFile = File(..., description="Arquivo .txt ou .pdf"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
     db: Session = Depends(get_db_session)
 ):
     """
@@ -71,6 +109,8 @@ async def submit_file_email(
     Parâmetros:
     - email_title: título do email
     - file: arquivo .txt ou .pdf contendo o conteúdo do email
+    
+    Aceita o header `Idempotency-Key`, como `POST /text`.
     """
     try:
         if not email_title:
@@ -78,11 +118,103 @@ async def submit_file_email(
             
         email_repository = EmailRepository(db)
         service = EmailService(email_repository, OpenAIIntegration())
-        result = await service.submit_file_email(
-            email_title=email_title,
-            file=file
+
+        async def submit():
+            return await service.submit_file_email(
+                email_title=email_title,
+                file=file
+            )
+
+        if idempotency_key:
+            FileProcessor.validate_file_size(file, max_size_mb=1)
+            file_content = file.file.read()
+            file.file.seek(0)
+            fingerprint = IdempotencyService.fingerprint("file", email_title, file.filename, file_content)
+            return await _run_idempotent(db, idempotency_key, fingerprint, submit)
+
+        return PydanticJSONResponse(await submit(), status_code=status.HTTP_201_CREATED)
+    except IdempotencyKeyMismatchError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        ) from e
+    except IdempotencyKeyInProgressError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        ) from e
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Dados inválidos: {str(e)}"
+        ) from e
+    except Exception as e:
+        print(f"Erro ao processar email: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Erro interno do servidor"
+        ) from e
+
+
+async def _run_idempotent(db: Session, idempotency_key: str, fingerprint: str, submit) -> Response:
+    """
+    Executa uma submissão no máximo uma vez por chave de idempotência.
+    
+    A resposta é serializada uma única vez (pelo pydantic-core); o mesmo JSON
+    é gravado na chave e enviado na primeira resposta e nas repetições.
+    """
+    async def operation():
+        result = await submit()
+        return status.HTTP_201_CREATED, to_json(result).decode("utf-8")
+
+    service = IdempotencyService(IdempotencyRepository(db))
+    status_code, body, replayed = await service.run(idempotency_key, fingerprint, operation)
+    headers = {"Idempotent-Replayed": "true"} if replayed else None
+    return Response(content=body, status_code=status_code, headers=headers, media_type="application/json")
+
+
+@router.post("/text/stream", status_code=status.HTTP_200_OK)
+async def submit_text_email_stream(request: TextEmailRequest):
+    """
+    Variante em streaming (Server-Sent Events) de `POST /text`.
+    
+    Eventos emitidos:
+    - classification: categoria definida pela IA, assim que decodificada
+    - reply_delta: trechos da sugestão de resposta conforme são gerados
+    - submission: submissão salva, ao final
+    - error: falha no processamento
+    """
+    if not request.email_title or not request.content or not request.content.strip():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Dados inválidos: Título e conteúdo são obrigatórios"
+        )
+
+    return _stream_submission_response(
+        lambda service: service.stream_text_email(
+            email_title=request.email_title,
+            content=request.content.strip()
         )
-        return result
+    )
+
+
+@router.post("/file/stream", status_code=status.HTTP_200_OK)
+async def submit_file_email_stream(
+    email_title: str = Form(..., description="Título do email"),
+    file: UploadFile = File(..., description="Arquivo .txt ou .pdf")
+):
+    """
+    Variante em streaming (Server-Sent Events) de `POST /file`.
+    
+    O arquivo é validado e lido antes do início do stream; os eventos são os
+    mesmos de `POST /text/stream`.
+    """
+    try:
+        if not email_title:
+            raise ValueError("Título é obrigatório")
+
+        email_data, message_content = EmailService.extract_file_email(email_title, file)
+        file_data = await EmailService.read_original_file(file)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -95,15 +227,88 @@ async def submit_file_email(
             detail="Erro interno do servidor"
         ) from e
 
+    return _stream_submission_response(
+        lambda service: service.stream_submission(email_data, message_content, file_data=file_data)
+    )
+
 
-@router.get("/", response_model=EmailSubmissionList, status_code=status.HTTP_200_OK)
+def _stream_submission_response(build_events) -> StreamingResponse:
+    """
+    Monta a resposta SSE de uma submissão em streaming.
+    
+    A sessão de banco é aberta dentro do stream, pois ela precisa continuar
+    válida até a submissão ser salva, depois que a resposta já começou.
+    """
+    async def event_stream():
+        db = db_manager.SessionLocal()
+        try:
+            service = EmailService(EmailRepository(db), OpenAIIntegration())
+            async for event in build_events(service):
+                yield f"event: {event['event']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            print(f"Erro ao processar email em streaming: {str(e)}")
+            error = {"event": "error", "detail": "Erro interno do servidor"}
+            yield f"event: error\ndata: {json.dumps(error, ensure_ascii=False)}\n\n"
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
+def get_email_filters(
+    email_title: Optional[str] = Query(None, description="Filtro por título do email"),
+    ai_classification: Optional[List[str]] = Query(None, description="Filtro por classificação (repetível; vazio = não classificado)"),
+    type: Optional[List[Literal["Texto puro", "TXT", "PDF"]]] = Query(None, description="Filtro por tipo de entrada (repetível)"),
+    created_from: Optional[datetime] = Query(None, description="Criados a partir desta data (inclusiva)"),
+    created_to: Optional[datetime] = Query(None, description="Criados antes desta data (exclusiva)")
+) -> EmailFilters:
+    """Monta os filtros comuns à listagem e às estatísticas."""
+    try:
+        if created_from and created_to and created_from >= created_to:
+            raise ValueError("'created_from' deve ser anterior a 'created_to'")
+
+        return EmailFilters(
+            email_title=email_title,
+            ai_classification=ai_classification,
+            type=type,
+            created_from=created_from,
+            created_to=created_to
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Parâmetros inválidos: {str(e)}"
+        ) from e
+
+
+@router.get("/", response_model=Union[EmailSubmissionList, EmailSubmissionSummaryList], status_code=status.HTTP_200_OK)
 async def list_submissions(
+    request: Request,
     skip: int,
     limit: int,
-    email_title: Optional[str] = Query(None, description="Filtro por título do email"),
+    view: Literal["full", "summary"] = Query("full", description="'summary' omite mensagem e resposta sugerida"),
+    filters: EmailFilters = Depends(get_email_filters),
     db: Session = Depends(get_db_session)
 ):
-    """Lista submissões com paginação (máx. 100) e filtro opcional por título."""
+    """
+    Lista submissões com paginação (máx. 100) e filtros opcionais.
+    
+    Filtros: título (trecho), classificação, tipo e período de criação. A
+    resposta inclui `facets`, com as contagens por classificação e por tipo
+    considerando os demais filtros.
+    
+    Com `view=summary`, cada item traz apenas id, título, tipo, classificação
+    e data; o conteúdo completo é obtido em `GET /{email_id}`.
+    
+    Suporta requisições condicionais com `If-None-Match` (ver `_conditional_response`).
+    """
     try:
         if skip < 0:
             raise ValueError("Parâmetro 'skip' deve ser maior ou igual a zero")
@@ -112,8 +317,16 @@ async def list_submissions(
 
         email_repository = EmailRepository(db)
         service = EmailService(email_repository)
-        result = await service.get_submissions(skip=skip, limit=limit, email_title=email_title)
-        return result
+        return await _conditional_response(
+            request,
+            email_repository,
+            lambda: service.get_submissions(
+                skip=skip,
+                limit=limit,
+                filters=filters,
+                summary=view == "summary"
+            )
+        )
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -127,6 +340,29 @@ async def list_submissions(
         ) from e
 
 
+async def _conditional_response(request: Request, email_repository: EmailRepository, build) -> Response:
+    """
+    Responde 304 se o cliente já tem a versão atual, ou monta a resposta com ETag.
+    
+    O ETag combina a versão de alteração da tabela com a URL, então o 304 é
+    decidido com uma única leitura por chave primária, sem executar as
+    consultas da listagem ou das estatísticas. A versão é lida antes dos
+    dados: se uma escrita ocorrer no meio, o ETag fica mais antigo que o
+    conteúdo e a próxima requisição apenas recebe a resposta completa.
+    """
+    etag = build_etag(email_repository.get_version(), request.url.path, request.url.query)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+
+    if etag_matches(if_none_match, etag):
+        http_cache_metrics.record_not_modified(etag)
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    response = PydanticJSONResponse(await build(), headers=headers)
+    http_cache_metrics.record_full(etag, len(response.body), conditional=if_none_match is not None)
+    return response
+
+
 @router.delete("/", response_model=DeleteEmailsResponse, status_code=status.HTTP_200_OK)
 async def delete_emails(
     request: DeleteEmailsRequest,
@@ -153,7 +389,7 @@ async def delete_emails(
         email_repository = EmailRepository(db)
         service = EmailService(email_repository)
         result = await service.delete_emails(request.ids)
-        return result
+        return PydanticJSONResponse(result)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -169,10 +405,12 @@ async def delete_emails(
 
 @router.get("/stats", response_model=EmailStatsResponse, status_code=status.HTTP_200_OK)
 async def get_email_statistics(
+    request: Request,
+    filters: EmailFilters = Depends(get_email_filters),
     db: Session = Depends(get_db_session)
 ):
     """
-    Retorna estatísticas dos emails.
+    Retorna estatísticas dos emails, com os mesmos filtros opcionais da listagem.
     
     Retorna:
     - total: total de emails
@@ -182,15 +420,118 @@ async def get_email_statistics(
     - pdf: emails do tipo PDF
     - txt: emails do tipo TXT
     - texto_puro: emails do tipo texto puro
+    
+    Suporta requisições condicionais com `If-None-Match`.
     """
     try:
         email_repository = EmailRepository(db)
         service = EmailService(email_repository)
-        result = await service.get_statistics()
-        return result
+        return await _conditional_response(
+            request,
+            email_repository,
+            lambda: service.get_statistics(filters)
+        )
     except Exception as e:
         print(f"Erro ao buscar estatísticas: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Erro interno do servidor"
-        ) from e
\ No newline at end of file
+        ) from e
+
+
+@router.get("/{email_id:int}", response_model=EmailSubmissionResponse, status_code=status.HTTP_200_OK)
+async def get_submission(
+    email_id: int,
+    db: Session = Depends(get_db_session)
+):
+    """Retorna uma submissão completa, incluindo mensagem e resposta sugerida."""
+    try:
+        email_repository = EmailRepository(db)
+        service = EmailService(email_repository)
+        result = await service.get_submission(email_id)
+    except Exception as e:
+        print(f"Erro ao buscar submissão: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Erro interno do servidor"
+        ) from e
+
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Submissão não encontrada"
+        )
+    return PydanticJSONResponse(result)
+
+
+@router.get(
+    "/{email_id:int}/file",
+    response_class=FileResponse,
+    status_code=status.HTTP_200_OK,
+    responses={206: {"description": "Intervalo do arquivo (header Range)"}, 304: {"description": "Arquivo não modificado"}}
+)
+async def download_submission_file(
+    email_id: int,
+    request: Request,
+    db: Session = Depends(get_db_session)
+):
+    """
+    Baixa o arquivo original (.txt ou .pdf) de uma submissão por arquivo.
+    
+    O arquivo é enviado do blob store em blocos, sem ser carregado inteiro em
+    memória, ou com `sendfile` quando o servidor suporta a extensão ASGI
+    `http.response.pathsend`. Aceita `Range`/`If-Range` (respostas 206) e
+    `If-None-Match`; o ETag é o hash do conteúdo, que nunca muda.
+    """
+    try:
+        email_repository = EmailRepository(db)
+        service = EmailService(email_repository)
+        original_file = await service.get_original_file(email_id)
+    except Exception as e:
+        print(f"Erro ao buscar arquivo: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Erro interno do servidor"
+        ) from e
+
+    if original_file is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Arquivo não encontrado"
+        )
+
+    headers = {
+        "ETag": f'"{original_file["sha256"]}"',
+        "Cache-Control": "private, max-age=31536000, immutable"
+    }
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return FileResponse(
+        original_file["path"],
+        media_type=original_file["media_type"],
+        filename=original_file["filename"],
+        headers=headers
+    )
+
+
+@router.get("/events", status_code=status.HTTP_200_OK)
+async def stream_email_events(request: Request):
+    """
+    Stream de eventos (Server-Sent Events) com as alterações nos emails.
+    
+    Eventos emitidos:
+    - submission.created: nova submissão (`submission` completa, ou apenas `id` se grande demais)
+    - submission.deleted: `ids` das submissões removidas
+    - submission.updated: `ids` das submissões reclassificadas (backfill)
+    - stats.delta: variação a ser somada às estatísticas
+    - resync: o cliente ficou para trás e deve recarregar os dados
+    """
+    return StreamingResponse(
+        event_broker.stream(request.is_disconnected),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from pydantic import Field
+from pydantic import Field, model_validator
+from typing import Literal, Optional
 
 
 class Settings(BaseSettings):
@@ -15,6 +16,53 @@ class Settings(BaseSettings):
 
     openai_api_key: str = Field(validation_alias="OPENAI_API_KEY")
 
+    # Sem valor explícito, usa `postgres` quando o banco é PostgreSQL (ver `resolve_events_backend`)
+    events_backend: Optional[Literal["memory", "postgres"]] = Field(default=None, validation_alias="EVENTS_BACKEND")
+
+    few_shot_k: int = Field(default=4, validation_alias="FEW_SHOT_K")
+    few_shot_token_budget: int = Field(default=600, validation_alias="FEW_SHOT_TOKEN_BUDGET")
+    few_shot_index_path: Optional[str] = Field(default=None, validation_alias="FEW_SHOT_INDEX_PATH")
+    few_shot_index_max_per_label: int = Field(default=5000, validation_alias="FEW_SHOT_INDEX_MAX_PER_LABEL")
+    few_shot_index_sync_interval_seconds: int = Field(default=30, validation_alias="FEW_SHOT_INDEX_SYNC_INTERVAL_SECONDS")
+
+    llm_timeout_seconds: float = Field(default=60, validation_alias="LLM_TIMEOUT_SECONDS")
+    llm_max_attempts: int = Field(default=3, validation_alias="LLM_MAX_ATTEMPTS")
+    llm_max_concurrency: int = Field(default=8, validation_alias="LLM_MAX_CONCURRENCY")
+    llm_latency_target_seconds: float = Field(default=20, validation_alias="LLM_LATENCY_TARGET_SECONDS")
+    llm_circuit_failure_threshold: int = Field(default=5, validation_alias="LLM_CIRCUIT_FAILURE_THRESHOLD")
+    llm_circuit_reset_seconds: float = Field(default=30, validation_alias="LLM_CIRCUIT_RESET_SECONDS")
+
+    idempotency_ttl_hours: int = Field(default=24, validation_alias="IDEMPOTENCY_TTL_HOURS")
+    idempotency_wait_seconds: int = Field(default=120, validation_alias="IDEMPOTENCY_WAIT_SECONDS")
+    idempotency_lease_seconds: int = Field(default=300, validation_alias="IDEMPOTENCY_LEASE_SECONDS")
+    idempotency_cleanup_interval_seconds: int = Field(default=600, validation_alias="IDEMPOTENCY_CLEANUP_INTERVAL_SECONDS")
+
+    web_concurrency: Optional[int] = Field(default=None, validation_alias="WEB_CONCURRENCY")
+
+    gzip_minimum_size: int = Field(default=1024, validation_alias="GZIP_MINIMUM_SIZE")
+    gzip_compress_level: int = Field(default=6, validation_alias="GZIP_COMPRESS_LEVEL")
+
+    blob_store_path: str = Field(default="data/blobs", validation_alias="BLOB_STORE_PATH")
+
+    partitioning_enabled: bool = Field(default=False, validation_alias="PARTITIONING_ENABLED")
+    partition_premake_months: int = Field(default=3, validation_alias="PARTITION_PREMAKE_MONTHS")
+    partition_retention_months: int = Field(default=0, validation_alias="PARTITION_RETENTION_MONTHS")
+    partition_retention_action: Literal["drop", "detach"] = Field(default="drop", validation_alias="PARTITION_RETENTION_ACTION")
+    partition_archive_path: Optional[str] = Field(default=None, validation_alias="PARTITION_ARCHIVE_PATH")
+    partition_maintenance_interval_seconds: int = Field(default=3600, validation_alias="PARTITION_MAINTENANCE_INTERVAL_SECONDS")
+
+    @model_validator(mode="after")
+    def resolve_events_backend(self) -> "Settings":
+        """
+        Escolhe o backend de eventos quando EVENTS_BACKEND não foi definido.
+        
+        Com PostgreSQL, os eventos passam pelo LISTEN/NOTIFY e chegam aos
+        clientes de todos os workers; nos demais bancos ficam em memória.
+        """
+        if self.events_backend is None:
+            self.events_backend = "postgres" if self.database_url.startswith("postgresql") else "memory"
+        return self
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_prefix="",
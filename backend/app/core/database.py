@@ -1,9 +1,10 @@
-from sqlalchemy import create_engine
+from sqlalchemy import Index, create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from typing import Generator
+from typing import Generator, List, Optional
 
 from app.core.config import settings
+from app.core.partitioning import PartitionManager
 
 Base = declarative_base()
 
@@ -22,6 +23,24 @@ class DatabaseManager:
             autoflush=False, 
             bind=self.engine
         )
+        self.partitions = self._build_partition_manager()
+    
+    def _build_partition_manager(self) -> Optional[PartitionManager]:
+        """Cria o gerenciador de partições de `email_submissions`, se habilitado."""
+        if not settings.partitioning_enabled:
+            return None
+        if self.engine.dialect.name != "postgresql":
+            print("Aviso: PARTITIONING_ENABLED exige PostgreSQL; particionamento desativado")
+            return None
+        return PartitionManager(
+            self.engine,
+            Base.metadata,
+            "email_submissions",
+            premake=settings.partition_premake_months,
+            retention_months=settings.partition_retention_months or None,
+            retention_action=settings.partition_retention_action,
+            archive_path=settings.partition_archive_path
+        )
     
     def get_session(self) -> Generator[Session, None, None]:
         """Fornece uma sessão de banco de dados por request e garante o fechamento."""
@@ -31,11 +50,168 @@ class DatabaseManager:
         finally:
             db.close()
     
+    def reset_after_fork(self) -> None:
+        """
+        Descarta as conexões herdadas do processo pai sem fechá-las.
+        
+        Deve ser chamado no processo filho logo após o fork, para que cada
+        worker abra seu próprio pool em vez de compartilhar sockets com o pai.
+        """
+        self.engine.dispose(close=False)
+    
     def create_tables(self, drop_first: bool = False):
-        """Cria todas as tabelas no banco de dados."""
+        """
+        Cria todas as tabelas no banco de dados.
+        
+        Colunas anuláveis adicionadas a tabelas que já existiam também são
+        criadas. Índices novos de tabelas existentes não são criados aqui,
+        pois bloqueariam as escritas durante a construção: eles são apenas
+        listados e devem ser criados por `python -m app.core.migrations indexes`.
+        Com o particionamento habilitado, a tabela de submissões é criada
+        particionada e as partições dos próximos meses são garantidas; uma
+        tabela comum já existente só é convertida por
+        `python -m app.core.partitioning migrate`.
+        """
         if drop_first:
             Base.metadata.drop_all(bind=self.engine)
+        if self.partitions is not None:
+            self.partitions.create_parent()
         Base.metadata.create_all(bind=self.engine)
+        self._add_missing_columns()
+        missing = self.missing_indexes()
+        if missing:
+            print(
+                f"Aviso: índices ausentes ({', '.join(index.name for index in missing)}); "
+                "crie com `python -m app.core.migrations indexes`"
+            )
+        if self.partitions is not None:
+            with self.engine.connect() as connection:
+                if self.partitions.table_kind(connection) != "partitioned":
+                    print(
+                        "Aviso: email_submissions existe sem particionamento; "
+                        "converta com `python -m app.core.partitioning migrate`"
+                    )
+            self.partitions.ensure_partitions()
+
+    def _add_missing_columns(self) -> None:
+        """Adiciona às tabelas existentes as colunas anuláveis novas dos modelos."""
+        inspector = inspect(self.engine)
+        with self.engine.begin() as connection:
+            for table in Base.metadata.sorted_tables:
+                existing = {column["name"] for column in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name in existing or not column.nullable:
+                        continue
+                    column_type = column.type.compile(dialect=self.engine.dialect)
+                    connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+
+    def missing_indexes(self) -> List[Index]:
+        """
+        Índices dos modelos que não existem nas tabelas já criadas.
+
+        No PostgreSQL, um índice inválido (construção concorrente interrompida
+        ou índice de tabela particionada ainda sem todas as partições) também
+        conta como ausente.
+        """
+        inspector = inspect(self.engine)
+        missing = []
+        with self.engine.connect() as connection:
+            for table in Base.metadata.sorted_tables:
+                if not inspector.has_table(table.name):
+                    continue
+                if self.engine.dialect.name == "postgresql":
+                    missing.extend(index for index in table.indexes if not self._index_is_valid(connection, index.name))
+                else:
+                    existing = {index["name"] for index in inspector.get_indexes(table.name)}
+                    missing.extend(index for index in table.indexes if index.name not in existing)
+        return missing
+
+    def create_missing_indexes(self) -> List[str]:
+        """
+        Cria os índices ausentes sem bloquear as escritas nas tabelas.
+
+        No PostgreSQL usa `CREATE INDEX CONCURRENTLY` (fora de transação).
+        Como tabelas particionadas não aceitam construção concorrente, o
+        índice é criado só na tabela pai (`ON ONLY`), construído de forma
+        concorrente em cada partição e anexado a ele, ficando válido quando
+        todas as partições estiverem anexadas. Pode ser executado de novo
+        após uma interrupção: índices inválidos são recriados.
+
+        Returns:
+            Nomes dos índices criados
+        """
+        missing = self.missing_indexes()
+        if self.engine.dialect.name != "postgresql":
+            for index in missing:
+                index.create(bind=self.engine, checkfirst=True)
+            return [index.name for index in missing]
+
+        with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            for index in missing:
+                relkind = connection.execute(
+                    text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"),
+                    {"name": f'"{index.table.name}"'}
+                ).scalar()
+                if relkind == "p":
+                    self._create_partitioned_index(connection, index)
+                else:
+                    self._create_index_concurrently(connection, index, index.name, index.table.name)
+        return [index.name for index in missing]
+
+    @staticmethod
+    def _index_is_valid(connection, name: str) -> Optional[bool]:
+        """`indisvalid` do índice no PostgreSQL, ou None se ele não existir."""
+        return connection.execute(
+            text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+            {"name": f'"{name}"'}
+        ).scalar()
+
+    def _create_index_concurrently(self, connection, index: Index, name: str, table_name: str) -> None:
+        """Constrói o índice com as colunas de `index` em `table_name` usando `CONCURRENTLY`."""
+        preparer = connection.dialect.identifier_preparer
+        valid = self._index_is_valid(connection, name)
+        if valid:
+            return
+        if valid is False:
+            connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {preparer.quote(name)}"))
+        columns = ", ".join(preparer.quote(column.name) for column in index.columns)
+        connection.execute(text(
+            f"CREATE {'UNIQUE ' if index.unique else ''}INDEX CONCURRENTLY {preparer.quote(name)} "
+            f"ON {preparer.quote(table_name)} ({columns})"
+        ))
+
+    def _create_partitioned_index(self, connection, index: Index) -> None:
+        """Cria o índice na tabela pai particionada e o constrói partição por partição."""
+        preparer = connection.dialect.identifier_preparer
+        table_name = index.table.name
+        columns = ", ".join(preparer.quote(column.name) for column in index.columns)
+        connection.execute(text(
+            f"CREATE {'UNIQUE ' if index.unique else ''}INDEX IF NOT EXISTS {preparer.quote(index.name)} "
+            f"ON ONLY {preparer.quote(table_name)} ({columns})"
+        ))
+        partitions = connection.execute(
+            text(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = to_regclass(:name)"
+            ),
+            {"name": f'"{table_name}"'}
+        ).scalars().all()
+        for partition in partitions:
+            attached = connection.execute(
+                text(
+                    "SELECT 1 FROM pg_inherits i JOIN pg_index x ON x.indexrelid = i.inhrelid "
+                    "WHERE i.inhparent = to_regclass(:index) AND x.indrelid = to_regclass(:partition)"
+                ),
+                {"index": f'"{index.name}"', "partition": f'"{partition}"'}
+            ).scalar()
+            if attached:
+                continue
+            suffix = partition[len(table_name) + 1:] if partition.startswith(f"{table_name}_") else partition
+            # Nomes de índices são limitados a 63 caracteres no PostgreSQL
+            name = f"{index.name[:62 - len(suffix)]}_{suffix}"
+            self._create_index_concurrently(connection, index, name, partition)
+            connection.execute(text(f"ALTER INDEX {preparer.quote(index.name)} ATTACH PARTITION {preparer.quote(name)}"))
 
 
 db_manager = DatabaseManager()
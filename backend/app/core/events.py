@@ -0,0 +1,292 @@
+"""Pub/sub de eventos para atualizações em tempo real (Server-Sent Events)."""
+import asyncio
+import json
+import select
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import db_manager
+
+
+class PostgresEventBridge:
+    """
+    Ponte LISTEN/NOTIFY do PostgreSQL para distribuir eventos entre workers.
+
+    Cada processo mantém uma conexão dedicada escutando o canal e repassa
+    os payloads recebidos ao broker local. Cada notificação leva o tipo do
+    evento na primeira linha e o payload JSON na segunda, para que o tipo
+    seja lido sem decodificar o JSON. Se a conexão cair, a thread de
+    escuta reconecta com backoff exponencial e avisa o broker, já que as
+    notificações enviadas enquanto estava desconectada foram perdidas.
+    """
+
+    CHANNEL = "email_events"
+    MAX_PAYLOAD_BYTES = 7900
+    RECONNECT_INITIAL_SECONDS = 0.5
+    RECONNECT_MAX_SECONDS = 30.0
+
+    def __init__(self, on_message, on_reconnect=None):
+        """
+        Inicializa a ponte.
+
+        Args:
+            on_message: Callback chamado com o tipo e o payload de cada evento recebido
+            on_reconnect: Callback chamado após restabelecer a conexão
+        """
+        self.on_message = on_message
+        self.on_reconnect = on_reconnect
+        self._connection = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        """Abre a conexão dedicada e inicia a thread de escuta."""
+        self._connect()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._listen, name="email-events-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Interrompe a escuta e fecha a conexão dedicada."""
+        self._stopped.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+        if self._connection:
+            self._connection.close()
+        self._connection = None
+        self._thread = None
+
+    def _connect(self) -> None:
+        """Abre uma conexão dedicada, fora do pool, e assina o canal."""
+        raw_connection = db_manager.engine.raw_connection()
+        raw_connection.detach()
+        connection = raw_connection.dbapi_connection
+        try:
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {self.CHANNEL}")
+        except Exception:
+            connection.close()
+            raise
+        self._connection = connection
+
+    def _close_connection(self) -> None:
+        """Fecha a conexão atual ignorando erros (ela pode já estar quebrada)."""
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def _reconnect(self) -> bool:
+        """
+        Reabre a conexão com backoff exponencial até conseguir ou a ponte ser parada.
+
+        Returns:
+            True se reconectou, False se a ponte foi parada antes
+        """
+        self._close_connection()
+        delay = self.RECONNECT_INITIAL_SECONDS
+        while not self._stopped.wait(delay):
+            try:
+                self._connect()
+                print("Escuta de eventos reconectada")
+                return True
+            except Exception as e:
+                print(f"Falha ao reconectar a escuta de eventos: {str(e)}")
+                delay = min(delay * 2, self.RECONNECT_MAX_SECONDS)
+        return False
+
+    def notify(self, event_type: str, payload: str) -> None:
+        """Publica um evento serializado no canal para todos os workers."""
+        with db_manager.engine.connect() as connection:
+            connection.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                # O JSON serializado nunca contém quebras de linha literais
+                {"channel": self.CHANNEL, "payload": f"{event_type}\n{payload}"}
+            )
+            connection.commit()
+
+    def _listen(self) -> None:
+        """Laço de escuta executado em thread separada."""
+        while not self._stopped.is_set():
+            try:
+                if select.select([self._connection], [], [], 1.0) == ([], [], []):
+                    continue
+                self._connection.poll()
+                while self._connection.notifies:
+                    notification = self._connection.notifies.pop(0)
+                    event_type, _, payload = notification.payload.partition("\n")
+                    self.on_message(event_type, payload)
+            except Exception as e:
+                if self._stopped.is_set():
+                    return
+                print(f"Erro na escuta de eventos: {str(e)}")
+                if not self._reconnect():
+                    return
+                if self.on_reconnect:
+                    self.on_reconnect()
+
+
+class EventBroker:
+    """
+    Broker de eventos em memória com fan-out para assinantes SSE.
+
+    Cada evento é serializado uma única vez e o mesmo frame é entregue a
+    todos os assinantes. Assinantes lentos que enchem a fila recebem um
+    evento `resync` para recarregar os dados em vez de bloquear o broker.
+    """
+
+    HEARTBEAT_SECONDS = 15
+
+    def __init__(self, queue_size: int = 100):
+        """Inicializa o broker sem assinantes."""
+        self.queue_size = queue_size
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._bridge: Optional[PostgresEventBridge] = None
+        self._listeners: List[Callable[[str, str], None]] = []
+
+    async def start(self) -> None:
+        """Associa o broker ao event loop atual e inicia a ponte entre workers, se configurada."""
+        self._loop = asyncio.get_running_loop()
+        if settings.events_backend == "postgres":
+            self._bridge = PostgresEventBridge(self._dispatch_threadsafe, self._resync_all_threadsafe)
+            await self._loop.run_in_executor(None, self._bridge.start)
+
+    async def stop(self) -> None:
+        """Encerra a ponte entre workers e desconecta os assinantes."""
+        if self._bridge:
+            await asyncio.get_running_loop().run_in_executor(None, self._bridge.stop)
+            self._bridge = None
+        self._subscribers.clear()
+
+    @property
+    def subscriber_count(self) -> int:
+        """Quantidade de assinantes conectados neste processo."""
+        return len(self._subscribers)
+
+    async def publish(self, event_type: str, data: Dict[str, Any]) -> None:
+        """
+        Publica um evento para todos os assinantes.
+
+        Falhas na publicação são registradas e não propagadas, para não
+        afetar a operação que originou o evento.
+        """
+        try:
+            payload = json.dumps({"type": event_type, "data": data}, ensure_ascii=False, default=str)
+            if self._bridge:
+                if len(payload.encode("utf-8")) > PostgresEventBridge.MAX_PAYLOAD_BYTES:
+                    payload = self._compact_payload(event_type, data)
+                await asyncio.get_running_loop().run_in_executor(None, self._bridge.notify, event_type, payload)
+            else:
+                self._dispatch(event_type, payload)
+        except Exception as e:
+            print(f"Erro ao publicar evento {event_type}: {str(e)}")
+
+    async def stream(self, is_disconnected) -> AsyncIterator[str]:
+        """
+        Gera frames SSE para um assinante até que ele se desconecte.
+
+        Args:
+            is_disconnected: Corrotina que indica se o cliente encerrou a conexão
+        """
+        queue = self._subscribe()
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    frame = await asyncio.wait_for(queue.get(), timeout=self.HEARTBEAT_SECONDS)
+                    yield frame
+                except asyncio.TimeoutError:
+                    if await is_disconnected():
+                        break
+                    yield ": ping\n\n"
+        finally:
+            self._subscribers.discard(queue)
+
+    def add_listener(self, listener: Callable[[str, str], None]) -> None:
+        """
+        Registra uma função chamada, no event loop, com o tipo e o payload de
+        cada evento entregue a este processo (incluindo os de outros workers).
+
+        Deve ser rápida: trabalho pesado fica para depois, fora do event loop.
+        """
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def _subscribe(self) -> asyncio.Queue:
+        """Registra um novo assinante."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def _dispatch(self, event_type: str, payload: str) -> None:
+        """Entrega um evento já serializado a todos os assinantes locais."""
+        for listener in self._listeners:
+            try:
+                listener(event_type, payload)
+            except Exception as e:
+                print(f"Erro ao tratar evento {event_type}: {str(e)}")
+        frame = f"event: {event_type}\ndata: {payload}\n\n"
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                self._resync(queue)
+
+    def _dispatch_threadsafe(self, event_type: str, payload: str) -> None:
+        """Agenda a entrega de um evento recebido de outra thread."""
+        if self._loop and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._dispatch, event_type, payload)
+
+    def _resync_all_threadsafe(self) -> None:
+        """Pede recarga completa a todos os assinantes (eventos podem ter sido perdidos)."""
+        self._dispatch_threadsafe("resync", json.dumps({"type": "resync", "data": {}}))
+
+    @staticmethod
+    def _resync(queue: asyncio.Queue) -> None:
+        """Descarta eventos pendentes de um assinante lento e solicita recarga completa."""
+        while not queue.empty():
+            queue.get_nowait()
+        payload = json.dumps({"type": "resync", "data": {}})
+        queue.put_nowait(f"event: resync\ndata: {payload}\n\n")
+
+    @staticmethod
+    def _compact_payload(event_type: str, data: Dict[str, Any]) -> str:
+        """Remove a submissão completa de eventos grandes demais para o NOTIFY."""
+        compact = {key: value for key, value in data.items() if key != "submission"}
+        if "submission" in data:
+            compact["id"] = data["submission"].get("id")
+        return json.dumps({"type": event_type, "data": compact}, ensure_ascii=False, default=str)
+
+
+event_broker = EventBroker()
+
+
+def notify_workers(event_type: str, data: Dict[str, Any]) -> bool:
+    """
+    Publica um evento para os servidores a partir de um processo sem broker
+    (ex.: jobs de linha de comando).
+
+    Só é possível com EVENTS_BACKEND=postgres; com o backend em memória os
+    eventos ficam restritos a cada processo e nada é enviado.
+
+    Returns:
+        True se o evento foi enviado
+    """
+    if settings.events_backend != "postgres":
+        return False
+    try:
+        payload = json.dumps({"type": event_type, "data": data}, ensure_ascii=False, default=str)
+        if len(payload.encode("utf-8")) > PostgresEventBridge.MAX_PAYLOAD_BYTES:
+            payload = EventBroker._compact_payload(event_type, data)
+        PostgresEventBridge(None).notify(event_type, payload)
+        return True
+    except Exception as e:
+        print(f"Erro ao publicar evento {event_type}: {str(e)}")
+        return False
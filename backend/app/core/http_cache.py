@@ -0,0 +1,154 @@
+"""Cache HTTP das rotas de leitura: ETags, compressão e métricas."""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+def build_etag(version: int, path: str, query: str) -> str:
+    """
+    Monta um ETag fraco a partir da versão da tabela e da URL da requisição.
+
+    É fraco porque o mesmo conteúdo pode ser enviado com ou sem compressão.
+    """
+    digest = hashlib.blake2b(f"{path}?{query}".encode("utf-8"), digest_size=8).hexdigest()
+    return f'W/"{version}-{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Indica se o header If-None-Match contém o ETag (comparação fraca)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque_tag = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque_tag
+        for candidate in if_none_match.split(",")
+    )
+
+
+class HTTPCacheMetrics:
+    """
+    Contadores das respostas condicionais e da compressão, por processo.
+
+    Para estimar os bytes economizados por um 304, guarda o tamanho do corpo
+    dos ETags enviados mais recentemente.
+    """
+
+    MAX_TRACKED_ETAGS = 1024
+
+    def __init__(self):
+        """Inicializa os contadores zerados."""
+        self._lock = threading.Lock()
+        self._body_sizes: "OrderedDict[str, int]" = OrderedDict()
+        self.conditional_requests = 0
+        self.not_modified = 0
+        self.not_modified_bytes_saved = 0
+        self.compressed_responses = 0
+        self.uncompressed_bytes = 0
+        self.sent_bytes = 0
+
+    def record_full(self, etag: str, body_size: int, conditional: bool) -> None:
+        """Registra uma resposta completa enviada com ETag."""
+        with self._lock:
+            if conditional:
+                self.conditional_requests += 1
+            self._body_sizes[etag] = body_size
+            self._body_sizes.move_to_end(etag)
+            while len(self._body_sizes) > self.MAX_TRACKED_ETAGS:
+                self._body_sizes.popitem(last=False)
+
+    def record_not_modified(self, etag: str) -> None:
+        """Registra uma resposta 304."""
+        with self._lock:
+            self.conditional_requests += 1
+            self.not_modified += 1
+            self.not_modified_bytes_saved += self._body_sizes.get(etag, 0)
+
+    def record_transfer(self, uncompressed_bytes: int, sent_bytes: int) -> None:
+        """Registra o tamanho de um corpo antes e depois da compressão."""
+        with self._lock:
+            if sent_bytes < uncompressed_bytes:
+                self.compressed_responses += 1
+            self.uncompressed_bytes += uncompressed_bytes
+            self.sent_bytes += sent_bytes
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Retorna os contadores e as taxas derivadas."""
+        with self._lock:
+            return {
+                "conditional_requests": self.conditional_requests,
+                "not_modified": self.not_modified,
+                "hit_rate": round(self.not_modified / self.conditional_requests, 4) if self.conditional_requests else 0.0,
+                "not_modified_bytes_saved": self.not_modified_bytes_saved,
+                "compressed_responses": self.compressed_responses,
+                "uncompressed_bytes": self.uncompressed_bytes,
+                "sent_bytes": self.sent_bytes,
+                "compression_bytes_saved": self.uncompressed_bytes - self.sent_bytes
+            }
+
+
+http_cache_metrics = HTTPCacheMetrics()
+
+
+class CompressionMiddleware:
+    """
+    Compressão gzip (via `GZipMiddleware`) com medição dos bytes economizados.
+
+    Respostas `text/event-stream` não são comprimidas pelo `GZipMiddleware`.
+    Rotas em `exclude_path` (downloads de arquivos) também não: comprimir
+    impediria o `sendfile` e mudaria os bytes identificados pelo ETag forte
+    e usados nas requisições `Range`.
+    """
+
+    SIZES_SCOPE_KEY = "app.response_sizes"
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        compresslevel: int = 6,
+        exclude_path: Optional[str] = None
+    ):
+        """Inicializa o middleware envolvendo a aplicação."""
+        self.app = app
+        self.gzip = GZipMiddleware(self._measure_uncompressed, minimum_size=minimum_size, compresslevel=compresslevel)
+        self.exclude_path = re.compile(exclude_path) if exclude_path else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if self.exclude_path is not None and self.exclude_path.search(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        sizes = {"uncompressed": 0, "sent": 0}
+        scope[self.SIZES_SCOPE_KEY] = sizes
+
+        async def send_measured(message: Message) -> None:
+            if message["type"] == "http.response.body":
+                sizes["sent"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.gzip(scope, receive, send_measured)
+        finally:
+            http_cache_metrics.record_transfer(sizes["uncompressed"], sizes["sent"])
+
+    async def _measure_uncompressed(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Mede o corpo gerado pela aplicação, antes da compressão."""
+        sizes = scope[self.SIZES_SCOPE_KEY]
+
+        async def send_measured(message: Message) -> None:
+            if message["type"] == "http.response.body":
+                sizes["uncompressed"] += len(message.get("body", b""))
+            await send(message)
+
+        await self.app(scope, receive, send_measured)
@@ -0,0 +1,52 @@
+"""
+Migrações pontuais do banco, executadas fora do caminho das requisições.
+
+A inicialização da aplicação só cria tabelas e colunas novas; o que varre ou
+bloqueia tabelas com dados roda uma única vez por este CLI, na implantação:
+
+- `indexes`: cria os índices ausentes com `CREATE INDEX CONCURRENTLY`
+- `normalize`: normaliza classificações e tipos gravados antes da
+  normalização na escrita
+
+Uso:
+    python -m app.core.migrations indexes
+    python -m app.core.migrations normalize
+    python -m app.core.migrations all
+"""
+from typing import Any, Dict, List
+
+from app.core.database import db_manager
+
+
+def create_indexes() -> List[str]:
+    """Cria os índices ausentes sem bloquear as escritas; retorna os nomes criados."""
+    return db_manager.create_missing_indexes()
+
+
+def normalize_stored_values() -> int:
+    """Normaliza os valores antigos das submissões; retorna a quantidade de linhas alteradas."""
+    from app.repositories.email_repository import EmailRepository
+
+    with db_manager.SessionLocal() as db:
+        return EmailRepository(db).normalize_stored_values()
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    import app.models.email  # noqa: F401 - registra as tabelas usadas por create_tables
+    import app.models.idempotency  # noqa: F401
+    import app.models.table_version  # noqa: F401
+
+    parser = argparse.ArgumentParser(description="Migrações pontuais do banco de dados.")
+    parser.add_argument("command", choices=["indexes", "normalize", "all"])
+    args = parser.parse_args()
+
+    db_manager.create_tables()
+    result: Dict[str, Any] = {}
+    if args.command in ("indexes", "all"):
+        result["indexes_created"] = create_indexes()
+    if args.command in ("normalize", "all"):
+        result["normalized_rows"] = normalize_stored_values()
+    print(json.dumps(result, indent=2))
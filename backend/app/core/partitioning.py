@@ -0,0 +1,600 @@
+"""
+Particionamento por intervalo (mensal) de tabelas do PostgreSQL.
+
+A tabela pai é particionada por `RANGE` na coluna de data; cada mês fica em
+`<tabela>_pAAAAMM` e uma partição `<tabela>_default` recebe o que cair fora
+das partições existentes. Partições futuras são criadas com antecedência e a
+retenção remove meses inteiros com `DETACH`/`DROP`, sem `DELETE` linha a
+linha, opcionalmente exportando-os antes para CSV comprimido.
+
+Uso:
+    python -m app.core.partitioning status
+    python -m app.core.partitioning maintain
+    python -m app.core.partitioning migrate
+    python -m app.core.partitioning benchmark --rows 10000000
+"""
+import gzip
+import os
+import re
+import statistics
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from sqlalchemy import Column, Index, MetaData, Table, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+_BOUND_PATTERN = re.compile(r"\('([^']*)'\)|(MINVALUE)|(MAXVALUE)")
+
+
+@dataclass(frozen=True)
+class PartitionInfo:
+    """Partição existente e seus limites (None = sem limite)."""
+
+    name: str
+    lower: Optional[datetime]
+    upper: Optional[datetime]
+    is_default: bool = False
+
+
+def month_start(value: datetime) -> datetime:
+    """Primeiro instante (UTC) do mês da data."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    value = value.astimezone(timezone.utc)
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    """Soma meses a uma data que já está no primeiro dia do mês."""
+    month_index = value.year * 12 + value.month - 1 + months
+    return value.replace(year=month_index // 12, month=month_index % 12 + 1)
+
+
+def build_partitioned_table(table: Table, metadata: MetaData, schema: Optional[str] = None) -> Table:
+    """
+    Cópia da tabela particionada por `RANGE` em `created_at`.
+
+    No PostgreSQL a chave primária de uma tabela particionada precisa incluir
+    a coluna de partição, então ela passa a ser `(id, created_at)`. O ORM
+    continua identificando as linhas só pelo `id`, que segue único por vir
+    de uma sequência.
+    """
+    primary_key = ("id", "created_at")
+    columns = [
+        Column(
+            column.name,
+            column.type,
+            primary_key=column.name in primary_key,
+            nullable=False if column.name in primary_key else column.nullable,
+            server_default=column.server_default.arg if column.server_default is not None else None,
+            autoincrement=True if column.name == "id" else False
+        )
+        for column in table.columns
+    ]
+    partitioned = Table(table.name, metadata, *columns, schema=schema, postgresql_partition_by="RANGE (created_at)")
+    for index in table.indexes:
+        Index(index.name, *[partitioned.c[column.name] for column in index.columns], unique=index.unique)
+    return partitioned
+
+
+class PartitionManager:
+    """Cria, lista e remove as partições mensais de uma tabela."""
+
+    def __init__(
+        self,
+        engine: Engine,
+        metadata: MetaData,
+        table_name: str,
+        premake: int = 3,
+        retention_months: Optional[int] = None,
+        retention_action: str = "drop",
+        archive_path: Optional[str] = None,
+        schema: Optional[str] = None
+    ):
+        """
+        Inicializa o gerenciador.
+
+        Args:
+            engine: Engine do PostgreSQL
+            metadata: Metadados onde a tabela é declarada (resolvida no primeiro uso)
+            table_name: Nome da tabela particionada
+            premake: Meses futuros com partição criada antecipadamente
+            retention_months: Meses completos mantidos além do atual (None = sem retenção)
+            retention_action: `drop` apaga as partições antigas; `detach` as mantém como tabelas avulsas
+            archive_path: Diretório para exportar as partições antes da remoção (None = não exporta)
+            schema: Schema da tabela (None = search_path)
+        """
+        self.engine = engine
+        self.metadata = metadata
+        self.table_name = table_name
+        self.premake = premake
+        self.retention_months = retention_months
+        self.retention_action = retention_action
+        self.archive_path = archive_path
+        self.schema = schema
+
+    @property
+    def table(self) -> Table:
+        """Tabela declarada nos modelos."""
+        return self.metadata.tables[self.table_name]
+
+    def _qualified(self, connection: Connection, name: str) -> str:
+        """Nome de tabela citado e com schema, para uso em DDL."""
+        preparer = connection.dialect.identifier_preparer
+        if self.schema:
+            return f"{preparer.quote_schema(self.schema)}.{preparer.quote(name)}"
+        return preparer.quote(name)
+
+    def _regclass_name(self, name: str) -> str:
+        """Nome no formato aceito por `to_regclass`."""
+        return f'"{self.schema}"."{name}"' if self.schema else f'"{name}"'
+
+    def _lock(self, connection: Connection) -> None:
+        """Serializa a manutenção entre processos (workers e CLI) até o fim da transação."""
+        connection.execute(text("SELECT pg_advisory_xact_lock(hashtext(:name))"), {"name": f"partitions:{self.table_name}"})
+
+    def table_kind(self, connection: Connection) -> Optional[str]:
+        """`partitioned`, `regular` ou None se a tabela não existir."""
+        relkind = connection.execute(
+            text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"),
+            {"name": self._regclass_name(self.table_name)}
+        ).scalar()
+        if relkind is None:
+            return None
+        return "partitioned" if relkind == "p" else "regular"
+
+    def create_parent(self) -> bool:
+        """
+        Cria a tabela pai particionada e a partição padrão, se a tabela não existir.
+
+        Returns:
+            True se a tabela foi criada
+        """
+        with self.engine.begin() as connection:
+            self._lock(connection)
+            if self.table_kind(connection) is not None:
+                return False
+            partitioned = build_partitioned_table(self.table, MetaData(), schema=self.schema)
+            connection.execute(CreateTable(partitioned))
+            # Tabela vazia: os índices podem ser criados na mesma transação
+            for index in partitioned.indexes:
+                connection.execute(CreateIndex(index))
+            self._create_default_partition(connection)
+            return True
+
+    def _create_default_partition(self, connection: Connection) -> None:
+        """Cria a partição que recebe as linhas fora dos intervalos existentes."""
+        connection.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {self._qualified(connection, f'{self.table_name}_default')} "
+            f"PARTITION OF {self._qualified(connection, self.table_name)} DEFAULT"
+        ))
+
+    def list_partitions(self, connection: Connection) -> List[PartitionInfo]:
+        """Partições ligadas à tabela, ordenadas pelo limite inferior."""
+        rows = connection.execute(
+            text(
+                "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+                "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = to_regclass(:name)"
+            ),
+            {"name": self._regclass_name(self.table_name)}
+        ).all()
+
+        partitions = []
+        for name, bound in rows:
+            if bound == "DEFAULT":
+                partitions.append(PartitionInfo(name=name, lower=None, upper=None, is_default=True))
+                continue
+            lower, upper = [
+                datetime.fromisoformat(literal) if literal else None
+                for literal, _, _ in _BOUND_PATTERN.findall(bound)
+            ]
+            partitions.append(PartitionInfo(name=name, lower=lower, upper=upper))
+        return sorted(partitions, key=lambda p: (p.is_default, p.lower or datetime.min.replace(tzinfo=timezone.utc)))
+
+    def ensure_partitions(self, now: Optional[datetime] = None) -> List[str]:
+        """
+        Cria as partições do mês atual e dos `premake` meses seguintes que faltarem.
+
+        Returns:
+            Nomes das partições criadas
+        """
+        start = month_start(now or datetime.now(timezone.utc))
+        created = []
+        with self.engine.begin() as connection:
+            self._lock(connection)
+            if self.table_kind(connection) != "partitioned":
+                return created
+            self._create_default_partition(connection)
+            existing = [p for p in self.list_partitions(connection) if not p.is_default]
+
+            for offset in range(self.premake + 1):
+                lower = add_months(start, offset)
+                upper = add_months(lower, 1)
+                if any(
+                    (p.lower is None or p.lower < upper) and (p.upper is None or p.upper > lower)
+                    for p in existing
+                ):
+                    continue
+                name = f"{self.table_name}_p{lower:%Y%m}"
+                # Cada partição em um savepoint: linhas do mês já gravadas na partição
+                # padrão impedem a criação, mas não devem impedir as demais
+                try:
+                    with connection.begin_nested():
+                        connection.execute(text(
+                            f"CREATE TABLE {self._qualified(connection, name)} "
+                            f"PARTITION OF {self._qualified(connection, self.table_name)} "
+                            f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+                        ))
+                    created.append(name)
+                except Exception as e:
+                    print(f"Erro ao criar a partição {name}: {str(e)}")
+        return created
+
+    def _retention_cutoff(self, now: Optional[datetime] = None) -> datetime:
+        """Início do período mantido: partições que terminam até aqui expiram."""
+        return add_months(month_start(now or datetime.now(timezone.utc)), -self.retention_months)
+
+    @staticmethod
+    def _is_expired(partition: PartitionInfo, cutoff: datetime) -> bool:
+        """Indica se a partição está inteiramente antes do período mantido."""
+        return not partition.is_default and partition.upper is not None and partition.upper <= cutoff
+
+    def expired_partitions(self, now: Optional[datetime] = None) -> List[PartitionInfo]:
+        """Partições que `apply_retention` removeria agora."""
+        if self.retention_months is None:
+            return []
+        cutoff = self._retention_cutoff(now)
+        with self.engine.connect() as connection:
+            if self.table_kind(connection) != "partitioned":
+                return []
+            return [p for p in self.list_partitions(connection) if self._is_expired(p, cutoff)]
+
+    def apply_retention(
+        self,
+        now: Optional[datetime] = None,
+        before_drop: Optional[Callable[[str], None]] = None
+    ) -> List[str]:
+        """
+        Remove (ou desanexa) as partições inteiramente anteriores ao período de retenção.
+
+        Com `archive_path`, cada partição é exportada para `<nome>.csv.gz`
+        antes de ser desanexada; se a exportação falhar, a partição é mantida.
+
+        Com `drop`, as partições são primeiro desanexadas (e a transação
+        confirmada) e só depois apagadas, uma a uma. Entre as duas etapas,
+        `before_drop(nome)` pode consultar a tabela desanexada comparando-a
+        com a tabela particionada, que já não a inclui (ex.: arquivos que
+        nenhuma outra linha referencia). Se ele ou o DROP falharem, a tabela
+        fica desanexada, como com `detach`.
+
+        Returns:
+            Nomes das partições desanexadas da tabela (apagadas ou não)
+        """
+        if self.retention_months is None:
+            return []
+
+        cutoff = self._retention_cutoff(now)
+        detached = []
+        with self.engine.begin() as connection:
+            self._lock(connection)
+            if self.table_kind(connection) != "partitioned":
+                return detached
+
+            for partition in self.list_partitions(connection):
+                if not self._is_expired(partition, cutoff):
+                    continue
+                try:
+                    with connection.begin_nested():
+                        if self.archive_path:
+                            self.export_partition(connection, partition.name)
+                        connection.execute(text(
+                            f"ALTER TABLE {self._qualified(connection, self.table_name)} "
+                            f"DETACH PARTITION {self._qualified(connection, partition.name)}"
+                        ))
+                    detached.append(partition.name)
+                except Exception as e:
+                    print(f"Erro ao aplicar retenção na partição {partition.name}: {str(e)}")
+
+        if self.retention_action == "drop":
+            for name in detached:
+                try:
+                    if before_drop:
+                        before_drop(name)
+                    with self.engine.begin() as connection:
+                        connection.execute(text(f"DROP TABLE {self._qualified(connection, name)}"))
+                except Exception as e:
+                    print(f"Erro ao apagar a partição desanexada {name} (mantida como tabela avulsa): {str(e)}")
+        return detached
+
+    def unreferenced_values(self, name: str, column: str, batch_size: int = 1000) -> Iterator[List[Any]]:
+        """
+        Valores distintos de `column` em uma tabela desanexada que nenhuma
+        linha da tabela particionada referencia, em lotes ordenados.
+
+        Cada lote é uma consulta por faixa de valores que percorre o índice da
+        coluna na tabela desanexada e confere as referências com `NOT EXISTS`
+        nos índices das partições; a tabela não é lida de uma vez.
+        """
+        last = None
+        while True:
+            with self.engine.connect() as connection:
+                column_name = connection.dialect.identifier_preparer.quote(column)
+                after = f"AND d.{column_name} > :after " if last is not None else ""
+                values = connection.execute(
+                    text(
+                        f"SELECT DISTINCT d.{column_name} FROM {self._qualified(connection, name)} d "
+                        f"WHERE d.{column_name} IS NOT NULL {after}"
+                        f"AND NOT EXISTS (SELECT 1 FROM {self._qualified(connection, self.table_name)} p "
+                        f"WHERE p.{column_name} = d.{column_name}) "
+                        f"ORDER BY d.{column_name} LIMIT :limit"
+                    ),
+                    {"after": last, "limit": batch_size}
+                ).scalars().all()
+            if values:
+                yield values
+            if len(values) < batch_size:
+                return
+            last = values[-1]
+
+    def export_partition(self, connection: Connection, name: str) -> Path:
+        """
+        Exporta uma partição para `<archive_path>/<nome>.csv.gz` com `COPY`.
+
+        O arquivo é escrito em um temporário e renomeado ao final, então um
+        arquivo com o nome final está sempre completo.
+        """
+        directory = Path(self.archive_path)
+        directory.mkdir(parents=True, exist_ok=True)
+        target = directory / f"{name}.csv.gz"
+
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as raw_file, gzip.GzipFile(fileobj=raw_file, mode="wb") as gzip_file:
+                cursor = connection.connection.cursor()
+                try:
+                    cursor.copy_expert(
+                        f"COPY (SELECT * FROM {self._qualified(connection, name)}) TO STDOUT WITH (FORMAT csv, HEADER true)",
+                        gzip_file
+                    )
+                finally:
+                    cursor.close()
+            os.replace(temp_path, target)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        return target
+
+    def migrate(self, now: Optional[datetime] = None) -> Optional[str]:
+        """
+        Converte a tabela comum existente em particionada, sem copiar as linhas.
+
+        A tabela atual é renomeada para `<tabela>_legacy` e anexada como a
+        partição de tudo até o fim do mês atual (ou do mês da linha mais
+        recente); os meses seguintes ganham partições próprias. Exige lock
+        exclusivo e uma varredura da tabela (para `NOT NULL` e para a chave
+        primária composta), então deve rodar em janela de manutenção.
+
+        Returns:
+            Nome da partição criada com os dados antigos, ou None se a tabela
+            não existir ou já for particionada
+        """
+        with self.engine.begin() as connection:
+            self._lock(connection)
+            if self.table_kind(connection) != "regular":
+                return None
+
+            parent = self._qualified(connection, self.table_name)
+            legacy_name = f"{self.table_name}_legacy"
+            legacy = self._qualified(connection, legacy_name)
+            preparer = connection.dialect.identifier_preparer
+
+            connection.execute(text(f"LOCK TABLE {parent} IN ACCESS EXCLUSIVE MODE"))
+            old_sequence = connection.execute(
+                text("SELECT pg_get_serial_sequence(:name, 'id')"),
+                {"name": self._regclass_name(self.table_name)}
+            ).scalar()
+            latest = connection.execute(text(f"SELECT max(created_at) FROM {parent}")).scalar()
+
+            connection.execute(text(f"ALTER TABLE {parent} RENAME TO {preparer.quote(legacy_name)}"))
+            # Nomes de índices são únicos por schema; os da tabela pai são recriados depois,
+            # partição por partição e sem bloquear escritas (`create_missing_indexes`)
+            index_names = connection.execute(
+                text("SELECT indexname FROM pg_indexes WHERE tablename = :table AND schemaname = coalesce(:schema, current_schema())"),
+                {"table": legacy_name, "schema": self.schema}
+            ).scalars().all()
+            for index_name in index_names:
+                connection.execute(text(
+                    f"ALTER INDEX {self._qualified(connection, index_name)} RENAME TO {preparer.quote(f'{index_name}_legacy')}"
+                ))
+
+            connection.execute(text(f"UPDATE {legacy} SET created_at = now() WHERE created_at IS NULL"))
+            connection.execute(text(f"ALTER TABLE {legacy} ALTER COLUMN created_at SET NOT NULL"))
+            # A partição precisa da mesma chave primária da tabela pai
+            primary_key_name = connection.execute(
+                text("SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(:name) AND contype = 'p'"),
+                {"name": self._regclass_name(legacy_name)}
+            ).scalar()
+            if primary_key_name:
+                connection.execute(text(f"ALTER TABLE {legacy} DROP CONSTRAINT {preparer.quote(primary_key_name)}"))
+            connection.execute(text(
+                f"ALTER TABLE {legacy} ADD CONSTRAINT {preparer.quote(f'{legacy_name}_pkey')} PRIMARY KEY (id, created_at)"
+            ))
+
+            partitioned = build_partitioned_table(self.table, MetaData(), schema=self.schema)
+            connection.execute(CreateTable(partitioned))
+            if old_sequence:
+                # A nova sequência continua de onde a antiga parou
+                connection.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence(:name, 'id'), "
+                    f"greatest((SELECT coalesce(max(id), 0) FROM {legacy}), (SELECT last_value FROM {old_sequence})))"
+                ), {"name": self._regclass_name(self.table_name)})
+
+            current = month_start(now or datetime.now(timezone.utc))
+            upper = add_months(max(current, month_start(latest)) if latest else current, 1)
+            connection.execute(text(
+                f"ALTER TABLE {parent} ATTACH PARTITION {legacy} FOR VALUES FROM (MINVALUE) TO ('{upper.isoformat()}')"
+            ))
+            self._create_default_partition(connection)
+        return legacy_name
+
+    def status(self) -> Dict[str, Any]:
+        """Tipo da tabela e partições existentes com a quantidade estimada de linhas."""
+        with self.engine.connect() as connection:
+            kind = self.table_kind(connection)
+            partitions = self.list_partitions(connection) if kind == "partitioned" else []
+            estimates = dict(connection.execute(
+                text("SELECT relname, reltuples::bigint FROM pg_class WHERE relname = ANY(:names)"),
+                {"names": [p.name for p in partitions]}
+            ).all()) if partitions else {}
+        return {
+            "table": self.table_name,
+            "kind": kind,
+            "partitions": [
+                {
+                    "name": p.name,
+                    "from": p.lower.isoformat() if p.lower else None,
+                    "to": p.upper.isoformat() if p.upper else None,
+                    "default": p.is_default,
+                    "estimated_rows": max(estimates.get(p.name, 0), 0)
+                }
+                for p in partitions
+            ]
+        }
+
+
+def benchmark(engine: Engine, table: Table, rows: int = 10_000_000, months: int = 24, repeat: int = 5) -> Dict[str, Any]:
+    """
+    Compara a latência das consultas da listagem em tabelas comum e particionada.
+
+    Cria as duas versões da tabela em schemas temporários, carrega `rows`
+    linhas distribuídas em `months` meses com `generate_series`, roda as
+    consultas no formato das geradas pelo repositório e remove os schemas.
+
+    Returns:
+        Tempo de carga e mediana (ms) de cada consulta por variante
+    """
+    now = month_start(datetime.now(timezone.utc))
+    first_month = add_months(now, -months + 1)
+    last_month = add_months(now, 0)
+    queries = {
+        "page_last_month": (
+            "SELECT id, email_title, type, ai_classification, created_at FROM {t} "
+            "WHERE created_at >= :start AND created_at < :end ORDER BY created_at, id LIMIT 50"
+        ),
+        "count_last_month": "SELECT count(*) FROM {t} WHERE created_at >= :start AND created_at < :end",
+        "facets_last_month": (
+            "SELECT ai_classification, type, count(*) FROM {t} "
+            "WHERE created_at >= :start AND created_at < :end GROUP BY ai_classification, type"
+        ),
+        "page_filtered_last_month": (
+            "SELECT id, email_title, type, ai_classification, created_at FROM {t} "
+            "WHERE ai_classification = 'PRODUTIVO' AND type = 'PDF' AND created_at >= :start AND created_at < :end "
+            "ORDER BY created_at, id LIMIT 50"
+        ),
+        "get_by_id": "SELECT * FROM {t} WHERE id = :id",
+        "stats_all": "SELECT ai_classification, type, count(*) FROM {t} GROUP BY ai_classification, type",
+    }
+    params = {"start": last_month, "end": add_months(last_month, 1), "id": rows // 2}
+
+    results: Dict[str, Any] = {"rows": rows, "months": months}
+    for variant in ("regular", "partitioned"):
+        schema = f"partition_benchmark_{variant}"
+        metadata = MetaData()
+        if variant == "partitioned":
+            build_partitioned_table(table, metadata, schema=schema)
+        else:
+            table.to_metadata(metadata, schema=schema)
+
+        with engine.begin() as connection:
+            connection.execute(text(f'DROP SCHEMA IF EXISTS "{schema}" CASCADE'))
+            connection.execute(text(f'CREATE SCHEMA "{schema}"'))
+        metadata.create_all(engine)
+        if variant == "partitioned":
+            PartitionManager(engine, metadata, table.name, premake=months - 1, schema=schema).ensure_partitions(now=first_month)
+
+        qualified = f'"{schema}"."{table.name}"'
+        started_at = time.perf_counter()
+        with engine.begin() as connection:
+            connection.execute(text(
+                f"INSERT INTO {qualified} (email_title, message, type, ai_classification, ai_suggested_reply, created_at) "
+                "SELECT 'Email ' || n, repeat('conteudo ', 20), (ARRAY['Texto puro', 'TXT', 'PDF'])[1 + n % 3], "
+                "(ARRAY['PRODUTIVO', 'IMPRODUTIVO'])[1 + n % 2], 'Resposta sugerida', "
+                ":first + (n::float / :rows) * (:last - :first) "
+                "FROM generate_series(1, :rows) AS n"
+            ), {"first": first_month, "last": add_months(last_month, 1), "rows": rows})
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.execute(text(f"VACUUM ANALYZE {qualified}"))
+        load_seconds = time.perf_counter() - started_at
+
+        timings = {"load_seconds": round(load_seconds, 1)}
+        with engine.connect() as connection:
+            for label, query in queries.items():
+                sql = text(query.format(t=qualified))
+                connection.execute(sql, params).all()
+                samples = []
+                for _ in range(repeat):
+                    started_at = time.perf_counter()
+                    connection.execute(sql, params).all()
+                    samples.append((time.perf_counter() - started_at) * 1000)
+                timings[label] = round(statistics.median(samples), 2)
+
+        # Remoção de um mês inteiro: DELETE na tabela comum, DETACH + DROP na particionada
+        started_at = time.perf_counter()
+        if variant == "partitioned":
+            PartitionManager(engine, metadata, table.name, retention_months=months - 2, schema=schema).apply_retention(now=now)
+        else:
+            with engine.begin() as connection:
+                connection.execute(text(f"DELETE FROM {qualified} WHERE created_at < :cutoff"), {"cutoff": add_months(first_month, 1)})
+        timings["drop_oldest_month_ms"] = round((time.perf_counter() - started_at) * 1000, 2)
+        results[variant] = timings
+
+        with engine.begin() as connection:
+            connection.execute(text(f'DROP SCHEMA "{schema}" CASCADE'))
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    from app.core.database import db_manager
+    from app.models.email import EmailSubmission
+    import app.models.idempotency  # noqa: F401 - registra as tabelas usadas por create_tables
+    import app.models.table_version  # noqa: F401
+
+    parser = argparse.ArgumentParser(description="Manutenção do particionamento da tabela de submissões.")
+    parser.add_argument("command", choices=["status", "maintain", "migrate", "benchmark"])
+    parser.add_argument("--rows", type=int, default=10_000_000, help="Linhas carregadas no benchmark")
+    parser.add_argument("--months", type=int, default=24, help="Meses cobertos pelas linhas do benchmark")
+    args = parser.parse_args()
+
+    manager = db_manager.partitions
+    if args.command == "benchmark":
+        result = benchmark(db_manager.engine, EmailSubmission.__table__, rows=args.rows, months=args.months)
+    elif manager is None:
+        parser.error("Particionamento desativado (PARTITIONING_ENABLED=false ou banco diferente de PostgreSQL)")
+    elif args.command == "status":
+        result = manager.status()
+    elif args.command == "maintain":
+        from app.core.events import notify_workers
+        from app.services.retention_service import maintain_partitions
+        result = maintain_partitions()
+        if result["removed"]:
+            # Os servidores estão em outros processos: só são avisados com EVENTS_BACKEND=postgres
+            notify_workers("resync", {"created_before": result["removed_before"]})
+    else:
+        db_manager.create_tables()
+        result = {"legacy_partition": manager.migrate()}
+        db_manager.create_tables()
+        result["indexes_created"] = db_manager.create_missing_indexes()
+        result.update(manager.status())
+    print(json.dumps(result, indent=2, default=str))
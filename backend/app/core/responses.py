@@ -0,0 +1,21 @@
+"""Classes de resposta HTTP da API."""
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic_core import to_json
+
+
+class PydanticJSONResponse(JSONResponse):
+    """
+    Resposta JSON para modelos Pydantic já validados.
+
+    O conteúdo é serializado direto para bytes pelo serializador do
+    pydantic-core (em Rust), sem passar por dicionários intermediários nem
+    pelo módulo `json`. Como o FastAPI não valida de novo respostas que já
+    são `Response`, as rotas que a retornam mantêm o `response_model` apenas
+    para a documentação OpenAPI.
+    """
+
+    def render(self, content: Any) -> bytes:
+        """Serializa modelos Pydantic, listas e dicionários para JSON em UTF-8."""
+        return to_json(content)
@@ -1,27 +1,49 @@
 """Serviço de IA para classificação e processamento de emails."""
-from typing import Dict, Any
-import re, json
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional
+import itertools
+import time
 from openai import OpenAI
 from openai.types.chat import ChatCompletion
 
 from app.core.config import settings
+from app.integrations.example_index import example_index, validated_search
+from app.integrations.resilience import llm_resilience, LLMUnavailableError
+from app.repositories.email_repository import EmailRepository
+from app.utils.json_stream import IncrementalJsonParser
+from app.utils.text_preprocessor import text_preprocessor
 
-from nltk.corpus import stopwords
-from nltk.stem import RSLPStemmer
-from nltk.tokenize import word_tokenize
-import nltk
 
-nltk.download('rslp')
-nltk.download('stopwords')
-nltk.download('punkt_tab')
+_openai_client: Optional[OpenAI] = None
+
+
+def get_openai_client() -> OpenAI:
+    """Cliente OpenAI do processo, criado no primeiro uso e reaproveitado (pool de conexões HTTP)."""
+    global _openai_client
+    if _openai_client is None:
+        # Retentativas ficam a cargo de `llm_resilience`
+        _openai_client = OpenAI(api_key=settings.openai_api_key, max_retries=0)
+    return _openai_client
+
+
+def reset_openai_client() -> None:
+    """Descarta o cliente herdado do processo pai após um fork; o próximo uso cria outro."""
+    global _openai_client
+    _openai_client = None
 
 
 class OpenAIIntegration:
     """Serviço para operações de IA utilizando OpenAI."""
 
+    UNCLASSIFIED_RESPONSE = {
+        "classification": "",
+        "suggested_reply": "Classificação pendente: serviço de IA indisponível"
+    }
+
     def __init__(self):
         """Inicializa o serviço de IA com a configuração da API."""
-        self.client = OpenAI(api_key=settings.openai_api_key)
+        self.client = get_openai_client()
+        self.last_metrics: Dict[str, Any] = {}
         self.training_examples = [
             {
                 "email": "Preciso de ajuda com o sistema que não está funcionando",
@@ -45,32 +67,45 @@ class OpenAIIntegration:
             }
         ]
 
-    def classify_email(self, email_text: str) -> Dict[str, Any]:
+    def classify_email(self, email_text: str, exclude_example_id: Optional[int] = None) -> Dict[str, Any]:
         """
         Classifica um email como PRODUTIVO ou IMPRODUTIVO e sugere uma resposta.
         
         Args:
             email_text: Texto do email a ser classificado
+            exclude_example_id: ID de submissão que não deve ser usado como exemplo
+                (a própria linha, em reclassificações)
             
         Returns:
-            Dicionário com classificação e sugestão extraída
+            Dicionário com classificação e sugestão extraída. Se a IA estiver
+            indisponível (circuito aberto, sobrecarga ou prazo esgotado), retorna
+            o email como não classificado em vez de falhar.
             
         Raises:
             ValueError: Se o texto do email estiver vazio
-            Exception: Para erros da API do OpenAI
+            Exception: Para erros não transitórios da API do OpenAI
         """
 
         try:
             processed_text = self._preprocess_text(email_text, advanced_preprocessing=True)
 
-            prompt = self._build_dynamic_prompt(processed_text)
+            prompt = self._build_dynamic_prompt(processed_text, exclude_example_id)
 
-            response: ChatCompletion = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0,
-                max_tokens=500
-            )
+            started_at = time.perf_counter()
+            try:
+                response: ChatCompletion = llm_resilience.call(
+                    lambda timeout: self.client.chat.completions.create(
+                        model="gpt-4",
+                        messages=[{"role": "user", "content": prompt}],
+                        temperature=0,
+                        max_tokens=500,
+                        timeout=timeout
+                    )
+                )
+            except LLMUnavailableError as e:
+                print(f"IA indisponível, email salvo sem classificação: {str(e)}")
+                return dict(self.UNCLASSIFIED_RESPONSE)
+            self._record_llm_latency(started_at)
             
             ai_response = response.choices[0].message.content
             
@@ -85,76 +120,217 @@ class OpenAIIntegration:
             print("Erro ao classificar email")
             raise e
 
-    def _parse_ai_response(self, ai_response: str) -> Dict[str, str]:
+    def stream_classify_email(self, email_text: str) -> Iterator[Dict[str, Any]]:
         """
-        Extrai a classificação e sugestão de resposta da resposta JSON da IA.
+        Variante em streaming de `classify_email`.
+        
+        Emite eventos conforme a resposta da IA é decodificada:
+        - {"event": "classification", "classification": ...} assim que a categoria é lida
+        - {"event": "reply_delta", "text": ...} para cada trecho da sugestão de resposta
+        - {"event": "result", "classification": ..., "suggested_reply": ...} ao final
+        
+        O evento `result` é sempre o último e traz os valores definitivos, com o
+        mesmo tratamento de falhas de `_parse_ai_response` e de indisponibilidade
+        da IA de `classify_email`.
+        
+        Raises:
+            Exception: Para erros não transitórios da API do OpenAI
         """
         try:
-            if not ai_response:
-                return {"classification": "IMPRODUTIVO", "suggested_reply": "Nenhuma sugestão extraída"}
-            
-            data = json.loads(ai_response)
+            processed_text = self._preprocess_text(email_text, advanced_preprocessing=True)
+
+            prompt = self._build_dynamic_prompt(processed_text)
+
+            started_at = time.perf_counter()
+            stream = llm_resilience.stream(
+                lambda timeout: self.client.chat.completions.create(
+                    model="gpt-4",
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0,
+                    max_tokens=500,
+                    stream=True,
+                    timeout=timeout
+                )
+            )
 
-            classification = data.get("classification", "Improdutivo").upper()
-            suggested_reply = data.get("suggested_reply", "Nenhuma sugestão extraída")
+            parser = IncrementalJsonParser()
+            received_content = False
+            parse_failed = False
+            classification_sent = False
 
-            return {
-                "classification": classification,
-                "suggested_reply": suggested_reply
+            try:
+                first_chunk = next(stream, None)
+            except LLMUnavailableError as e:
+                print(f"IA indisponível, email salvo sem classificação: {str(e)}")
+                yield {"event": "classification", "classification": self.UNCLASSIFIED_RESPONSE["classification"]}
+                yield {"event": "result", **self.UNCLASSIFIED_RESPONSE}
+                return
+
+            for chunk in itertools.chain([first_chunk] if first_chunk is not None else [], stream):
+                if not chunk.choices or parse_failed:
+                    continue
+                content = chunk.choices[0].delta.content
+                if not content:
+                    continue
+                received_content = True
+                try:
+                    events = parser.feed(content)
+                except ValueError as e:
+                    print(f"Erro ao interpretar resposta da IA: {e}")
+                    parse_failed = True
+                    continue
+
+                for kind, key, value in events:
+                    if kind == "value_delta" and key == "suggested_reply":
+                        yield {"event": "reply_delta", "text": value}
+                    elif kind == "value" and key == "classification" and isinstance(value, str) and not classification_sent:
+                        classification_sent = True
+                        yield {"event": "classification", "classification": self._normalize_classification(value)}
+
+            self._record_llm_latency(started_at)
+
+            if not received_content:
+                parsed_response = {"classification": "IMPRODUTIVO", "suggested_reply": "Nenhuma sugestão extraída"}
+            elif parse_failed:
+                parsed_response = self._parse_error_response()
+            else:
+                try:
+                    parsed_response = self._parse_ai_values(parser)
+                except Exception as e:
+                    print(f"Erro ao interpretar resposta da IA: {e}")
+                    parsed_response = self._parse_error_response()
+
+            if not classification_sent:
+                yield {"event": "classification", "classification": parsed_response["classification"]}
+
+            yield {
+                "event": "result",
+                "classification": parsed_response["classification"],
+                "suggested_reply": parsed_response["suggested_reply"]
             }
 
         except Exception as e:
-            print(f"Erro ao interpretar resposta da IA: {e}")
-            return {
-                "classification": "INDEFINIDO",
-                "suggested_reply": "Erro ao interpretar resposta da IA"
-            }
+            print("Erro ao classificar email")
+            raise e
+
+    def remember_example(
+        self,
+        submission_id: int,
+        email_text: str,
+        email_type: str,
+        classification: str,
+        reply: str,
+        created_at: Optional[datetime] = None
+    ) -> None:
+        """Adiciona uma submissão recém-classificada ao índice de exemplos few-shot."""
+        if email_type != "Texto puro" or classification not in ("PRODUTIVO", "IMPRODUTIVO"):
+            return
+        try:
+            example_index.add(
+                submission_id, self.preprocess_for_index(email_text), email_text, classification, reply, created_at
+            )
+        except Exception as e:
+            print(f"Erro ao indexar exemplo: {str(e)}")
 
+    @staticmethod
+    def preprocess_for_index(text: str) -> str:
+        """Pré-processamento usado para indexar e consultar exemplos few-shot."""
+        return OpenAIIntegration._preprocess_text(text, advanced_preprocessing=True)
 
-    def _preprocess_text(self, text: str, advanced_preprocessing: bool = False) -> str:
+    def _select_examples(self, processed_text: str, exclude_example_id: Optional[int] = None) -> List[Dict[str, str]]:
         """
-        Pré-processamento NLP conforme especificações do desafio.
+        Seleciona os exemplos few-shot mais similares ao email dentro do orçamento de tokens.
         
-        Técnicas aplicadas:
-        1. Tokenização - Divisão em palavras individuais
-        2. Normalização - Conversão para lowercase
-        3. Remoção de stopwords - Remove palavras sem valor semântico
-        4. Stemming - Reduz palavras ao radical para generalização
-        5. Filtragem - Remove tokens não alfabéticos e muito curtos
+        Os exemplos encontrados no índice são conferidos com o banco. Usa os
+        exemplos fixos de `training_examples` quando nenhum é encontrado.
         """
-        if not text or not text.strip():
-            return ""
-        
-        text = re.sub(r'http[s]?://\S+', '[URL]', text)
-        text = re.sub(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', '[EMAIL]', text)
-        text = re.sub(r'\s+', ' ', text)
-    
-        if advanced_preprocessing:
-            stemmer = RSLPStemmer()
-            stop_words = set(stopwords.words("portuguese"))
-            
-            tokens = word_tokenize(text.lower())
-            tokens = [
-                stemmer.stem(w) for w in tokens 
-                if w.isalpha() and w not in stop_words and len(w) > 2
-            ]
-            return " ".join(tokens)
+        started_at = time.perf_counter()
+        examples = validated_search(
+            processed_text,
+            k=settings.few_shot_k,
+            token_budget=settings.few_shot_token_budget,
+            exclude_id=exclude_example_id
+        )
+        self.last_metrics = {
+            "retrieval_ms": round((time.perf_counter() - started_at) * 1000, 2),
+            "retrieved_examples": len(examples)
+        }
+        return examples or self.training_examples
+
+    def _record_llm_latency(self, started_at: float) -> None:
+        """Registra a latência da chamada à IA e, em modo debug, imprime as métricas do prompt."""
+        self.last_metrics["llm_ms"] = round((time.perf_counter() - started_at) * 1000, 1)
+        if settings.debug:
+            print(f"Métricas de classificação: {self.last_metrics}")
+
+    def _parse_ai_response(self, ai_response: str) -> Dict[str, str]:
+        """
+        Extrai a classificação e sugestão de resposta da resposta JSON da IA.
+        """
+        if not ai_response:
+            return {"classification": "IMPRODUTIVO", "suggested_reply": "Nenhuma sugestão extraída"}
+
+        try:
+            parser = IncrementalJsonParser()
+            parser.feed(ai_response)
+            return self._parse_ai_values(parser)
+
+        except Exception as e:
+            print(f"Erro ao interpretar resposta da IA: {e}")
+            return self._parse_error_response()
+
+    def _parse_ai_values(self, parser: IncrementalJsonParser) -> Dict[str, str]:
+        """
+        Extrai classificação e sugestão de um parser que já recebeu toda a resposta.
         
-        return text.strip()
+        Raises:
+            ValueError: Se a resposta não for um objeto JSON completo
+        """
+        data = parser.close()
+
+        return {
+            "classification": self._normalize_classification(data.get("classification", "Improdutivo")),
+            "suggested_reply": data.get("suggested_reply", "Nenhuma sugestão extraída")
+        }
+
+    @staticmethod
+    def _normalize_classification(classification: str) -> str:
+        """Normaliza a classificação retornada pela IA para o formato armazenado."""
+        return EmailRepository.normalize_classification(classification)
+
+    @staticmethod
+    def _parse_error_response() -> Dict[str, str]:
+        """Resposta padrão quando a saída da IA não pode ser interpretada."""
+        return {
+            "classification": "INDEFINIDO",
+            "suggested_reply": "Erro ao interpretar resposta da IA"
+        }
+
+
+    @staticmethod
+    def _preprocess_text(text: str, advanced_preprocessing: bool = False) -> str:
+        """
+        Pré-processamento NLP conforme especificações do desafio.
+
+        Delega para `text_preprocessor`, que aplica tokenização, normalização,
+        remoção de stopwords, stemming e filtragem com padrões pré-compilados
+        e cache de radicais.
+        """
+        return text_preprocessor.preprocess(text, advanced_preprocessing)
 
-    def _build_dynamic_prompt(self, email_text: str) -> str:
+    def _build_dynamic_prompt(self, email_text: str, exclude_example_id: Optional[int] = None) -> str:
         """
-        Constrói prompt dinâmico usando os exemplos de treinamento.
+        Constrói prompt dinâmico usando os exemplos mais similares ao email.
         """
         examples_text = ""
-        for example in self.training_examples:
+        for example in self._select_examples(email_text, exclude_example_id):
             examples_text += f"""
             Email: "{example['email']}"
             Categoria: {example['classification']}
             Sugestão de resposta: "{example['reply']}"
             """
         
-        return f"""
+        prompt = f"""
             Você é um assistente especializado em classificação de emails corporativos.
 
             DEFINIÇÕES:
@@ -179,3 +355,6 @@ class OpenAIIntegration:
             "suggested_reply": "<texto ou 'Nenhuma ação necessária'>"
             }}
         """
+        self.last_metrics["prompt_chars"] = len(prompt)
+        self.last_metrics["prompt_tokens_estimate"] = example_index.estimate_tokens(prompt)
+        return prompt
@@ -0,0 +1,485 @@
+"""Índice local de exemplos rotulados para seleção dinâmica de few-shot."""
+import heapq
+import json
+import math
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.core.config import settings
+
+
+class ExampleIndex:
+    """
+    Índice invertido BM25 construído a partir das submissões já classificadas.
+
+    Os documentos são os textos pré-processados (radicais) das submissões, e a
+    busca retorna os exemplos mais parecidos com o email a ser classificado.
+    O índice é atualizado incrementalmente a cada inserção/exclusão e pode ser
+    salvo em disco para que os workers não precisem reconstruí-lo do zero.
+    Como cada worker tem sua própria cópia, os resultados de uma busca devem
+    ser conferidos com o banco (`reconcile`) antes de entrarem no prompt, e as
+    submissões criadas ou reclassificadas por outros processos são indexadas
+    pela sincronização incremental (`mark_stale` + `sync_from_repository`).
+
+    Cada rótulo guarda no máximo `max_per_label` exemplos; ao passar do
+    limite, os exemplos indexados há mais tempo são descartados.
+    """
+
+    LABELS = ("PRODUTIVO", "IMPRODUTIVO")
+    K1 = 1.5
+    B = 0.75
+    CHARS_PER_TOKEN = 4
+
+    def __init__(self, max_example_chars: int = 400, max_reply_chars: int = 300, max_per_label: int = 0):
+        """
+        Inicializa um índice vazio.
+
+        Args:
+            max_example_chars: Tamanho máximo do email guardado por exemplo
+            max_reply_chars: Tamanho máximo da sugestão guardada por exemplo
+            max_per_label: Quantidade máxima de exemplos por rótulo (0 = sem limite)
+        """
+        self.max_example_chars = max_example_chars
+        self.max_reply_chars = max_reply_chars
+        self.max_per_label = max_per_label
+        self.max_id = 0
+        self._docs: Dict[int, Dict[str, Any]] = {}
+        # IDs de cada rótulo na ordem em que foram indexados (dict como conjunto ordenado)
+        self._label_ids: Dict[str, Dict[int, None]] = {}
+        self._stale_ids: set = set()
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(
+        self,
+        example_id: int,
+        processed_text: str,
+        email: str,
+        classification: str,
+        reply: str,
+        created_at: Optional[datetime] = None
+    ) -> None:
+        """
+        Adiciona (ou substitui) um exemplo rotulado.
+
+        Args:
+            example_id: ID da submissão
+            processed_text: Texto pré-processado usado na indexação
+            email: Texto original do email, exibido no prompt
+            classification: Classificação atribuída
+            reply: Sugestão de resposta atribuída
+            created_at: Data de criação da submissão, usada por `remove_created_before`
+        """
+        terms = Counter(processed_text.split())
+        if terms:
+            self._insert(example_id, terms, email, classification, reply, created_at)
+
+    def remove(self, example_ids: Iterable[int]) -> None:
+        """Remove exemplos do índice."""
+        with self._lock:
+            for example_id in example_ids:
+                self._remove_locked(example_id)
+
+    def remove_created_before(self, cutoff: datetime) -> int:
+        """
+        Remove os exemplos de submissões criadas antes de `cutoff` (ex.:
+        partições apagadas pela retenção).
+
+        Exemplos sem data (snapshots antigos) ficam no índice e são
+        descartados por `reconcile` quando aparecerem em uma busca.
+
+        Returns:
+            Quantidade de exemplos removidos
+        """
+        cutoff = self._aware(cutoff)
+        with self._lock:
+            expired = [
+                doc_id for doc_id, doc in self._docs.items()
+                if doc["created_at"] is not None and doc["created_at"] < cutoff
+            ]
+            for doc_id in expired:
+                self._remove_locked(doc_id)
+        return len(expired)
+
+    def mark_stale(self, example_ids: Iterable[int]) -> None:
+        """
+        Marca submissões criadas ou alteradas por outro processo para serem
+        (re)indexadas na próxima sincronização.
+        """
+        with self._lock:
+            self._stale_ids.update(example_ids)
+
+    def handle_event(self, event_type: str, payload: str) -> None:
+        """
+        Acompanha os eventos de submissões publicados por todos os workers.
+
+        Exclusões (e o `resync` da retenção, com `created_before`) saem do
+        índice na hora; criações e atualizações só marcam os IDs, que são
+        lidos do banco e pré-processados fora do event loop pela
+        sincronização periódica.
+        """
+        if event_type not in ("submission.created", "submission.updated", "submission.deleted", "resync"):
+            return
+        data = json.loads(payload).get("data", {})
+        if event_type == "resync":
+            if data.get("created_before"):
+                self.remove_created_before(datetime.fromisoformat(data["created_before"]))
+        elif event_type == "submission.deleted":
+            self.remove(data.get("ids", []))
+        elif event_type == "submission.updated":
+            self.mark_stale(data.get("ids", []))
+        else:
+            submission_id = data["submission"]["id"] if "submission" in data else data.get("id")
+            # Criações deste worker já foram indexadas por `remember_example`
+            if submission_id is not None and submission_id not in self._docs:
+                self.mark_stale([submission_id])
+
+    def search(
+        self,
+        processed_text: str,
+        k: int,
+        token_budget: int,
+        exclude_id: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Retorna até `k` exemplos mais similares cujo tamanho somado cabe no orçamento de tokens.
+
+        Args:
+            processed_text: Texto pré-processado do email a ser classificado
+            k: Quantidade máxima de exemplos
+            token_budget: Orçamento aproximado de tokens para os exemplos
+            exclude_id: ID a ser ignorado (ex.: a própria submissão em reclassificações)
+        """
+        query_terms = set(processed_text.split())
+        if not query_terms or k <= 0:
+            return []
+
+        with self._lock:
+            doc_count = len(self._docs)
+            if not doc_count:
+                return []
+            average_length = self._total_length / doc_count
+
+            scores: Dict[int, float] = {}
+            for term in query_terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, count in postings.items():
+                    length = self._docs[doc_id]["length"]
+                    norm = count + self.K1 * (1 - self.B + self.B * length / average_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * count * (self.K1 + 1) / norm
+
+            scores.pop(exclude_id, None)
+            ranked = heapq.nlargest(max(k * 4, k), scores.items(), key=lambda item: item[1])
+
+            selected = []
+            remaining = token_budget
+            for doc_id, score in ranked:
+                doc = self._docs[doc_id]
+                cost = self.estimate_tokens(doc["email"]) + self.estimate_tokens(doc["reply"])
+                if cost > remaining:
+                    continue
+                selected.append({
+                    "id": doc_id,
+                    "email": doc["email"],
+                    "classification": doc["classification"],
+                    "reply": doc["reply"],
+                    "score": score
+                })
+                remaining -= cost
+                if len(selected) >= k:
+                    break
+
+        return selected
+
+    def reconcile(self, examples: List[Dict[str, Any]], current: Dict[int, Any]) -> List[Dict[str, Any]]:
+        """
+        Ajusta resultados de `search` ao estado atual das submissões.
+
+        Exemplos cujas submissões não existem mais ou deixaram de ter um rótulo
+        válido são descartados e removidos do índice; exemplos reclassificados
+        passam a usar (e o índice passa a guardar) a classificação e a
+        sugestão atuais.
+
+        Args:
+            examples: Resultados de `search`
+            current: Linhas atuais por ID, com `ai_classification` e `ai_suggested_reply`
+        """
+        valid = []
+        with self._lock:
+            for example in examples:
+                row = current.get(example["id"])
+                if row is None or row.ai_classification not in self.LABELS:
+                    self._remove_locked(example["id"])
+                    continue
+
+                reply = (row.ai_suggested_reply or "")[:self.max_reply_chars]
+                if row.ai_classification != example["classification"] or reply != example["reply"]:
+                    doc = self._docs.get(example["id"])
+                    if doc is not None:
+                        if doc["classification"] != row.ai_classification:
+                            self._label_ids[doc["classification"]].pop(example["id"], None)
+                            self._track_label_locked(example["id"], row.ai_classification)
+                        doc["classification"] = row.ai_classification
+                        doc["reply"] = reply
+                    example = {**example, "classification": row.ai_classification, "reply": reply}
+                valid.append(example)
+        return valid
+
+    def save(self, path: str) -> None:
+        """Salva o índice em disco (escrita atômica)."""
+        with self._lock:
+            snapshot = {
+                "max_id": self.max_id,
+                "docs": {
+                    str(doc_id): {
+                        **{key: doc[key] for key in ("email", "classification", "reply", "terms")},
+                        "created_at": doc["created_at"].isoformat() if doc["created_at"] else None
+                    }
+                    for doc_id, doc in self._docs.items()
+                }
+            }
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    def load(self, path: str) -> None:
+        """Carrega um índice salvo com `save`, substituindo o conteúdo atual."""
+        with open(path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+
+        with self._lock:
+            self._docs.clear()
+            self._postings.clear()
+            self._label_ids.clear()
+            self._total_length = 0
+            self.max_id = 0
+
+        for doc_id, doc in snapshot["docs"].items():
+            created_at = datetime.fromisoformat(doc["created_at"]) if doc.get("created_at") else None
+            self._insert(int(doc_id), doc["terms"], doc["email"], doc["classification"], doc["reply"], created_at)
+        self.max_id = max(self.max_id, snapshot.get("max_id", 0))
+
+    def sync_from_repository(self, email_repository, preprocess_many, batch_size: int = 1000) -> int:
+        """
+        Indexa as submissões rotuladas com ID maior que o último sincronizado
+        e reindexa as marcadas com `mark_stale`.
+
+        IDs marcados que não existem mais ou deixaram de ter um rótulo válido
+        saem do índice.
+
+        Args:
+            email_repository: Repositório de emails
+            preprocess_many: Função que converte uma lista de textos nos textos pré-processados
+            batch_size: Tamanho dos lotes lidos do banco e pré-processados de uma vez
+
+        Returns:
+            Quantidade de exemplos adicionados
+        """
+        with self._lock:
+            stale_ids = sorted(self._stale_ids)
+            self._stale_ids.clear()
+
+        added = 0
+        for start in range(0, len(stale_ids), batch_size):
+            ids = stale_ids[start:start + batch_size]
+            rows = email_repository.get_labeled_examples(ids)
+            found = {row.id for row in rows}
+            self.remove([example_id for example_id in ids if example_id not in found])
+            if rows:
+                added += self._add_rows(rows, preprocess_many, advance=False)
+
+        batch = []
+        for row in email_repository.iter_labeled_examples(after_id=self.max_id, batch_size=batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                added += self._add_rows(batch, preprocess_many)
+                batch = []
+        if batch:
+            added += self._add_rows(batch, preprocess_many)
+        return added
+
+    def _add_rows(self, rows: List[Any], preprocess_many, advance: bool = True) -> int:
+        """
+        Pré-processa um lote de linhas de uma vez e as adiciona ao índice.
+
+        Com `advance`, o lote faz parte da varredura por ID e avança `max_id`.
+        """
+        processed_texts = preprocess_many([row.message for row in rows])
+        for row, processed_text in zip(rows, processed_texts):
+            self.add(row.id, processed_text, row.message, row.ai_classification, row.ai_suggested_reply, row.created_at)
+            if advance:
+                self.max_id = max(self.max_id, row.id)
+        return len(rows)
+
+    @classmethod
+    def estimate_tokens(cls, text: str) -> int:
+        """Estimativa barata da quantidade de tokens de um texto."""
+        return len(text) // cls.CHARS_PER_TOKEN + 1
+
+    @staticmethod
+    def _aware(value: datetime) -> datetime:
+        """Datas sem fuso (ex.: SQLite) são tratadas como UTC, para poderem ser comparadas."""
+        return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+    def _insert(
+        self,
+        example_id: int,
+        terms: Dict[str, int],
+        email: str,
+        classification: str,
+        reply: str,
+        created_at: Optional[datetime] = None
+    ) -> None:
+        """
+        Insere um exemplo a partir da contagem de termos já calculada.
+
+        Não avança `max_id`: exemplos adicionados fora da varredura por ID
+        (ex.: `remember_example`) não podem fazer a sincronização pular as
+        submissões de ID menor criadas por outros workers.
+        """
+        with self._lock:
+            self._remove_locked(example_id)
+            length = sum(terms.values())
+            self._docs[example_id] = {
+                "email": email[:self.max_example_chars],
+                "classification": classification,
+                "reply": reply[:self.max_reply_chars],
+                "terms": dict(terms),
+                "length": length,
+                "created_at": self._aware(created_at) if created_at else None
+            }
+            for term, count in terms.items():
+                self._postings.setdefault(term, {})[example_id] = count
+            self._total_length += length
+            self._track_label_locked(example_id, classification)
+
+    def _track_label_locked(self, example_id: int, classification: str) -> None:
+        """
+        Registra o rótulo de um exemplo e descarta os mais antigos do rótulo
+        acima do limite; deve ser chamado com o lock adquirido.
+        """
+        label_ids = self._label_ids.setdefault(classification, {})
+        label_ids[example_id] = None
+        while self.max_per_label and len(label_ids) > self.max_per_label:
+            self._remove_locked(next(iter(label_ids)))
+
+    def _remove_locked(self, example_id: int) -> None:
+        """Remove um exemplo; deve ser chamado com o lock adquirido."""
+        doc = self._docs.pop(example_id, None)
+        if not doc:
+            return
+        self._label_ids.get(doc["classification"], {}).pop(example_id, None)
+        for term in doc["terms"]:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(example_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= doc["length"]
+
+
+example_index = ExampleIndex(max_per_label=settings.few_shot_index_max_per_label)
+
+
+def load_example_index(load_snapshot: bool = True) -> None:
+    """
+    Prepara o índice global: carrega o snapshot em disco (se configurado) e
+    indexa as submissões mais recentes que ele ainda não contém.
+    
+    Args:
+        load_snapshot: False quando o índice já foi carregado (por exemplo,
+            herdado do processo pai) e só falta a sincronização incremental
+    """
+    from app.core.database import db_manager
+    from app.repositories.email_repository import EmailRepository
+    from app.utils.text_preprocessor import text_preprocessor
+
+    try:
+        if load_snapshot and settings.few_shot_index_path and os.path.exists(settings.few_shot_index_path):
+            example_index.load(settings.few_shot_index_path)
+
+        db = db_manager.SessionLocal()
+        try:
+            example_index.sync_from_repository(EmailRepository(db), text_preprocessor.preprocess_many)
+        finally:
+            db.close()
+    except Exception as e:
+        print(f"Erro ao carregar índice de exemplos: {str(e)}")
+
+
+def validated_search(processed_text: str, k: int, token_budget: int, exclude_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Busca no índice global e confere os resultados com o banco.
+
+    Faz uma consulta por chave primária para os IDs encontrados. Se o banco
+    estiver inacessível, nenhum exemplo do índice é usado.
+    """
+    from app.core.database import db_manager
+    from app.repositories.email_repository import EmailRepository
+
+    examples = example_index.search(processed_text, k=k, token_budget=token_budget, exclude_id=exclude_id)
+    if not examples:
+        return examples
+
+    try:
+        db = db_manager.SessionLocal()
+        try:
+            current = EmailRepository(db).get_example_labels([example["id"] for example in examples])
+        finally:
+            db.close()
+    except Exception as e:
+        print(f"Erro ao validar exemplos few-shot: {str(e)}")
+        return []
+    return example_index.reconcile(examples, current)
+
+
+def rebuild_index(path: str, workers: int = 1) -> None:
+    """Reconstrói o índice a partir do banco de dados e o salva em `path`."""
+    from app.core.database import db_manager
+    from app.repositories.email_repository import EmailRepository
+    from app.utils.text_preprocessor import text_preprocessor
+
+    started_at = time.perf_counter()
+    index = ExampleIndex(max_per_label=settings.few_shot_index_max_per_label)
+
+    def preprocess(texts: List[str]) -> List[str]:
+        return text_preprocessor.preprocess_many(texts, workers=workers)
+
+    db = db_manager.SessionLocal()
+    try:
+        added = index.sync_from_repository(EmailRepository(db), preprocess)
+    finally:
+        db.close()
+
+    index.save(path)
+    elapsed = time.perf_counter() - started_at
+    print(f"Índice reconstruído com {added} exemplos em {elapsed:.1f}s: {path}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Reconstrói o índice de exemplos few-shot a partir do banco.")
+    parser.add_argument("--path", default=settings.few_shot_index_path, help="Arquivo de saída do índice")
+    parser.add_argument("--workers", type=int, default=1, help="Processos usados no pré-processamento dos textos")
+    args = parser.parse_args()
+
+    if not args.path:
+        parser.error("Informe --path ou configure FEW_SHOT_INDEX_PATH")
+    rebuild_index(args.path, workers=args.workers)
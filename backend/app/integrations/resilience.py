@@ -0,0 +1,333 @@
+"""Camada de resiliência para chamadas à IA: limite adaptativo, retentativas e circuit breaker."""
+import random
+import threading
+import time
+from typing import Any, Callable, Iterator, Optional
+
+import openai
+
+from app.core.config import settings
+
+
+class LLMUnavailableError(Exception):
+    """A IA não está disponível no momento (circuito aberto, sobrecarga ou prazo esgotado)."""
+
+
+class CircuitOpenError(LLMUnavailableError):
+    """O circuito está aberto e as chamadas estão sendo recusadas."""
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Limite de chamadas simultâneas ajustado por AIMD.
+
+    Cada resposta rápida aumenta o limite em ~1 a cada janela de chamadas
+    (aumento aditivo); respostas 429, timeouts ou latência acima do alvo
+    reduzem o limite pela metade (redução multiplicativa).
+    """
+
+    def __init__(self, initial_limit: float, min_limit: float, max_limit: float, latency_target_seconds: float):
+        """Inicializa o limitador."""
+        self.limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target_seconds = latency_target_seconds
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, timeout: float) -> None:
+        """
+        Aguarda uma vaga para uma nova chamada.
+
+        Raises:
+            LLMUnavailableError: Se não houver vaga dentro do prazo
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise LLMUnavailableError("Limite de chamadas simultâneas à IA atingido")
+                self._condition.wait(remaining)
+            self.in_flight += 1
+
+    def release(self, latency_seconds: float, overloaded: bool = False) -> None:
+        """Libera a vaga e ajusta o limite conforme o resultado observado."""
+        with self._condition:
+            self.in_flight -= 1
+            if overloaded or latency_seconds > self.latency_target_seconds:
+                self.limit = max(self.min_limit, self.limit / 2)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por chamadas que falharam em sequência.
+
+    Cada chamada lógica conta no máximo uma falha, independentemente de
+    quantas retentativas fez. Após `failure_threshold` falhas seguidas o
+    circuito abre e recusa chamadas por `reset_timeout_seconds`; depois disso
+    uma única chamada de teste é liberada (meio-aberto), sem retentativas, e
+    seu resultado fecha ou reabre o circuito.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout_seconds: float):
+        """Inicializa o circuito fechado."""
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def admit(self) -> Optional[str]:
+        """
+        Decide se uma nova chamada pode ser feita.
+
+        Returns:
+            CLOSED para uma chamada normal, HALF_OPEN para a chamada de teste,
+            ou None se a chamada deve ser recusada
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return self.CLOSED
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout_seconds:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return self.HALF_OPEN
+            return None
+
+    def is_closed(self) -> bool:
+        """Indica se o circuito está fechado (retentativas só fazem sentido nesse estado)."""
+        with self._lock:
+            return self.state == self.CLOSED
+
+    def record_success(self) -> None:
+        """Registra uma chamada bem-sucedida e fecha o circuito."""
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        """Registra uma chamada que falhou e abre o circuito se o limite for atingido."""
+        with self._lock:
+            self.failures += 1
+            if self.state == self.OPEN:
+                # Já aberto por outra chamada: não prolonga o tempo de espera
+                return
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """Libera a chamada de teste que terminou sem chegar à IA (ex.: sem vaga no limitador)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+
+class ResilientCaller:
+    """Executa chamadas à IA com limite adaptativo, retentativas com jitter, prazo e circuit breaker."""
+
+    RETRYABLE_ERRORS = (
+        openai.RateLimitError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.InternalServerError
+    )
+
+    # Erros não transitórios de autenticação ou configuração (chave inválida,
+    # sem permissão, modelo inexistente): afetam todas as chamadas, então
+    # contam como falha no circuito, mas não são repetidos
+    BREAKER_FAILURE_ERRORS = (
+        openai.AuthenticationError,
+        openai.PermissionDeniedError,
+        openai.NotFoundError
+    )
+
+    def __init__(
+        self,
+        limiter: AdaptiveConcurrencyLimiter,
+        breaker: CircuitBreaker,
+        max_attempts: int,
+        timeout_seconds: float,
+        backoff_base_seconds: float = 0.5,
+        backoff_max_seconds: float = 8.0
+    ):
+        """Inicializa o executor."""
+        self.limiter = limiter
+        self.breaker = breaker
+        self.max_attempts = max_attempts
+        self.timeout_seconds = timeout_seconds
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+
+    def call(self, request: Callable[[float], Any]) -> Any:
+        """
+        Executa `request(timeout)` com a política de resiliência.
+
+        Args:
+            request: Função que faz a chamada à IA recebendo o tempo restante até o prazo
+
+        Raises:
+            CircuitOpenError: Se o circuito estiver aberto
+            LLMUnavailableError: Se as retentativas ou o prazo se esgotarem
+        """
+        with self._attempts(request) as attempt:
+            return attempt.result
+
+    def stream(self, request: Callable[[float], Iterator[Any]]) -> Iterator[Any]:
+        """
+        Variante de `call` para respostas em streaming.
+
+        Retentativas só ocorrem antes do primeiro trecho; a vaga no limitador é
+        mantida até o fim do stream.
+        """
+        with self._attempts(request) as attempt:
+            yield from attempt.result
+
+    def _attempts(self, request: Callable[[float], Any]) -> "_Attempt":
+        """Cria o contexto de tentativas para uma chamada."""
+        return _Attempt(self, request)
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """Tempo de espera antes da próxima tentativa (Retry-After ou backoff exponencial com jitter)."""
+        retry_after = self._retry_after(error)
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** attempt))
+
+    @staticmethod
+    def _retry_after(error: Exception) -> Optional[float]:
+        """Lê os headers Retry-After / retry-after-ms de uma resposta de erro."""
+        response = getattr(error, "response", None)
+        if response is None:
+            return None
+        try:
+            if "retry-after-ms" in response.headers:
+                return float(response.headers["retry-after-ms"]) / 1000
+            if "retry-after" in response.headers:
+                return float(response.headers["retry-after"])
+        except ValueError:
+            return None
+        return None
+
+
+class _Attempt:
+    """Contexto que realiza as tentativas de uma chamada e libera os recursos ao sair."""
+
+    def __init__(self, caller: ResilientCaller, request: Callable[[float], Any]):
+        self.caller = caller
+        self.request = request
+        self.result = None
+        self._started_at = 0.0
+        self._probe = False
+
+    def __enter__(self) -> "_Attempt":
+        caller = self.caller
+        admission = caller.breaker.admit()
+        if admission is None:
+            raise CircuitOpenError("Serviço de IA temporariamente indisponível (circuito aberto)")
+        probe = self._probe = admission == CircuitBreaker.HALF_OPEN
+
+        deadline = time.monotonic() + caller.timeout_seconds
+        last_error: Optional[Exception] = None
+        settled = False
+        try:
+            for attempt in range(caller.max_attempts):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+
+                caller.limiter.acquire(timeout=remaining)
+                self._started_at = time.monotonic()
+                try:
+                    self.result = self.request(deadline - time.monotonic())
+                    # O resultado é registrado no circuito em __exit__
+                    settled = True
+                    return self
+                except caller.RETRYABLE_ERRORS as e:
+                    overloaded = isinstance(e, (openai.RateLimitError, openai.APITimeoutError))
+                    caller.limiter.release(time.monotonic() - self._started_at, overloaded=overloaded)
+                    last_error = e
+                    print(f"Falha transitória na chamada à IA (tentativa {attempt + 1}): {str(e)}")
+
+                    delay = caller._backoff(attempt, e)
+                    if (
+                        probe
+                        or attempt + 1 >= caller.max_attempts
+                        or time.monotonic() + delay >= deadline
+                        or not caller.breaker.is_closed()
+                    ):
+                        break
+                    time.sleep(delay)
+                except Exception as e:
+                    caller.limiter.release(time.monotonic() - self._started_at)
+                    settled = True
+                    self._record_non_retryable(e)
+                    raise
+        finally:
+            if not settled:
+                # Uma única falha por chamada lógica, qualquer que seja o número de tentativas
+                if last_error is not None:
+                    caller.breaker.record_failure()
+                elif probe:
+                    caller.breaker.release_probe()
+
+        if last_error is not None:
+            raise LLMUnavailableError("Serviço de IA indisponível após retentativas") from last_error
+        raise LLMUnavailableError("Prazo da chamada à IA esgotado")
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        caller = self.caller
+        latency = time.monotonic() - self._started_at
+        if exc_type is None:
+            caller.limiter.release(latency)
+            caller.breaker.record_success()
+        elif isinstance(exc_value, caller.RETRYABLE_ERRORS):
+            caller.limiter.release(latency, overloaded=True)
+            caller.breaker.record_failure()
+        else:
+            # Erro não transitório no meio do stream ou vindo do consumidor
+            caller.limiter.release(latency)
+            self._record_non_retryable(exc_value)
+
+    def _record_non_retryable(self, error: Exception) -> None:
+        """
+        Registra no circuito um erro que não é repetido.
+
+        Erros de autenticação/configuração contam como falha. Os demais (ex.:
+        400/422 causados pela própria requisição) não dizem nada sobre a
+        saúde da IA e deixam o circuito como está; só a chamada de teste, se
+        for o caso, é liberada.
+        """
+        if isinstance(error, self.caller.BREAKER_FAILURE_ERRORS):
+            self.caller.breaker.record_failure()
+        elif self._probe:
+            self.caller.breaker.release_probe()
+
+
+llm_resilience = ResilientCaller(
+    limiter=AdaptiveConcurrencyLimiter(
+        initial_limit=settings.llm_max_concurrency / 2,
+        min_limit=1,
+        max_limit=settings.llm_max_concurrency,
+        latency_target_seconds=settings.llm_latency_target_seconds
+    ),
+    breaker=CircuitBreaker(
+        failure_threshold=settings.llm_circuit_failure_threshold,
+        reset_timeout_seconds=settings.llm_circuit_reset_seconds
+    ),
+    max_attempts=settings.llm_max_attempts,
+    timeout_seconds=settings.llm_timeout_seconds
+)
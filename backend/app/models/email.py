@@ -1,6 +1,6 @@
 """Modelos SQLAlchemy para emails."""
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, DateTime, func
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index, func
 
 from app.core.database import Base
 
@@ -8,6 +8,15 @@ from app.core.database import Base
 class EmailSubmission(Base):
     
     __tablename__ = "email_submissions"
+    __table_args__ = (
+        # Índices compostos para os filtros da listagem (classificação, tipo e período)
+        # e para as contagens por faceta, que podem ser respondidas só pelo índice
+        Index("ix_email_submissions_classification_type_created", "ai_classification", "type", "created_at"),
+        Index("ix_email_submissions_type_created", "type", "created_at"),
+        Index("ix_email_submissions_created_at", "created_at"),
+        # Conferência de referências antes de remover um arquivo do blob store
+        Index("ix_email_submissions_file_sha256", "file_sha256"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     email_title = Column(String(255), nullable=False)
@@ -15,6 +24,9 @@ class EmailSubmission(Base):
     type = Column(String(20), nullable=False)
     ai_classification = Column(String(50), nullable=False)
     ai_suggested_reply = Column(Text, nullable=False)
+    # Submissões por arquivo: texto extraído e hash do original no blob store
+    extracted_text = Column(Text, nullable=True)
+    file_sha256 = Column(String(64), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.timezone('America/Sao_Paulo', func.now()))
     
     def __repr__(self):
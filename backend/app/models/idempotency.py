@@ -0,0 +1,21 @@
+"""Modelos SQLAlchemy para chaves de idempotência."""
+from sqlalchemy import Column, Integer, String, Text, DateTime, func
+
+from app.core.database import Base
+
+
+class IdempotencyKey(Base):
+
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(255), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
+    status = Column(String(20), nullable=False)
+    response_status = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<IdempotencyKey(key={self.key}, status={self.status})>"
@@ -0,0 +1,15 @@
+"""Modelos SQLAlchemy para versões de alteração das tabelas."""
+from sqlalchemy import Column, BigInteger, String
+
+from app.core.database import Base
+
+
+class TableVersion(Base):
+
+    __tablename__ = "table_versions"
+
+    table_name = Column(String(100), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<TableVersion(table_name={self.table_name}, version={self.version})>"
@@ -1,13 +1,25 @@
 """Repositório para operações de banco de dados relacionadas a emails."""
-from typing import List, Optional, Dict, Any, Tuple
-from sqlalchemy.orm import Session
+from typing import List, Optional, Dict, Any, Set, Tuple, Iterator
+from sqlalchemy import bindparam, func, or_, update
+from sqlalchemy.orm import Session, defer, load_only
 
 from app.models.email import EmailSubmission
-from app.schemas.email import EmailSubmissionCreate
+from app.repositories.table_version_repository import TableVersionRepository
+from app.schemas.email import EmailSubmissionCreate, EmailFilters
 
 
 class EmailRepository:
-    """Repositório para operações de banco de dados com emails."""
+    """
+    Repositório para operações de banco de dados com emails.
+    
+    Com o particionamento habilitado, a chave primária da tabela é
+    `(id, created_at)`, mas o ORM identifica as linhas só pelo `id`. Buscas,
+    exclusões e atualizações apenas por ID (`get_by_id`, `get_file_reference`,
+    `get_example_labels`, `delete_by_ids`) não podem ser podadas: consultam o
+    índice de ID de cada partição, com custo proporcional à quantidade de
+    partições. Onde `created_at` é conhecido (`bulk_update_ai_results`), ele
+    entra no filtro e só a partição da linha é visitada.
+    """
     
     def __init__(self, db: Session):
         """Inicializa o repositório com uma sessão de banco de dados."""
@@ -19,51 +31,357 @@ class EmailRepository:
             email_title=email_data.email_title,
             message=email_data.content,
             type=email_data.type,
-            ai_classification=ai_data.get("classification"),
+            ai_classification=self.normalize_classification(ai_data.get("classification")),
             ai_suggested_reply=ai_data.get("suggested_reply")
         )
         self.db.add(db_email)
         self.db.commit()
+        self._touch()
         self.db.refresh(db_email)
         return db_email
     
-    def create_with_custom_message(self, email_data: EmailSubmissionCreate, ai_data: Dict[str, Any], message_content: str) -> EmailSubmission:
-        """Cria uma nova submissão de email no banco de dados com conteúdo personalizado no campo message."""
+    def create_with_custom_message(
+        self,
+        email_data: EmailSubmissionCreate,
+        ai_data: Dict[str, Any],
+        message_content: str,
+        file_sha256: Optional[str] = None
+    ) -> EmailSubmission:
+        """
+        Cria uma nova submissão de email no banco de dados com conteúdo personalizado no campo message.
+        
+        O conteúdo classificado é guardado em `extracted_text` e `file_sha256`
+        referencia o arquivo original no blob store.
+        """
         db_email = EmailSubmission(
             email_title=email_data.email_title,
             message=message_content,
             type=email_data.type,
-            ai_classification=ai_data.get("classification"),
-            ai_suggested_reply=ai_data.get("suggested_reply")
+            ai_classification=self.normalize_classification(ai_data.get("classification")),
+            ai_suggested_reply=ai_data.get("suggested_reply"),
+            extracted_text=email_data.content,
+            file_sha256=file_sha256
         )
         self.db.add(db_email)
         self.db.commit()
+        self._touch()
         self.db.refresh(db_email)
         return db_email
     
+    def get_version(self) -> int:
+        """Retorna a versão de alteração da tabela de submissões."""
+        return TableVersionRepository(self.db).get(EmailSubmission.__tablename__)
+    
     def get_by_id(self, email_id: int) -> Optional[EmailSubmission]:
         """Busca uma submissão de email pelo ID."""
         return self.db.query(EmailSubmission).filter(EmailSubmission.id == email_id).first()
     
-    def get_all(self, skip: int = 0, limit: int = 100, email_title: Optional[str] = None) -> List[EmailSubmission]:
-        """Lista submissões com paginação e filtro opcional por título."""
-        query = self.db.query(EmailSubmission)
+    def get_file_reference(self, email_id: int) -> Optional[EmailSubmission]:
+        """Busca apenas o nome, o tipo e o hash do arquivo original de uma submissão."""
+        return (
+            self.db.query(EmailSubmission)
+            .options(load_only(EmailSubmission.message, EmailSubmission.type, EmailSubmission.file_sha256, raiseload=True))
+            .filter(EmailSubmission.id == email_id)
+            .first()
+        )
+    
+    def iter_labeled_examples(self, after_id: int = 0, batch_size: int = 1000) -> Iterator[Any]:
+        """
+        Percorre as submissões de texto puro já classificadas, em ordem de ID.
+        
+        Usado para montar o índice de exemplos few-shot. Arquivos ficam de fora
+        porque o campo message guarda apenas o nome do arquivo.
         
-        if email_title:
-            query = query.filter(EmailSubmission.email_title.ilike(f"%{email_title}%"))
+        Args:
+            after_id: Retorna apenas linhas com ID maior que este
+            batch_size: Quantidade de linhas lidas por consulta
+        """
+        last_id = after_id
+        while True:
+            rows = self.db.query(
+                EmailSubmission.id,
+                EmailSubmission.message,
+                EmailSubmission.ai_classification,
+                EmailSubmission.ai_suggested_reply,
+                EmailSubmission.created_at
+            ).filter(
+                EmailSubmission.id > last_id,
+                EmailSubmission.type == "Texto puro",
+                EmailSubmission.ai_classification.in_(["PRODUTIVO", "IMPRODUTIVO"])
+            ).order_by(EmailSubmission.id).limit(batch_size).all()
+            
+            if not rows:
+                return
+            
+            yield from rows
+            last_id = rows[-1].id
+    
+    def get_labeled_examples(self, ids: List[int]) -> List[Any]:
+        """
+        Retorna, entre os IDs informados, as submissões de texto puro já
+        classificadas, com os campos usados pelo índice de exemplos few-shot.
+        """
+        if not ids:
+            return []
+        return self.db.query(
+            EmailSubmission.id,
+            EmailSubmission.message,
+            EmailSubmission.ai_classification,
+            EmailSubmission.ai_suggested_reply,
+            EmailSubmission.created_at
+        ).filter(
+            EmailSubmission.id.in_(ids),
+            EmailSubmission.type == "Texto puro",
+            EmailSubmission.ai_classification.in_(["PRODUTIVO", "IMPRODUTIVO"])
+        ).order_by(EmailSubmission.id).all()
+    
+    def get_example_labels(self, ids: List[int]) -> Dict[int, Any]:
+        """
+        Retorna a classificação e a sugestão atuais das submissões informadas.
         
-        return query.offset(skip).limit(limit).all()
+        Usado para validar os exemplos few-shot do índice em memória, que pode
+        estar defasado em relação ao banco (exclusões e reclassificações feitas
+        por outros workers, pela retenção ou pelo backfill). IDs que não existem
+        mais ficam fora do resultado.
+        """
+        if not ids:
+            return {}
+        rows = self.db.query(
+            EmailSubmission.id,
+            EmailSubmission.ai_classification,
+            EmailSubmission.ai_suggested_reply
+        ).filter(EmailSubmission.id.in_(ids)).all()
+        return {row.id: row for row in rows}
     
-    def count(self, email_title: Optional[str] = None) -> int:
-        """Retorna o total de submissões no banco de dados com filtro opcional por título."""
+    def get_backfill_chunk(
+        self,
+        after_id: int,
+        limit: int,
+        only_undefined: bool = False,
+        max_id: Optional[int] = None
+    ) -> List[Any]:
+        """
+        Retorna o próximo lote de submissões para reclassificação, em ordem de ID.
+        
+        Cada linha traz `id`, `type`, `ai_classification` e `content`, o texto
+        classificado: a mensagem, para texto puro, ou o texto extraído, para arquivos.
+        
+        Args:
+            after_id: Retorna apenas linhas com ID maior que este (paginação por chave)
+            limit: Tamanho do lote
+            only_undefined: Apenas linhas INDEFINIDO ou salvas sem classificação
+            max_id: Limite superior de ID, para fixar o escopo do job
+        """
+        query = self._backfill_entities(self._backfill_query(only_undefined, max_id)).filter(
+            EmailSubmission.id > after_id
+        )
+        
+        return query.order_by(EmailSubmission.id).limit(limit).all()
+    
+    def get_backfill_rows(self, ids: List[int]) -> List[Any]:
+        """Retorna as linhas informadas no formato de `get_backfill_chunk` (para retentativas)."""
+        if not ids:
+            return []
+        query = self._backfill_entities(self._backfill_query(False, None)).filter(EmailSubmission.id.in_(ids))
+        return query.order_by(EmailSubmission.id).all()
+    
+    def count_backfill(self, after_id: int = 0, only_undefined: bool = False, max_id: Optional[int] = None) -> int:
+        """Conta as submissões pendentes de reclassificação após `after_id`."""
+        return self._backfill_query(only_undefined, max_id).filter(EmailSubmission.id > after_id).count()
+    
+    def get_max_id(self) -> int:
+        """Retorna o maior ID de submissão existente."""
+        return self.db.query(func.max(EmailSubmission.id)).scalar() or 0
+    
+    def bulk_update_ai_results(self, updates: List[Dict[str, Any]]) -> List[int]:
+        """
+        Atualiza classificação e sugestão de várias submissões em uma única transação.
+        
+        Cada linha é atualizada por uma instrução própria (compilada uma vez)
+        para que a contagem de linhas afetadas identifique as submissões
+        excluídas durante a reclassificação, que ficam fora do retorno.
+        
+        No PostgreSQL, atualizações com `created_at` o usam no filtro, para que
+        cada uma visite só a partição da linha (ver a docstring da classe).
+        
+        Args:
+            updates: Dicionários com `id`, `ai_classification`, `ai_suggested_reply`
+                e, opcionalmente, o `created_at` lido da linha
+        
+        Returns:
+            IDs das submissões atualizadas
+        """
+        if not updates:
+            return []
+        table = EmailSubmission.__table__
+        values = {
+            "ai_classification": bindparam("b_ai_classification"),
+            "ai_suggested_reply": bindparam("b_ai_suggested_reply")
+        }
+        by_id = update(table).where(table.c.id == bindparam("b_id")).values(**values)
+        by_partition = update(table).where(
+            table.c.id == bindparam("b_id"),
+            table.c.created_at == bindparam("b_created_at")
+        ).values(**values)
+        use_partition = self.db.get_bind().dialect.name == "postgresql"
+
+        updated_ids = []
+        for item in updates:
+            params = {
+                "b_id": item["id"],
+                "b_ai_classification": self.normalize_classification(item["ai_classification"]),
+                "b_ai_suggested_reply": item["ai_suggested_reply"]
+            }
+            statement = by_id
+            if use_partition and item.get("created_at") is not None:
+                params["b_created_at"] = item["created_at"]
+                statement = by_partition
+            if self.db.execute(statement, params).rowcount:
+                updated_ids.append(item["id"])
+        self.db.commit()
+        self._touch()
+        return updated_ids
+    
+    def _backfill_query(self, only_undefined: bool, max_id: Optional[int]):
+        """
+        Consulta base das submissões elegíveis para reclassificação.
+        
+        Arquivos só são elegíveis se tiverem o texto extraído salvo; nos mais
+        antigos, message guarda apenas o nome do arquivo.
+        """
+        query = self.db.query(EmailSubmission).filter(or_(
+            EmailSubmission.type == "Texto puro",
+            EmailSubmission.extracted_text.isnot(None)
+        ))
+        if only_undefined:
+            query = query.filter(EmailSubmission.ai_classification.in_(["INDEFINIDO", ""]))
+        if max_id is not None:
+            query = query.filter(EmailSubmission.id <= max_id)
+        return query
+    
+    @staticmethod
+    def _backfill_entities(query):
+        """Colunas lidas pelo backfill."""
+        return query.with_entities(
+            EmailSubmission.id,
+            EmailSubmission.type,
+            EmailSubmission.ai_classification,
+            EmailSubmission.created_at,
+            func.coalesce(EmailSubmission.extracted_text, EmailSubmission.message).label("content")
+        )
+    
+    def get_all(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        filters: Optional[EmailFilters] = None,
+        summary: bool = False
+    ) -> List[EmailSubmission]:
+        """
+        Lista submissões com paginação e filtros opcionais, das mais recentes para as mais antigas.
+        
+        Args:
+            filters: Filtros por título, classificação, tipo e período
+            summary: Carrega apenas as colunas curtas, sem `message` e `ai_suggested_reply`;
+                sem ele, só `extracted_text` não é carregado
+        """
         query = self.db.query(EmailSubmission)
         
-        if email_title:
-            query = query.filter(EmailSubmission.email_title.ilike(f"%{email_title}%"))
+        if not summary:
+            # O texto extraído dos arquivos só é exibido no detalhe da submissão
+            query = query.options(defer(EmailSubmission.extracted_text, raiseload=True))
+        else:
+            query = query.options(load_only(
+                EmailSubmission.id,
+                EmailSubmission.email_title,
+                EmailSubmission.type,
+                EmailSubmission.ai_classification,
+                EmailSubmission.created_at,
+                raiseload=True
+            ))
         
-        return query.count()
+        query = self._apply_filters(query, filters)
+        
+        return query.order_by(EmailSubmission.created_at.desc(), EmailSubmission.id.desc()).offset(skip).limit(limit).all()
+    
+    def count(self, filters: Optional[EmailFilters] = None) -> int:
+        """Retorna o total de submissões no banco de dados com filtros opcionais."""
+        return self._apply_filters(self.db.query(EmailSubmission), filters).count()
+    
+    def get_facet_counts(self, filters: Optional[EmailFilters] = None) -> List[Tuple[str, str, int]]:
+        """
+        Conta as submissões por par (classificação, tipo).
+        
+        Apenas os filtros de título e período são aplicados no banco, para que
+        as facetas de cada campo possam ser calculadas sem o filtro do próprio
+        campo (ver `summarize_facets`). Sem filtro de título, a consulta é
+        respondida pelo índice composto de classificação, tipo e data.
+        
+        Returns:
+            Lista de tuplas (ai_classification, type, quantidade)
+        """
+        query = self.db.query(
+            EmailSubmission.ai_classification,
+            EmailSubmission.type,
+            func.count()
+        )
+        if filters:
+            query = self._apply_filters(query, filters.model_copy(update={"ai_classification": None, "type": None}))
+        
+        rows = query.group_by(EmailSubmission.ai_classification, EmailSubmission.type).all()
+        return [(classification, email_type, count) for classification, email_type, count in rows]
+    
+    @staticmethod
+    def summarize_facets(
+        rows: List[Tuple[str, str, int]],
+        filters: Optional[EmailFilters] = None
+    ) -> Tuple[int, Dict[str, Dict[str, int]], List[Tuple[str, str, int]]]:
+        """
+        Calcula total e facetas a partir das contagens de `get_facet_counts`.
+        
+        A faceta de cada campo considera os filtros de todos os outros campos.
+        
+        Returns:
+            Tuple contendo:
+            - Total de submissões que atendem a todos os filtros
+            - Facetas por classificação e por tipo
+            - Contagens que atendem a todos os filtros
+        """
+        classifications = set(filters.ai_classification) if filters and filters.ai_classification is not None else None
+        types = set(filters.type) if filters and filters.type is not None else None
+        
+        facets = {"ai_classification": {}, "type": {}}
+        matching_rows = []
+        for classification, email_type, count in rows:
+            classification_matches = classifications is None or classification in classifications
+            type_matches = types is None or email_type in types
+            if type_matches:
+                facets["ai_classification"][classification] = facets["ai_classification"].get(classification, 0) + count
+            if classification_matches:
+                facets["type"][email_type] = facets["type"].get(email_type, 0) + count
+            if classification_matches and type_matches:
+                matching_rows.append((classification, email_type, count))
+        
+        total = sum(count for _, _, count in matching_rows)
+        return total, facets, matching_rows
+    
+    def _apply_filters(self, query, filters: Optional[EmailFilters]):
+        """Aplica os filtros da listagem a uma consulta."""
+        if not filters:
+            return query
+        if filters.email_title:
+            query = query.filter(EmailSubmission.email_title.ilike(f"%{filters.email_title}%"))
+        if filters.ai_classification is not None:
+            query = query.filter(EmailSubmission.ai_classification.in_(filters.ai_classification))
+        if filters.type is not None:
+            query = query.filter(EmailSubmission.type.in_(filters.type))
+        if filters.created_from:
+            query = query.filter(EmailSubmission.created_at >= filters.created_from)
+        if filters.created_to:
+            query = query.filter(EmailSubmission.created_at < filters.created_to)
+        return query
     
-    def delete_by_ids(self, ids: List[int]) -> Tuple[List[int], List[int]]:
+    def delete_by_ids(self, ids: List[int]) -> Tuple[List[int], List[int], Dict[str, int], List[str]]:
         """
         Deleta emails por uma lista de IDs.
         
@@ -71,9 +389,16 @@ class EmailRepository:
             Tuple contendo:
             - Lista de IDs que foram deletados com sucesso
             - Lista de IDs que não foram encontrados
+            - Variação das estatísticas causada pela exclusão
+            - Hashes dos arquivos originais das submissões deletadas
         """
-        # Primeiro, verifica quais IDs existem
-        existing_emails = self.db.query(EmailSubmission).filter(EmailSubmission.id.in_(ids)).all()
+        # Primeiro, verifica quais IDs existem (apenas as colunas usadas nas estatísticas e o arquivo)
+        existing_emails = self.db.query(
+            EmailSubmission.id,
+            EmailSubmission.ai_classification,
+            EmailSubmission.type,
+            EmailSubmission.file_sha256
+        ).filter(EmailSubmission.id.in_(ids)).all()
         existing_ids = [email.id for email in existing_emails]
         not_found_ids = [id for id in ids if id not in existing_ids]
         
@@ -81,8 +406,23 @@ class EmailRepository:
         if existing_ids:
             deleted_count = self.db.query(EmailSubmission).filter(EmailSubmission.id.in_(existing_ids)).delete(synchronize_session=False)
             self.db.commit()
+            self._touch()
         
-        return existing_ids, not_found_ids
+        stats_delta = self.build_stats_delta(
+            [(email.ai_classification, email.type) for email in existing_emails],
+            sign=-1
+        )
+        file_hashes = sorted({email.file_sha256 for email in existing_emails if email.file_sha256})
+        return existing_ids, not_found_ids, stats_delta, file_hashes
+    
+    def get_referenced_file_hashes(self, file_hashes: List[str]) -> Set[str]:
+        """Retorna quais dos hashes ainda são referenciados por alguma submissão."""
+        if not file_hashes:
+            return set()
+        rows = self.db.query(EmailSubmission.file_sha256).filter(
+            EmailSubmission.file_sha256.in_(file_hashes)
+        ).distinct().all()
+        return {row.file_sha256 for row in rows}
     
     def delete_by_id(self, email_id: int) -> bool:
         """
@@ -95,68 +435,111 @@ class EmailRepository:
         if email:
             self.db.delete(email)
             self.db.commit()
+            self._touch()
             return True
         return False
     
-    def get_statistics(self) -> Dict[str, int]:
+    def get_statistics(self, filters: Optional[EmailFilters] = None) -> Dict[str, int]:
         """
         Retorna estatísticas dos emails.
         
+        As contagens vêm de uma única consulta agrupada por classificação e
+        tipo, que usa os valores normalizados (sem `ilike` por linha).
+        
+        Args:
+            filters: Filtros opcionais, os mesmos da listagem
+        
         Returns:
             Dicionário com as estatísticas dos emails
         """
-        from sqlalchemy import func, case
-        
-        classification_stats = self.db.query(
-            func.count(EmailSubmission.id).label('total'),
-            func.sum(
-                case(
-                    (EmailSubmission.ai_classification.ilike('produtivo'), 1),
-                    else_=0
-                )
-            ).label('produtivos'),
-            func.sum(
-                case(
-                    (EmailSubmission.ai_classification.ilike('improdutivo'), 1),
-                    else_=0
-                )
-            ).label('improdutivos'),
-            func.sum(
-                case(
-                    (EmailSubmission.ai_classification.is_(None), 1),
-                    (EmailSubmission.ai_classification == '', 1),
-                    else_=0
-                )
-            ).label('nao_classificados')
-        ).first()
-        
-        type_stats = self.db.query(
-            func.sum(
-                case(
-                    (EmailSubmission.type.ilike('pdf'), 1),
-                    else_=0
-                )
-            ).label('pdf'),
-            func.sum(
-                case(
-                    (EmailSubmission.type.ilike('txt'), 1),
-                    else_=0
-                )
-            ).label('txt'),
-            func.sum(
-                case(
-                    (EmailSubmission.type.ilike('texto puro'), 1),
-                    else_=0
-                )
-            ).label('texto_puro')
-        ).first()
-        
-        return {
-            'total': classification_stats.total or 0,
-            'produtivos': classification_stats.produtivos or 0,
-            'improdutivos': classification_stats.improdutivos or 0,
-            'nao_classificados': classification_stats.nao_classificados or 0,
-            'pdf': type_stats.pdf or 0,
-            'txt': type_stats.txt or 0,
-            'texto_puro': type_stats.texto_puro or 0
-        }
\ No newline at end of file
+        _, _, rows = self.summarize_facets(self.get_facet_counts(filters), filters)
+        return self.build_stats(rows)
+    
+    @classmethod
+    def build_stats(cls, rows: List[Tuple[Optional[str], Optional[str], int]]) -> Dict[str, int]:
+        """
+        Monta as estatísticas a partir de contagens por (classificação, tipo).
+        
+        Args:
+            rows: Tuplas (ai_classification, type, quantidade); quantidades negativas subtraem
+            
+        Returns:
+            Dicionário com as mesmas chaves de `get_statistics`
+        """
+        stats = {
+            'total': 0,
+            'produtivos': 0,
+            'improdutivos': 0,
+            'nao_classificados': 0,
+            'pdf': 0,
+            'txt': 0,
+            'texto_puro': 0
+        }
+        type_keys = {'pdf': 'pdf', 'txt': 'txt', 'texto puro': 'texto_puro'}
+        
+        for classification, email_type, count in rows:
+            stats['total'] += count
+            
+            if not classification:
+                stats['nao_classificados'] += count
+            elif classification.lower() == 'produtivo':
+                stats['produtivos'] += count
+            elif classification.lower() == 'improdutivo':
+                stats['improdutivos'] += count
+            
+            type_key = type_keys.get((email_type or '').lower())
+            if type_key:
+                stats[type_key] += count
+        
+        return stats
+    
+    @classmethod
+    def build_stats_delta(cls, rows: List[Tuple[Optional[str], Optional[str]]], sign: int = 1) -> Dict[str, int]:
+        """
+        Calcula a variação das estatísticas para um conjunto de linhas.
+        
+        Segue as mesmas regras de agrupamento de `get_statistics`.
+        
+        Args:
+            rows: Pares (ai_classification, type) das linhas afetadas
+            sign: 1 para inserções, -1 para exclusões
+            
+        Returns:
+            Dicionário com as mesmas chaves de `get_statistics`
+        """
+        return cls.build_stats([(classification, email_type, sign) for classification, email_type in rows])
+    
+    @staticmethod
+    def normalize_classification(classification: Optional[str]) -> str:
+        """Normaliza a classificação para o formato armazenado (maiúsculas, sem espaços nas bordas)."""
+        return (classification or "").strip().upper()
+    
+    def normalize_stored_values(self) -> int:
+        """
+        Normaliza classificações e tipos gravados antes da normalização na escrita.
+        
+        Permite que filtros e estatísticas usem comparações exatas (e os
+        índices) em vez de `ilike`.
+        
+        Returns:
+            Quantidade de linhas alteradas
+        """
+        updated = self.db.query(EmailSubmission).filter(
+            EmailSubmission.ai_classification != func.upper(func.trim(EmailSubmission.ai_classification))
+        ).update(
+            {EmailSubmission.ai_classification: func.upper(func.trim(EmailSubmission.ai_classification))},
+            synchronize_session=False
+        )
+        for email_type in ("Texto puro", "TXT", "PDF"):
+            updated += self.db.query(EmailSubmission).filter(
+                func.lower(func.trim(EmailSubmission.type)) == email_type.lower(),
+                EmailSubmission.type != email_type
+            ).update({EmailSubmission.type: email_type}, synchronize_session=False)
+        self.db.commit()
+        if updated:
+            self._touch()
+        return updated
+    
+    def _touch(self) -> None:
+        """Incrementa a versão da tabela após o commit, invalidando os ETags das leituras."""
+        TableVersionRepository(self.db).bump(EmailSubmission.__tablename__)
@@ -0,0 +1,126 @@
+"""Repositório para operações de banco de dados relacionadas a chaves de idempotência."""
+from datetime import datetime
+from typing import Optional, Tuple
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.idempotency import IdempotencyKey
+
+
+class IdempotencyRepository:
+    """Repositório para operações de banco de dados com chaves de idempotência."""
+
+    PROCESSING = "processing"
+    COMPLETED = "completed"
+
+    def __init__(self, db: Session):
+        """Inicializa o repositório com uma sessão de banco de dados."""
+        self.db = db
+
+    def reserve(
+        self,
+        key: str,
+        fingerprint: str,
+        expires_at: datetime,
+        locked_until: datetime
+    ) -> Tuple[bool, IdempotencyKey]:
+        """
+        Tenta reservar uma chave para processamento.
+
+        Args:
+            key: Chave de idempotência
+            fingerprint: Impressão digital da requisição
+            expires_at: Quando a chave (e a resposta armazenada) expira
+            locked_until: Fim da concessão do processamento; depois dele, uma
+                chave ainda em processamento é considerada abandonada
+
+        Returns:
+            Tuple contendo:
+            - True se a chave foi reservada por esta chamada, False se já existia
+            - Registro da chave (o novo ou o existente)
+        """
+        record = IdempotencyKey(
+            key=key,
+            fingerprint=fingerprint,
+            status=self.PROCESSING,
+            expires_at=expires_at,
+            locked_until=locked_until
+        )
+        self.db.add(record)
+        try:
+            self.db.commit()
+            return True, record
+        except IntegrityError:
+            self.db.rollback()
+            return False, self.get(key)
+
+    def take_over(self, key: str, previous_locked_until: Optional[datetime], locked_until: datetime) -> bool:
+        """
+        Assume uma chave abandonada (em processamento, com a concessão vencida).
+
+        A troca só acontece se a concessão ainda for a lida em `previous_locked_until`,
+        então apenas um worker assume a chave.
+
+        Returns:
+            True se a chave foi assumida por esta chamada
+        """
+        locked_filter = (
+            IdempotencyKey.locked_until.is_(None)
+            if previous_locked_until is None
+            else IdempotencyKey.locked_until == previous_locked_until
+        )
+        updated_count = self.db.query(IdempotencyKey).filter(
+            IdempotencyKey.key == key,
+            IdempotencyKey.status == self.PROCESSING,
+            locked_filter
+        ).update({IdempotencyKey.locked_until: locked_until}, synchronize_session=False)
+        self.db.commit()
+        return updated_count == 1
+
+    def get(self, key: str) -> Optional[IdempotencyKey]:
+        """Busca uma chave, sempre relendo o estado atual do banco."""
+        self.db.expire_all()
+        return self.db.query(IdempotencyKey).filter(IdempotencyKey.key == key).first()
+
+    def complete(self, key: str, response_status: int, response_body: str) -> None:
+        """Armazena a resposta de uma chave processada com sucesso."""
+        self.db.query(IdempotencyKey).filter(IdempotencyKey.key == key).update(
+            {
+                IdempotencyKey.status: self.COMPLETED,
+                IdempotencyKey.response_status: response_status,
+                IdempotencyKey.response_body: response_body
+            },
+            synchronize_session=False
+        )
+        self.db.commit()
+
+    def release(self, key: str) -> None:
+        """Libera uma chave cujo processamento falhou, permitindo novas tentativas."""
+        self.db.rollback()
+        self.db.query(IdempotencyKey).filter(
+            IdempotencyKey.key == key,
+            IdempotencyKey.status == self.PROCESSING
+        ).delete(synchronize_session=False)
+        self.db.commit()
+
+    def delete(self, key: str) -> None:
+        """Remove uma chave."""
+        self.db.query(IdempotencyKey).filter(IdempotencyKey.key == key).delete(synchronize_session=False)
+        self.db.commit()
+
+    def delete_expired(self, now: datetime, batch_size: int = 1000) -> int:
+        """
+        Remove um lote de chaves expiradas.
+
+        Returns:
+            Quantidade de chaves removidas
+        """
+        expired_keys = self.db.query(IdempotencyKey.key).filter(
+            IdempotencyKey.expires_at < now
+        ).limit(batch_size).subquery()
+
+        deleted_count = self.db.query(IdempotencyKey).filter(
+            IdempotencyKey.key.in_(expired_keys.select())
+        ).delete(synchronize_session=False)
+        self.db.commit()
+        return deleted_count
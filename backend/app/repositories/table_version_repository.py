@@ -0,0 +1,90 @@
+"""Repositório para as versões de alteração das tabelas."""
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.table_version import TableVersion
+
+
+class TableVersionRepository:
+    """
+    Contador de alterações por tabela.
+
+    A versão é incrementada logo depois do commit de cada escrita, então muda
+    sempre que o conteúdo da tabela muda e serve de base para os ETags das
+    rotas de leitura. No PostgreSQL o contador é uma sequência
+    (`<tabela>_version_seq`): `nextval` não bloqueia nem é bloqueado por
+    outras transações, então escritas concorrentes não disputam uma linha.
+    Nos demais bancos é a linha da tabela em `table_versions`, atualizada em
+    uma transação própria e curta.
+    """
+
+    def __init__(self, db: Session):
+        """Inicializa o repositório com uma sessão de banco de dados."""
+        self.db = db
+
+    def _uses_sequence(self) -> bool:
+        """Indica se o contador é uma sequência do PostgreSQL."""
+        return self.db.get_bind().dialect.name == "postgresql"
+
+    @staticmethod
+    def _sequence_name(table_name: str) -> str:
+        """Nome da sequência que guarda a versão da tabela."""
+        return f"{table_name}_version_seq"
+
+    def get(self, table_name: str) -> int:
+        """Retorna a versão atual da tabela (0 se ainda não houve alterações)."""
+        if self._uses_sequence():
+            preparer = self.db.get_bind().dialect.identifier_preparer
+            return self.db.execute(text(
+                f"SELECT CASE WHEN is_called THEN last_value ELSE 0 END "
+                f"FROM {preparer.quote(self._sequence_name(table_name))}"
+            )).scalar()
+        version = self.db.query(TableVersion.version).filter(TableVersion.table_name == table_name).scalar()
+        return version or 0
+
+    def ensure(self, table_name: str) -> None:
+        """
+        Cria o contador da tabela, se ainda não existir.
+
+        No PostgreSQL, a sequência continua a partir da versão já gravada em
+        `table_versions`, para que ETags emitidos antes não voltem a valer.
+        """
+        if self._uses_sequence():
+            preparer = self.db.get_bind().dialect.identifier_preparer
+            sequence_name = self._sequence_name(table_name)
+            self.db.execute(text(f"CREATE SEQUENCE IF NOT EXISTS {preparer.quote(sequence_name)}"))
+            stored = self.db.query(TableVersion.version).filter(TableVersion.table_name == table_name).scalar()
+            if stored and stored > self.get(table_name):
+                self.db.execute(text("SELECT setval(:sequence, :version)"), {"sequence": sequence_name, "version": stored})
+            self.db.commit()
+            return
+
+        if self.db.query(TableVersion.table_name).filter(TableVersion.table_name == table_name).first():
+            return
+        self.db.add(TableVersion(table_name=table_name, version=0))
+        try:
+            self.db.commit()
+        except IntegrityError:
+            self.db.rollback()
+
+    def bump(self, table_name: str) -> None:
+        """
+        Incrementa a versão da tabela em uma transação própria.
+
+        Deve ser chamado depois do commit da escrita correspondente, nunca
+        dentro dela: assim nenhum leitor vê a versão nova com o conteúdo
+        antigo (o que fixaria um ETag errado). Entre o commit e o incremento,
+        uma leitura ainda pode responder 304 com a versão anterior; os
+        eventos de alteração são publicados depois do incremento.
+        """
+        if self._uses_sequence():
+            self.db.execute(text("SELECT nextval(:sequence)"), {"sequence": self._sequence_name(table_name)})
+        else:
+            updated = self.db.query(TableVersion).filter(TableVersion.table_name == table_name).update(
+                {TableVersion.version: TableVersion.version + 1},
+                synchronize_session=False
+            )
+            if not updated:
+                self.db.add(TableVersion(table_name=table_name, version=1))
+        self.db.commit()
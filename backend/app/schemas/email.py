@@ -1,7 +1,7 @@
 """Schemas para validação de dados de email."""
 from datetime import datetime
-from typing import Optional, Literal, List
-from pydantic import BaseModel, Field
+from typing import Optional, Literal, List, Dict
+from pydantic import BaseModel, Field, field_validator
 
 
 class TextEmailRequest(BaseModel):
@@ -24,8 +24,8 @@ class EmailSubmissionCreate(BaseModel):
     type: Literal["Texto puro", "TXT", "PDF"] = Field(..., description="Tipo de entrada do conteúdo")
 
 
-class EmailSubmissionResponse(BaseModel):
-    """Schema para resposta de uma submissão de email."""
+class EmailSubmissionListItem(BaseModel):
+    """Schema de uma submissão na listagem completa e nos eventos, sem o texto extraído do arquivo."""
 
     id: int
     email_title: str
@@ -33,15 +33,63 @@ class EmailSubmissionResponse(BaseModel):
     type: str
     ai_classification: Optional[str] = None
     ai_suggested_reply: Optional[str] = None
+    file_sha256: Optional[str] = Field(default=None, description="Hash do arquivo original, disponível em GET /{id}/file")
     created_at: datetime
 
     model_config = {"from_attributes": True}
 
+class EmailSubmissionResponse(EmailSubmissionListItem):
+    """Schema para resposta de uma submissão de email."""
+
+    extracted_text: Optional[str] = Field(default=None, description="Texto extraído do arquivo (submissões por arquivo)")
+
+class EmailSubmissionSummary(BaseModel):
+    """Schema resumido de uma submissão, sem os campos de texto longos (mensagem e resposta sugerida)."""
+
+    id: int
+    email_title: str
+    type: str
+    ai_classification: Optional[str] = None
+    created_at: datetime
+
+    model_config = {"from_attributes": True}
+
+class EmailFilters(BaseModel):
+    """Schema dos filtros da listagem e das estatísticas de emails."""
+
+    email_title: Optional[str] = Field(default=None, description="Trecho do título do email")
+    ai_classification: Optional[List[str]] = Field(default=None, description="Classificações aceitas (vazio = não classificado)")
+    type: Optional[List[Literal["Texto puro", "TXT", "PDF"]]] = Field(default=None, description="Tipos de entrada aceitos")
+    created_from: Optional[datetime] = Field(default=None, description="Data de criação inicial (inclusiva)")
+    created_to: Optional[datetime] = Field(default=None, description="Data de criação final (exclusiva)")
+
+    @field_validator("ai_classification")
+    @classmethod
+    def normalize_classification(cls, values: Optional[List[str]]) -> Optional[List[str]]:
+        """Normaliza as classificações para o formato armazenado (maiúsculas, sem espaços nas bordas)."""
+        if values is None:
+            return None
+        return [value.strip().upper() for value in values]
+
+class EmailFacets(BaseModel):
+    """Contagens por valor de cada faceta, considerando os demais filtros aplicados."""
+
+    ai_classification: Dict[str, int] = Field(default_factory=dict, description="Contagem por classificação ('' = não classificado)")
+    type: Dict[str, int] = Field(default_factory=dict, description="Contagem por tipo de entrada")
+
 class EmailSubmissionList(BaseModel):
     """Schema para lista de submissões de email."""
 
-    submissions: list[EmailSubmissionResponse]
+    submissions: list[EmailSubmissionListItem]
+    total: int
+    facets: Optional[EmailFacets] = None
+
+class EmailSubmissionSummaryList(BaseModel):
+    """Schema para lista resumida de submissões de email."""
+
+    submissions: list[EmailSubmissionSummary]
     total: int
+    facets: Optional[EmailFacets] = None
 
 class DeleteEmailsRequest(BaseModel):
     """Schema para requisição de exclusão de emails por IDs."""
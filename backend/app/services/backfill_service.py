@@ -0,0 +1,368 @@
+"""Reclassificação em lote (backfill) das submissões já armazenadas."""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.events import notify_workers
+from app.integrations.ai import OpenAIIntegration
+from app.integrations.example_index import ExampleIndex, example_index
+from app.repositories.email_repository import EmailRepository
+from app.utils.text_preprocessor import text_preprocessor
+
+
+class RateLimiter:
+    """Limitador de taxa simples (intervalo mínimo entre chamadas), seguro entre threads."""
+
+    def __init__(self, requests_per_minute: float):
+        """Inicializa o limitador; valores <= 0 desativam o limite."""
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._next_at = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Bloqueia até que a próxima chamada seja permitida."""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_at - now
+            self._next_at = max(now, self._next_at) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+class BackfillService:
+    """
+    Reclassifica submissões em lotes ordenados por ID, com checkpoint em disco.
+
+    Cada lote é classificado com concorrência limitada, gravado no banco em uma
+    única transação e só então registrado no checkpoint. Se o processo cair, a
+    execução seguinte retoma a partir do último lote gravado.
+
+    Linhas que falham (erro da IA ou IA indisponível) ficam registradas no
+    checkpoint e são tentadas de novo ao final de cada execução; o job só é
+    dado como concluído quando não restam falhas.
+
+    São elegíveis as submissões de texto puro e os arquivos com o texto
+    extraído salvo. As linhas reclassificadas atualizam o índice de exemplos
+    deste processo e são anunciadas aos servidores (`stats.delta` e
+    `submission.updated`) quando EVENTS_BACKEND=postgres.
+    """
+
+    # Estimativas para o modo dry-run (GPT-4, valores em USD por 1k tokens)
+    ASSUMED_COMPLETION_TOKENS = 150
+    PRICE_PER_1K_PROMPT_TOKENS = 0.03
+    PRICE_PER_1K_COMPLETION_TOKENS = 0.06
+    DRY_RUN_SAMPLE_SIZE = 200
+    EVENT_IDS_PER_MESSAGE = 500
+
+    def __init__(
+        self,
+        email_repository: EmailRepository,
+        ai_integration_factory: Callable[[], OpenAIIntegration],
+        checkpoint_path: str,
+        batch_size: int = 100,
+        concurrency: int = 4,
+        requests_per_minute: float = 60,
+        only_undefined: bool = False
+    ):
+        """
+        Inicializa o job de backfill.
+
+        Args:
+            ai_integration_factory: Cria as integrações de IA; cada thread de
+                classificação usa a sua, pois elas guardam estado por chamada
+                (`last_metrics`)
+        """
+        self.email_repository = email_repository
+        self.ai_integration_factory = ai_integration_factory
+        self.ai_integration = ai_integration_factory()
+        self._thread_state = threading.local()
+        self.checkpoint_path = checkpoint_path
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.requests_per_minute = requests_per_minute
+        self.only_undefined = only_undefined
+        self.rate_limiter = RateLimiter(requests_per_minute)
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Executa (ou retoma) o backfill até processar todas as linhas do escopo.
+
+        Returns:
+            Checkpoint final com os contadores do job
+        """
+        checkpoint = self._load_checkpoint()
+        print(f"Backfill iniciado a partir do ID {checkpoint['last_id']} (até {checkpoint['max_id']})")
+        if settings.events_backend != "postgres":
+            print("Aviso: EVENTS_BACKEND não é postgres; os servidores não serão notificados das reclassificações")
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while True:
+                rows = self.email_repository.get_backfill_chunk(
+                    after_id=checkpoint["last_id"],
+                    limit=self.batch_size,
+                    only_undefined=self.only_undefined,
+                    max_id=checkpoint["max_id"]
+                )
+                if not rows:
+                    break
+
+                failed_ids = self._process_rows(executor, rows, checkpoint)
+                checkpoint["last_id"] = rows[-1].id
+                checkpoint["processed"] += len(rows)
+                checkpoint["failed_ids"].extend(failed_ids)
+                checkpoint["failed"] = len(checkpoint["failed_ids"])
+                self._save_checkpoint(checkpoint)
+                print(
+                    f"Lote até o ID {checkpoint['last_id']}: "
+                    f"{checkpoint['processed']} processadas, {checkpoint['failed']} falhas"
+                )
+
+            self._retry_failed(executor, checkpoint)
+
+        if checkpoint["failed_ids"]:
+            print(f"{checkpoint['failed']} linhas falharam; execute novamente para tentar de novo")
+        else:
+            checkpoint["finished_at"] = datetime.now(timezone.utc).isoformat()
+        self._save_checkpoint(checkpoint)
+        return checkpoint
+
+    def _retry_failed(self, executor: ThreadPoolExecutor, checkpoint: Dict[str, Any]) -> None:
+        """Tenta de novo, uma vez por execução, as linhas que falharam (as excluídas saem da lista)."""
+        pending = list(checkpoint["failed_ids"])
+        if not pending:
+            return
+        print(f"Tentando novamente {len(pending)} linhas com falha")
+
+        still_failed: List[int] = []
+        for start in range(0, len(pending), self.batch_size):
+            rows = self.email_repository.get_backfill_rows(pending[start:start + self.batch_size])
+            still_failed.extend(self._process_rows(executor, rows, checkpoint))
+
+        checkpoint["failed_ids"] = still_failed
+        checkpoint["failed"] = len(still_failed)
+        self._save_checkpoint(checkpoint)
+
+    def _process_rows(self, executor: ThreadPoolExecutor, rows: List[Any], checkpoint: Dict[str, Any]) -> List[int]:
+        """
+        Classifica e grava um lote, atualiza o índice de exemplos e notifica os servidores.
+
+        Linhas excluídas durante a reclassificação não são gravadas nem
+        contam como falha: saem do índice e não geram eventos.
+
+        Returns:
+            IDs das linhas que falharam
+        """
+        results = list(executor.map(self._classify_row, rows))
+        updates = [result for result in results if result is not None]
+        updated_ids = set(self.email_repository.bulk_update_ai_results(updates))
+
+        deleted_ids = [result["id"] for result in updates if result["id"] not in updated_ids]
+        example_index.remove(deleted_ids)
+        results = [result if result is not None and result["id"] in updated_ids else None for result in results]
+        failed_ids = [row.id for row, result in zip(rows, results) if result is None and row.id not in deleted_ids]
+
+        changed = [
+            (row, result) for row, result in zip(rows, results)
+            if result is not None and result["ai_classification"] != row.ai_classification
+        ]
+        checkpoint["updated"] += len(changed)
+        self._remember_examples(rows, results)
+        self._publish_changes(changed)
+
+        return failed_ids
+
+    def _remember_examples(self, rows: List[Any], results: List[Optional[Dict[str, Any]]]) -> None:
+        """Atualiza o índice de exemplos deste processo com os novos rótulos."""
+        stale_ids = []
+        for row, result in zip(rows, results):
+            if result is None:
+                continue
+            if row.type == "Texto puro" and result["ai_classification"] in ExampleIndex.LABELS:
+                self.ai_integration.remember_example(
+                    row.id,
+                    row.content,
+                    row.type,
+                    result["ai_classification"],
+                    result["ai_suggested_reply"],
+                    row.created_at
+                )
+            else:
+                stale_ids.append(row.id)
+        example_index.remove(stale_ids)
+
+    def _publish_changes(self, changed: List[Any]) -> None:
+        """Publica a variação das estatísticas e os IDs reclassificados."""
+        if not changed:
+            return
+        notify_workers("stats.delta", EmailRepository.build_stats(
+            [(row.ai_classification, row.type, -1) for row, _ in changed]
+            + [(result["ai_classification"], row.type, 1) for row, result in changed]
+        ))
+        ids = [row.id for row, _ in changed]
+        for start in range(0, len(ids), self.EVENT_IDS_PER_MESSAGE):
+            notify_workers("submission.updated", {"ids": ids[start:start + self.EVENT_IDS_PER_MESSAGE]})
+
+    def dry_run(self, assumed_latency_seconds: float = 3.0) -> Dict[str, Any]:
+        """
+        Estima custo e duração do backfill sem chamar a IA nem alterar o banco.
+
+        O tamanho do prompt é medido em uma amostra das linhas pendentes e
+        extrapolado para o total.
+        """
+        checkpoint = self._load_checkpoint(persist=False)
+        pending = self.email_repository.count_backfill(
+            after_id=checkpoint["last_id"],
+            only_undefined=self.only_undefined,
+            max_id=checkpoint["max_id"]
+        )
+        sample = self.email_repository.get_backfill_chunk(
+            after_id=checkpoint["last_id"],
+            limit=self.DRY_RUN_SAMPLE_SIZE,
+            only_undefined=self.only_undefined,
+            max_id=checkpoint["max_id"]
+        )
+
+        processed_texts = text_preprocessor.preprocess_many([row.content for row in sample])
+        prompt_tokens = [
+            ExampleIndex.estimate_tokens(self.ai_integration._build_dynamic_prompt(
+                processed_text,
+                exclude_example_id=row.id
+            ))
+            for row, processed_text in zip(sample, processed_texts)
+        ]
+        average_prompt_tokens = sum(prompt_tokens) / len(prompt_tokens) if prompt_tokens else 0
+
+        total_prompt_tokens = round(average_prompt_tokens * pending)
+        total_completion_tokens = self.ASSUMED_COMPLETION_TOKENS * pending
+        cost = (
+            total_prompt_tokens / 1000 * self.PRICE_PER_1K_PROMPT_TOKENS
+            + total_completion_tokens / 1000 * self.PRICE_PER_1K_COMPLETION_TOKENS
+        )
+
+        throughput_per_second = self.concurrency / assumed_latency_seconds
+        if self.requests_per_minute > 0:
+            throughput_per_second = min(throughput_per_second, self.requests_per_minute / 60)
+
+        return {
+            "pending_rows": pending,
+            "resume_from_id": checkpoint["last_id"],
+            "average_prompt_tokens": round(average_prompt_tokens, 1),
+            "estimated_prompt_tokens": total_prompt_tokens,
+            "estimated_completion_tokens": total_completion_tokens,
+            "estimated_cost_usd": round(cost, 2),
+            "estimated_duration_seconds": round(pending / throughput_per_second) if pending else 0
+        }
+
+    def _classify_row(self, row: Any) -> Optional[Dict[str, Any]]:
+        """Reclassifica uma linha; retorna None em caso de falha para que o lote prossiga."""
+        self.rate_limiter.acquire()
+        try:
+            ai_result = self._thread_integration().classify_email(row.content, exclude_example_id=row.id)
+        except Exception as e:
+            print(f"Erro ao reclassificar submissão {row.id}: {str(e)}")
+            return None
+        if not ai_result["classification"]:
+            # IA indisponível: mantém a classificação atual para uma próxima execução
+            return None
+        return {
+            "id": row.id,
+            "created_at": row.created_at,
+            "ai_classification": ai_result["classification"],
+            "ai_suggested_reply": ai_result["suggested_reply"]
+        }
+
+    def _thread_integration(self) -> OpenAIIntegration:
+        """Integração de IA exclusiva da thread atual."""
+        integration = getattr(self._thread_state, "ai_integration", None)
+        if integration is None:
+            integration = self._thread_state.ai_integration = self.ai_integration_factory()
+        return integration
+
+    def _load_checkpoint(self, persist: bool = True) -> Dict[str, Any]:
+        """Carrega o checkpoint existente ou cria um novo, fixando o maior ID do escopo."""
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, encoding="utf-8") as f:
+                checkpoint = json.load(f)
+            if checkpoint.get("only_undefined") != self.only_undefined:
+                raise ValueError("Checkpoint pertence a um job com outro escopo; use outro arquivo")
+            if not checkpoint.get("finished_at"):
+                checkpoint.setdefault("failed_ids", [])
+                return checkpoint
+
+        checkpoint = {
+            "only_undefined": self.only_undefined,
+            "last_id": 0,
+            "max_id": self.email_repository.get_max_id(),
+            "processed": 0,
+            "updated": 0,
+            "failed": 0,
+            "failed_ids": [],
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "finished_at": None
+        }
+        if persist:
+            self._save_checkpoint(checkpoint)
+        return checkpoint
+
+    def _save_checkpoint(self, checkpoint: Dict[str, Any]) -> None:
+        """Grava o checkpoint de forma atômica."""
+        directory = os.path.dirname(self.checkpoint_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.checkpoint_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f, indent=2)
+        os.replace(temp_path, self.checkpoint_path)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Ponto de entrada da linha de comando."""
+    import argparse
+
+    from app.core.database import db_manager
+    from app.integrations.example_index import load_example_index
+
+    parser = argparse.ArgumentParser(description="Reclassifica submissões existentes com o prompt e modelo atuais.")
+    parser.add_argument("--checkpoint", default="backfill_checkpoint.json", help="Arquivo de checkpoint para retomar o job")
+    parser.add_argument("--batch-size", type=int, default=100, help="Linhas por lote gravado no banco")
+    parser.add_argument("--concurrency", type=int, default=4, help="Chamadas simultâneas à IA")
+    parser.add_argument("--rpm", type=float, default=60, help="Limite de chamadas por minuto (0 = sem limite)")
+    parser.add_argument("--only-undefined", action="store_true", help="Reclassifica apenas linhas INDEFINIDO ou não classificadas")
+    parser.add_argument("--dry-run", action="store_true", help="Apenas estima custo e duração")
+    parser.add_argument("--assumed-latency", type=float, default=3.0, help="Latência média por chamada, em segundos, para o dry-run")
+    args = parser.parse_args(argv)
+
+    load_example_index()
+
+    db = db_manager.SessionLocal()
+    try:
+        service = BackfillService(
+            EmailRepository(db),
+            OpenAIIntegration,
+            checkpoint_path=args.checkpoint,
+            batch_size=args.batch_size,
+            concurrency=args.concurrency,
+            requests_per_minute=args.rpm,
+            only_undefined=args.only_undefined
+        )
+        if args.dry_run:
+            result = service.dry_run(assumed_latency_seconds=args.assumed_latency)
+        else:
+            result = service.run()
+            if settings.few_shot_index_path:
+                # O snapshot carregado pelos servidores passa a ter os novos rótulos
+                example_index.save(settings.few_shot_index_path)
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,30 @@
 """Serviços de lógica de negócio para emails."""
-from typing import Optional, List
+import time
+from typing import Optional, List, Tuple, Dict, Any, AsyncIterator, Union
 from fastapi import UploadFile
-from app.schemas.email import EmailSubmissionCreate, EmailSubmissionResponse, EmailSubmissionList, DeleteEmailsResponse, EmailStatsResponse
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from app.schemas.email import (
+    EmailSubmissionCreate,
+    EmailSubmissionResponse,
+    EmailSubmissionList,
+    EmailSubmissionSummaryList,
+    EmailFilters,
+    DeleteEmailsResponse,
+    EmailStatsResponse
+)
+from app.core.events import event_broker
 from app.integrations.ai import OpenAIIntegration
+from app.integrations.example_index import example_index
 from app.repositories.email_repository import EmailRepository
+from app.utils.blob_store import blob_store
 from app.utils.file_processor import FileProcessor
 
 
 class EmailService:
     """Serviço de lógica de negócio para operações com emails."""
 
+    FILE_MEDIA_TYPES = {"PDF": "application/pdf", "TXT": "text/plain"}
+
     def __init__(self, email_repository: EmailRepository, ai_integration: OpenAIIntegration = None):
         """Inicializa o service com uma sessão de banco de dados."""
         self.email_repository = email_repository
@@ -28,10 +43,13 @@ class EmailService:
                 type="Texto puro"
             )
             
-            ai_result = self.ai_integration.classify_email(email_data.content)
+            # A classificação bloqueia (limitador, retentativas e a própria chamada à IA)
+            ai_result = await run_in_threadpool(self.ai_integration.classify_email, email_data.content)
 
             submission = self.email_repository.create(email_data, ai_result)
-            return EmailSubmissionResponse.model_validate(submission)
+            response = EmailSubmissionResponse.model_validate(submission)
+            await self._publish_created(response)
+            return response
         except Exception as e:
             print(f"Erro ao processar email de texto: {str(e)}")
             raise e
@@ -43,45 +61,21 @@ class EmailService:
     ) -> EmailSubmissionResponse:
         """Cria submissão de email a partir de arquivo (.txt ou .pdf)."""
         try:
-            if not file.filename:
-                raise ValueError("Nome do arquivo é obrigatório")
-            
-            file_extension = file.filename.lower().split('.')[-1]
-            if file_extension not in ['txt', 'pdf']:
-                raise ValueError("Apenas arquivos .txt e .pdf são aceitos")
-            
-            FileProcessor.validate_file_size(file, max_size_mb=1)
-            
-            if file_extension == 'txt':
-                final_content = FileProcessor._extract_text_from_txt(file)
-                file_type = "TXT"
-                message_content = file.filename
-            elif file_extension == 'pdf':
-                final_content = FileProcessor._extract_text_from_pdf(file)
-                file_type = "PDF"
-                message_content = file.filename
-            else:
-                raise ValueError("Tipo de arquivo não suportado")
+            email_data, message_content = self.extract_file_email(email_title, file)
+            file_data = await self.read_original_file(file)
             
-            FileProcessor.validate_text_length(final_content)
-            
-            if not final_content or not final_content.strip():
-                raise ValueError("Não foi possível extrair conteúdo do arquivo")
-            
-            email_data = EmailSubmissionCreate(
-                email_title=email_title,
-                content=final_content.strip(),
-                type=file_type
-            )
-            
-            ai_result = self.ai_integration.classify_email(email_data.content)
+            ai_result = await run_in_threadpool(self.ai_integration.classify_email, email_data.content)
 
             submission = self.email_repository.create_with_custom_message(
                 email_data, 
                 ai_result, 
-                message_content
+                message_content,
+                file_sha256=blob_store.hash_bytes(file_data)
             )
-            return EmailSubmissionResponse.model_validate(submission)
+            await self.store_original_file(file_data)
+            response = EmailSubmissionResponse.model_validate(submission)
+            await self._publish_created(response)
+            return response
             
         except ValueError as e:
             raise e
@@ -89,20 +83,215 @@ class EmailService:
             print(f"Erro ao processar email de arquivo: {str(e)}")
             raise e
 
-    async def get_submissions(self, skip: int, limit: int, email_title: Optional[str] = None) -> EmailSubmissionList:
-        """Lista submissões com paginação, contagem total e filtro opcional por título."""
+    @staticmethod
+    def extract_file_email(email_title: str, file: UploadFile) -> Tuple[EmailSubmissionCreate, str]:
+        """
+        Valida o arquivo enviado e extrai seu conteúdo.
+        
+        Returns:
+            Tuple contendo os dados da submissão e o conteúdo a ser salvo no campo message
+            
+        Raises:
+            ValueError: Se o arquivo for inválido ou não tiver conteúdo
+        """
+        if not file.filename:
+            raise ValueError("Nome do arquivo é obrigatório")
+        
+        file_extension = file.filename.lower().split('.')[-1]
+        if file_extension not in ['txt', 'pdf']:
+            raise ValueError("Apenas arquivos .txt e .pdf são aceitos")
+        
+        FileProcessor.validate_file_size(file, max_size_mb=1)
+        
+        if file_extension == 'txt':
+            final_content = FileProcessor._extract_text_from_txt(file)
+            file_type = "TXT"
+            message_content = file.filename
+        elif file_extension == 'pdf':
+            final_content = FileProcessor._extract_text_from_pdf(file)
+            file_type = "PDF"
+            message_content = file.filename
+        else:
+            raise ValueError("Tipo de arquivo não suportado")
+        
+        FileProcessor.validate_text_length(final_content)
+        
+        if not final_content or not final_content.strip():
+            raise ValueError("Não foi possível extrair conteúdo do arquivo")
+        
+        email_data = EmailSubmissionCreate(
+            email_title=email_title,
+            content=final_content.strip(),
+            type=file_type
+        )
+        return email_data, message_content
+
+    @staticmethod
+    async def read_original_file(file: UploadFile) -> bytes:
+        """Lê o conteúdo do arquivo enviado, a ser gravado no blob store depois da submissão."""
+        data = await file.read()
+        await file.seek(0)
+        return data
+
+    @staticmethod
+    async def store_original_file(data: bytes) -> None:
+        """
+        Grava o arquivo original no blob store (uma única vez por conteúdo).
+        
+        Chamado só depois do commit da submissão que o referencia, para que
+        falhas na classificação ou na gravação não deixem arquivos órfãos.
+        Se a gravação falhar, a submissão continua salva, sem o arquivo
+        disponível para download.
+        """
+        try:
+            await run_in_threadpool(blob_store.put, data)
+        except Exception as e:
+            print(f"Erro ao gravar arquivo original no blob store: {str(e)}")
+
+    def delete_unreferenced_files(self, file_hashes: List[str]) -> int:
+        """
+        Remove do blob store os arquivos que nenhuma submissão referencia mais.
+        
+        Returns:
+            Quantidade de arquivos removidos
+        """
+        def is_referenced(sha256: str) -> bool:
+            return bool(self.email_repository.get_referenced_file_hashes([sha256]))
+
+        deleted = 0
+        for sha256 in file_hashes:
+            try:
+                deleted += blob_store.delete_unreferenced(sha256, is_referenced)
+            except Exception as e:
+                print(f"Erro ao remover arquivo {sha256} do blob store: {str(e)}")
+        return deleted
+
+    async def stream_text_email(self, email_title: str, content: str) -> AsyncIterator[Dict[str, Any]]:
+        """Variante em streaming de `submit_text_email`."""
+        email_data = EmailSubmissionCreate(
+            email_title=email_title,
+            content=content,
+            type="Texto puro"
+        )
+        async for event in self.stream_submission(email_data):
+            yield event
+
+    async def stream_submission(
+        self,
+        email_data: EmailSubmissionCreate,
+        message_content: Optional[str] = None,
+        file_data: Optional[bytes] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Classifica em streaming e persiste a submissão quando a resposta da IA termina.
+        
+        Repassa os eventos `classification` (com `elapsed_ms` desde o início) e
+        `reply_delta` da integração e termina com um evento `submission` contendo
+        a linha salva. O arquivo original (`file_data`) é gravado no blob store
+        depois da submissão.
+        """
+        started_at = time.perf_counter()
+        
+        async for event in iterate_in_threadpool(self.ai_integration.stream_classify_email(email_data.content)):
+            if event["event"] == "classification":
+                yield {**event, "elapsed_ms": round((time.perf_counter() - started_at) * 1000, 1)}
+            elif event["event"] == "reply_delta":
+                yield event
+            elif event["event"] == "result":
+                ai_result = {
+                    "classification": event["classification"],
+                    "suggested_reply": event["suggested_reply"]
+                }
+                if message_content is None:
+                    submission = self.email_repository.create(email_data, ai_result)
+                else:
+                    submission = self.email_repository.create_with_custom_message(
+                        email_data,
+                        ai_result,
+                        message_content,
+                        file_sha256=blob_store.hash_bytes(file_data) if file_data is not None else None
+                    )
+                    if file_data is not None:
+                        await self.store_original_file(file_data)
+                
+                response = EmailSubmissionResponse.model_validate(submission)
+                await self._publish_created(response)
+                yield {
+                    "event": "submission",
+                    "submission": response.model_dump(mode="json"),
+                    "elapsed_ms": round((time.perf_counter() - started_at) * 1000, 1)
+                }
+
+    async def get_submissions(
+        self,
+        skip: int,
+        limit: int,
+        filters: Optional[EmailFilters] = None,
+        summary: bool = False
+    ) -> Union[EmailSubmissionList, EmailSubmissionSummaryList]:
+        """
+        Lista submissões com paginação, contagem total, facetas e filtros opcionais.
+        
+        O total e as facetas saem da mesma consulta agrupada. Com `summary`,
+        retorna apenas os campos curtos de cada submissão; o conteúdo
+        completo fica disponível em `get_submission`.
+        """
         try:
-            submissions = self.email_repository.get_all(skip=skip, limit=limit, email_title=email_title)
-            total = self.email_repository.count(email_title=email_title)
+            submissions = self.email_repository.get_all(skip=skip, limit=limit, filters=filters, summary=summary)
+            total, facets, _ = self.email_repository.summarize_facets(
+                self.email_repository.get_facet_counts(filters),
+                filters
+            )
 
-            return EmailSubmissionList(
-                submissions=[EmailSubmissionResponse.model_validate(sub) for sub in submissions],
-                total=total
+            # A página inteira é validada em uma única chamada ao pydantic-core
+            list_model = EmailSubmissionSummaryList if summary else EmailSubmissionList
+            return list_model.model_validate(
+                {"submissions": submissions, "total": total, "facets": facets},
+                from_attributes=True
             )
         except Exception as e:
             print("Erro ao listar submissões")
             raise e
 
+    async def get_submission(self, email_id: int) -> Optional[EmailSubmissionResponse]:
+        """Busca uma submissão completa pelo ID; retorna None se não existir."""
+        try:
+            submission = self.email_repository.get_by_id(email_id)
+            if submission is None:
+                return None
+            return EmailSubmissionResponse.model_validate(submission)
+        except Exception as e:
+            print(f"Erro ao buscar submissão {email_id}: {str(e)}")
+            raise e
+
+    async def get_original_file(self, email_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Localiza o arquivo original de uma submissão no blob store.
+        
+        Returns:
+            Caminho, nome, tipo de mídia e hash do arquivo, ou None se a
+            submissão não existir ou não tiver arquivo armazenado
+        """
+        try:
+            submission = self.email_repository.get_file_reference(email_id)
+            if submission is None or not submission.file_sha256:
+                return None
+            
+            path = blob_store.path(submission.file_sha256)
+            if not path.is_file():
+                print(f"Arquivo {submission.file_sha256} da submissão {email_id} não encontrado no blob store")
+                return None
+            
+            return {
+                "path": path,
+                "filename": submission.message,
+                "media_type": self.FILE_MEDIA_TYPES.get(submission.type, "application/octet-stream"),
+                "sha256": submission.file_sha256
+            }
+        except Exception as e:
+            print(f"Erro ao buscar arquivo da submissão {email_id}: {str(e)}")
+            raise e
+
     async def delete_emails(self, ids: List[int]) -> DeleteEmailsResponse:
         """Deleta emails por uma lista de IDs."""
         try:
@@ -116,7 +305,13 @@ class EmailService:
                 if not isinstance(email_id, int) or email_id <= 0:
                     raise ValueError(f"ID inválido: {email_id}")
             
-            deleted_ids, not_found_ids = self.email_repository.delete_by_ids(ids)
+            deleted_ids, not_found_ids, stats_delta, file_hashes = self.email_repository.delete_by_ids(ids)
+            
+            if deleted_ids:
+                example_index.remove(deleted_ids)
+                await run_in_threadpool(self.delete_unreferenced_files, file_hashes)
+                await event_broker.publish("submission.deleted", {"ids": deleted_ids})
+                await event_broker.publish("stats.delta", stats_delta)
             
             return DeleteEmailsResponse(
                 deleted_count=len(deleted_ids),
@@ -130,11 +325,36 @@ class EmailService:
             print(f"Erro ao deletar emails: {str(e)}")
             raise e
 
-    async def get_statistics(self) -> EmailStatsResponse:
-        """Retorna estatísticas dos emails."""
+    async def get_statistics(self, filters: Optional[EmailFilters] = None) -> EmailStatsResponse:
+        """Retorna estatísticas dos emails, com filtros opcionais."""
         try:
-            stats = self.email_repository.get_statistics()
+            stats = self.email_repository.get_statistics(filters)
             return EmailStatsResponse(**stats)
         except Exception as e:
             print(f"Erro ao buscar estatísticas: {str(e)}")
-            raise e
\ No newline at end of file
+            raise e
+
+    async def _publish_created(self, submission: EmailSubmissionResponse) -> None:
+        """
+        Publica os eventos de criação de submissão e de variação das estatísticas.
+        
+        Também adiciona a submissão ao índice de exemplos few-shot.
+        """
+        if self.ai_integration:
+            self.ai_integration.remember_example(
+                submission.id,
+                submission.message,
+                submission.type,
+                submission.ai_classification,
+                submission.ai_suggested_reply,
+                submission.created_at
+            )
+        stats_delta = self.email_repository.build_stats_delta(
+            [(submission.ai_classification, submission.type)]
+        )
+        # O texto extraído do arquivo fica só no detalhe da submissão
+        await event_broker.publish(
+            "submission.created",
+            {"submission": submission.model_dump(mode="json", exclude={"extracted_text"})}
+        )
+        await event_broker.publish("stats.delta", stats_delta)
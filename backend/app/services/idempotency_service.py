@@ -0,0 +1,230 @@
+"""Serviço de idempotência para as rotas de submissão."""
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.database import db_manager
+from app.repositories.idempotency_repository import IdempotencyRepository
+
+
+class IdempotencyKeyMismatchError(Exception):
+    """A chave já foi usada com uma requisição diferente."""
+
+
+class IdempotencyKeyInProgressError(Exception):
+    """A requisição original ainda está em processamento."""
+
+
+# Requisições em andamento neste processo, por chave: (impressão digital, resultado)
+_inflight: Dict[str, Tuple[str, asyncio.Future]] = {}
+
+
+class IdempotencyService:
+    """
+    Executa operações no máximo uma vez por chave de idempotência.
+
+    Duplicatas concorrentes no mesmo processo aguardam a requisição original;
+    em outros workers, aguardam a chave reservada no banco ser concluída.
+    Retentativas posteriores recebem a resposta armazenada.
+
+    O corpo da resposta é tratado como JSON já serializado: é gravado e
+    devolvido como está, sem ser decodificado e serializado de novo.
+
+    A reserva de uma chave vale por `idempotency_lease_seconds`: se o worker
+    que a reservou morrer sem concluí-la ou liberá-la, a chave pode ser
+    assumida por outra requisição depois desse prazo.
+    """
+
+    POLL_INTERVAL_SECONDS = 0.5
+
+    def __init__(self, idempotency_repository: IdempotencyRepository):
+        """Inicializa o service com o repositório de chaves."""
+        self.idempotency_repository = idempotency_repository
+
+    @staticmethod
+    def fingerprint(*parts: Any) -> str:
+        """Calcula a impressão digital de uma requisição a partir de suas partes relevantes."""
+        digest = hashlib.sha256()
+        for part in parts:
+            if isinstance(part, bytes):
+                digest.update(hashlib.sha256(part).digest())
+            else:
+                digest.update(json.dumps(part, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    async def run(
+        self,
+        key: str,
+        fingerprint: str,
+        operation: Callable[[], Awaitable[Tuple[int, str]]]
+    ) -> Tuple[int, str, bool]:
+        """
+        Executa a operação uma única vez para a chave informada.
+
+        Args:
+            key: Valor do header Idempotency-Key
+            fingerprint: Impressão digital da requisição
+            operation: Corrotina que retorna (status HTTP, corpo da resposta em JSON)
+
+        Returns:
+            Tuple contendo o status HTTP, o corpo da resposta e se ela foi reaproveitada
+
+        Raises:
+            IdempotencyKeyMismatchError: Se a chave já foi usada com outra requisição
+            IdempotencyKeyInProgressError: Se a requisição original não terminou a tempo
+        """
+        inflight = _inflight.get(key)
+        if inflight is not None:
+            inflight_fingerprint, inflight_future = inflight
+            self._check_fingerprint(inflight_fingerprint, fingerprint)
+            try:
+                status_code, body = await asyncio.shield(inflight_future)
+            except asyncio.CancelledError:
+                if not inflight_future.cancelled():
+                    raise
+                # A requisição original foi cancelada e liberou a chave
+                return await self.run(key, fingerprint, operation)
+            return status_code, body, True
+
+        future = asyncio.get_running_loop().create_future()
+        _inflight[key] = (fingerprint, future)
+        try:
+            status_code, body, replayed = await self._run_reserved(key, fingerprint, operation)
+            future.set_result((status_code, body))
+            return status_code, body, replayed
+        except Exception as e:
+            future.set_exception(e)
+            # Evita o aviso de exceção não recuperada quando não há duplicatas aguardando
+            future.exception()
+            raise
+        except BaseException:
+            # Cancelamento (ex.: cliente desconectou): as duplicatas tentam de novo
+            future.cancel()
+            raise
+        finally:
+            _inflight.pop(key, None)
+
+    async def _run_reserved(
+        self,
+        key: str,
+        fingerprint: str,
+        operation: Callable[[], Awaitable[Tuple[int, str]]]
+    ) -> Tuple[int, str, bool]:
+        """Reserva a chave no banco e executa a operação, ou reaproveita o resultado existente."""
+        now = datetime.now(timezone.utc)
+        expires_at = now + timedelta(hours=settings.idempotency_ttl_hours)
+        locked_until = now + timedelta(seconds=settings.idempotency_lease_seconds)
+
+        reserved, record = self.idempotency_repository.reserve(key, fingerprint, expires_at, locked_until)
+        if not reserved and record is not None and self._is_expired(record.expires_at, now):
+            self.idempotency_repository.delete(key)
+            reserved, record = self.idempotency_repository.reserve(key, fingerprint, expires_at, locked_until)
+
+        if not reserved and record is not None and self._is_abandoned(record, now):
+            self._check_fingerprint(record.fingerprint, fingerprint)
+            reserved = self.idempotency_repository.take_over(key, record.locked_until, locked_until)
+            if not reserved:
+                record = self.idempotency_repository.get(key)
+
+        if not reserved:
+            if record is None:
+                # A chave foi liberada entre a reserva e a leitura; tenta novamente
+                return await self._run_reserved(key, fingerprint, operation)
+            self._check_fingerprint(record.fingerprint, fingerprint)
+            return await self._wait_for_completion(key, fingerprint, operation)
+
+        try:
+            status_code, body = await operation()
+        except BaseException:
+            # Também em cancelamentos, para a chave não ficar presa em processamento
+            self.idempotency_repository.release(key)
+            raise
+
+        self.idempotency_repository.complete(key, status_code, body)
+        return status_code, body, False
+
+    async def _wait_for_completion(
+        self,
+        key: str,
+        fingerprint: str,
+        operation: Callable[[], Awaitable[Tuple[int, str]]]
+    ) -> Tuple[int, str, bool]:
+        """
+        Aguarda a chave reservada por outro worker ser concluída.
+
+        As consultas ao banco rodam no threadpool para não bloquear o event loop.
+        """
+        deadline = asyncio.get_running_loop().time() + settings.idempotency_wait_seconds
+        while True:
+            record = await run_in_threadpool(self.idempotency_repository.get, key)
+            if record is None:
+                # A requisição original falhou e liberou a chave
+                return await self._run_reserved(key, fingerprint, operation)
+            if record.status == IdempotencyRepository.COMPLETED:
+                return record.response_status, record.response_body, True
+            if self._is_abandoned(record, datetime.now(timezone.utc)):
+                # O worker que reservou a chave morreu; tenta assumi-la
+                return await self._run_reserved(key, fingerprint, operation)
+            if asyncio.get_running_loop().time() >= deadline:
+                raise IdempotencyKeyInProgressError("Requisição com esta chave ainda está em processamento")
+            await asyncio.sleep(self.POLL_INTERVAL_SECONDS)
+
+    @staticmethod
+    def _check_fingerprint(stored: str, received: str) -> None:
+        """Garante que a chave não está sendo reutilizada com outra requisição."""
+        if stored != received:
+            raise IdempotencyKeyMismatchError("Chave de idempotência já utilizada com outra requisição")
+
+    @classmethod
+    def _is_abandoned(cls, record, now: datetime) -> bool:
+        """
+        Indica se uma chave em processamento teve a concessão vencida.
+
+        Chaves criadas antes da concessão existir usam a data de criação.
+        """
+        if record.status != IdempotencyRepository.PROCESSING:
+            return False
+        locked_until = record.locked_until
+        if locked_until is None:
+            if record.created_at is None:
+                return False
+            created_at = record.created_at
+            if created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=timezone.utc)
+            locked_until = created_at + timedelta(seconds=settings.idempotency_lease_seconds)
+        return cls._is_expired(locked_until, now)
+
+    @staticmethod
+    def _is_expired(expires_at: datetime, now: datetime) -> bool:
+        """Compara datas considerando bancos que não preservam o fuso horário."""
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        return expires_at <= now
+
+
+def cleanup_expired_keys(max_batches: int = 10, batch_size: int = 1000) -> int:
+    """
+    Remove chaves expiradas em lotes limitados.
+
+    Returns:
+        Quantidade de chaves removidas
+    """
+    db = db_manager.SessionLocal()
+    try:
+        repository = IdempotencyRepository(db)
+        now = datetime.now(timezone.utc)
+        total = 0
+        for _ in range(max_batches):
+            deleted_count = repository.delete_expired(now, batch_size=batch_size)
+            total += deleted_count
+            if deleted_count < batch_size:
+                break
+        return total
+    finally:
+        db.close()
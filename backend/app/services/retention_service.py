@@ -0,0 +1,67 @@
+"""Manutenção periódica das partições de submissões (criação antecipada e retenção)."""
+from typing import Any, Dict
+
+from app.core.database import db_manager
+from app.integrations.example_index import example_index
+from app.models.email import EmailSubmission
+from app.repositories.email_repository import EmailRepository
+from app.repositories.table_version_repository import TableVersionRepository
+from app.services.email_service import EmailService
+
+
+def maintain_partitions() -> Dict[str, Any]:
+    """
+    Cria as partições futuras que faltam e aplica a política de retenção.
+
+    Quando partições são removidas:
+    - a versão da tabela é incrementada, invalidando os ETags da listagem e
+      das estatísticas;
+    - os exemplos criados antes do fim da última partição removida saem do
+      índice de exemplos deste processo (`removed_before` é repassado aos
+      demais workers no evento `resync`);
+    - com `drop`, antes de apagar cada partição desanexada, os arquivos que
+      só ela referenciava são apagados do blob store (com `detach` as linhas
+      continuam nas tabelas desanexadas, então os arquivos são mantidos).
+
+    O evento `resync` para os clientes fica a cargo de quem chama, que sabe
+    como publicá-lo (broker do processo ou `notify_workers`).
+
+    Returns:
+        Partições criadas e removidas, quantidade de arquivos apagados e a
+        data (ISO) antes da qual as submissões foram removidas
+    """
+    manager = db_manager.partitions
+    if manager is None:
+        return {"created": [], "removed": [], "deleted_files": 0, "removed_before": None}
+
+    created = manager.ensure_partitions()
+    bounds = {partition.name: partition.upper for partition in manager.expired_partitions()}
+    deleted_files = 0
+
+    def delete_partition_files(name: str) -> None:
+        nonlocal deleted_files
+        db = db_manager.SessionLocal()
+        try:
+            email_service = EmailService(EmailRepository(db))
+            for file_hashes in manager.unreferenced_values(name, "file_sha256"):
+                deleted_files += email_service.delete_unreferenced_files(file_hashes)
+        finally:
+            db.close()
+
+    removed = manager.apply_retention(before_drop=delete_partition_files)
+
+    removed_before = max((bounds[name] for name in removed if name in bounds), default=None)
+    if removed_before:
+        example_index.remove_created_before(removed_before)
+    if removed:
+        db =db_manager.SessionLocal()
+        try:
+            TableVersionRepository(db).bump(EmailSubmission.__tablename__)
+        finally:
+            db.close()
+    return {
+        "created": created,
+        "removed": removed,
+        "deleted_files": deleted_files,
+        "removed_before": removed_before.isoformat() if removed_before else None
+    }
@@ -0,0 +1,257 @@
+"""Armazenamento em disco dos arquivos originais, endereçado pelo conteúdo."""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import settings
+
+
+@dataclass(frozen=True)
+class StoredBlob:
+    """Resultado da gravação de um arquivo no blob store."""
+
+    sha256: str
+    size: int
+    created: bool
+
+
+class BlobStore:
+    """
+    Blob store endereçado por SHA-256.
+
+    Cada conteúdo é gravado uma única vez em `<raiz>/<ab>/<cd>/<sha256>`:
+    o hash é calculado antes da escrita e, se o arquivo já existe, nada é
+    gravado. Novos arquivos são escritos em um temporário na mesma partição,
+    sincronizados e renomeados atomicamente, então leitores (e outros
+    processos gravando o mesmo conteúdo) nunca veem um arquivo parcial.
+    Como o mesmo conteúdo pode estar referenciado por várias submissões, um
+    arquivo só é removido quando nenhuma delas o referencia mais
+    (`delete_unreferenced`).
+    """
+
+    def __init__(self, root: str, fsync: bool = True):
+        """Inicializa o blob store; os diretórios são criados na primeira gravação."""
+        self.root = Path(root)
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self.uploads = 0
+        self.deduplicated = 0
+        self.uploaded_bytes = 0
+        self.written_bytes = 0
+        self.deleted = 0
+
+    @staticmethod
+    def hash_bytes(data: bytes) -> str:
+        """Retorna o SHA-256 (hexadecimal) do conteúdo."""
+        return hashlib.sha256(data).hexdigest()
+
+    def path(self, sha256: str) -> Path:
+        """
+        Caminho do arquivo de um hash.
+
+        Raises:
+            ValueError: Se o valor não for um SHA-256 hexadecimal
+        """
+        if len(sha256) != 64 or not all(char in "0123456789abcdef" for char in sha256):
+            raise ValueError("Hash de arquivo inválido")
+        return self.root / sha256[:2] / sha256[2:4] / sha256
+
+    def exists(self, sha256: str) -> bool:
+        """Indica se o conteúdo já está armazenado."""
+        return self.path(sha256).is_file()
+
+    def put(self, data: bytes) -> StoredBlob:
+        """Grava o conteúdo se ainda não estiver armazenado e retorna seu hash."""
+        sha256 = self.hash_bytes(data)
+        target = self.path(sha256)
+
+        created = False
+        if not target.is_file():
+            self._write_atomic(target, data)
+            created = True
+
+        with self._lock:
+            self.uploads += 1
+            self.uploaded_bytes += len(data)
+            if created:
+                self.written_bytes += len(data)
+            else:
+                self.deduplicated += 1
+        return StoredBlob(sha256=sha256, size=len(data), created=created)
+
+    def delete_unreferenced(self, sha256: str, is_referenced: Callable[[str], bool]) -> bool:
+        """
+        Remove o arquivo se nenhuma submissão o referenciar.
+
+        O arquivo é renomeado para fora do seu caminho antes de as referências
+        serem conferidas de novo. Envios gravam a submissão antes do arquivo,
+        então um envio concorrente do mesmo conteúdo ou já aparece nessa
+        segunda conferência (e o arquivo volta ao lugar) ou não encontra o
+        arquivo e o grava outra vez.
+
+        Args:
+            sha256: Hash do arquivo
+            is_referenced: Indica se alguma submissão ainda referencia o hash
+
+        Returns:
+            True se o arquivo foi removido
+        """
+        if is_referenced(sha256):
+            return False
+        target = self.path(sha256)
+        removing = target.with_name(f".del-{os.getpid()}-{threading.get_ident()}-{sha256}")
+        try:
+            os.replace(target, removing)
+        except FileNotFoundError:
+            return False
+
+        if is_referenced(sha256):
+            os.replace(removing, target)
+            return False
+        os.unlink(removing)
+        with self._lock:
+            self.deleted += 1
+        return True
+
+    def _write_atomic(self, target: Path, data: bytes) -> None:
+        """Escreve em um arquivo temporário e o renomeia para o destino."""
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=target.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.chmod(temp_path, 0o444)
+            os.replace(temp_path, target)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+        if self.fsync:
+            dir_fd = os.open(target.parent, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Retorna os contadores de gravação e remoção deste processo e a amplificação de escrita."""
+        with self._lock:
+            return {
+                "uploads": self.uploads,
+                "deduplicated": self.deduplicated,
+                "uploaded_bytes": self.uploaded_bytes,
+                "written_bytes": self.written_bytes,
+                "deleted": self.deleted,
+                "write_amplification": round(self.written_bytes / self.uploaded_bytes, 4) if self.uploaded_bytes else 0.0
+            }
+
+
+blob_store = BlobStore(settings.blob_store_path)
+
+
+def _process_write_bytes() -> Optional[int]:
+    """Bytes enviados ao dispositivo de armazenamento por este processo (Linux)."""
+    try:
+        with open("/proc/self/io", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("write_bytes:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def benchmark(root: str, uploads: int = 500, size_kb: int = 256, duplicate_ratio: float = 0.5) -> dict:
+    """
+    Mede a amplificação de escrita e a vazão de download do blob store.
+
+    Grava `uploads` arquivos aleatórios, dos quais a fração `duplicate_ratio`
+    repete conteúdos já enviados, e depois baixa todos pela mesma
+    `FileResponse` usada pela API (arquivo inteiro e em um intervalo), sem
+    passar pela rede.
+
+    Returns:
+        Bytes recebidos e gravados (lógicos e no dispositivo, quando disponível)
+        e MB/s de gravação e de download
+    """
+    import random
+
+    import anyio
+    from starlette.responses import FileResponse
+
+    store = BlobStore(root)
+    unique_count = max(1, round(uploads * (1 - duplicate_ratio)))
+    contents = [os.urandom(size_kb * 1024) for _ in range(unique_count)]
+    payloads = contents + [random.choice(contents) for _ in range(uploads - unique_count)]
+    random.shuffle(payloads)
+
+    device_before = _process_write_bytes()
+    started_at = time.perf_counter()
+    hashes = [store.put(data).sha256 for data in payloads]
+    write_seconds = time.perf_counter() - started_at
+    device_after = _process_write_bytes()
+
+    async def download(sha256: str, range_header: Optional[str]) -> int:
+        headers = [(b"range", range_header.encode("latin-1"))] if range_header else []
+        scope = {"type": "http", "method": "GET", "path": "/", "headers": headers, "http_version": "1.1"}
+        received = 0
+
+        async def receive():
+            # Cliente que só desconecta depois do fim da resposta
+            await anyio.sleep_forever()
+
+        async def send(message):
+            nonlocal received
+            if message["type"] == "http.response.body":
+                received += len(message.get("body", b""))
+
+        await FileResponse(store.path(sha256), media_type="application/octet-stream")(scope, receive, send)
+        return received
+
+    async def download_all(range_header: Optional[str]) -> int:
+        return sum([await download(sha256, range_header) for sha256 in hashes])
+
+    results = {}
+    for label, range_header in (("full", None), ("range", f"bytes=0-{size_kb * 512 - 1}")):
+        started_at = time.perf_counter()
+        downloaded = anyio.run(download_all, range_header)
+        seconds = time.perf_counter() - started_at
+        results[label] = round(downloaded / seconds / 1024 / 1024, 1) if seconds else None
+
+    snapshot = store.snapshot()
+    return {
+        "uploads": uploads,
+        "unique_contents": unique_count,
+        "uploaded_bytes": snapshot["uploaded_bytes"],
+        "written_bytes": snapshot["written_bytes"],
+        "write_amplification": snapshot["write_amplification"],
+        "device_write_bytes": device_after - device_before if device_before is not None and device_after is not None else None,
+        "write_mb_per_second": round(snapshot["uploaded_bytes"] / write_seconds / 1024 / 1024, 1) if write_seconds else None,
+        "download_mb_per_second": results["full"],
+        "range_download_mb_per_second": results["range"]
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Benchmark do blob store: amplificação de escrita e vazão de download.")
+    parser.add_argument("root", help="Diretório temporário para os arquivos do benchmark")
+    parser.add_argument("--uploads", type=int, default=500, help="Quantidade de envios")
+    parser.add_argument("--size-kb", type=int, default=256, help="Tamanho de cada arquivo em KB")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.5, help="Fração de envios com conteúdo repetido")
+    args = parser.parse_args()
+
+    print(json.dumps(benchmark(args.root, args.uploads, args.size_kb, args.duplicate_ratio), indent=2))
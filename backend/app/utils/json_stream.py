@@ -0,0 +1,230 @@
+"""Parser JSON incremental para respostas da IA recebidas em streaming."""
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class IncrementalJsonParser:
+    """
+    Parser incremental para um objeto JSON.
+
+    Recebe o texto em pedaços arbitrários e emite eventos assim que cada
+    parte é decodificada, sem esperar pelo objeto completo:
+
+    - ("value_delta", chave, texto): trecho decodificado de um valor string
+    - ("value", chave, valor): valor completo de uma chave
+
+    Valores aninhados (objetos e listas) não geram trechos parciais: são
+    acumulados, contando a profundidade, e decodificados inteiros com
+    `json.loads` ao fechar. Caracteres de controle sem escape nas strings são
+    rejeitados, como no `json.loads`, para que o streaming e a leitura da
+    resposta completa aceitem exatamente as mesmas saídas da IA.
+
+    Assim como `json.loads`, apenas espaços em branco são aceitos antes do
+    `{` e depois do `}`: qualquer outro texto (ex.: cercas de markdown ou
+    explicações da IA) gera `ValueError`, em vez de ser descartado em silêncio.
+    """
+
+    _ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+    def __init__(self):
+        """Inicializa o parser aguardando o início do objeto."""
+        self._state = "before_object"
+        self._key: List[str] = []
+        self._current_key: Optional[str] = None
+        self._value: List[str] = []
+        self._escape: Optional[str] = None
+        self._high_surrogate: Optional[int] = None
+        self._depth = 0
+        self._nested_in_string = False
+        self._nested_escape = False
+        self.values: Dict[str, Any] = {}
+
+    @property
+    def complete(self) -> bool:
+        """Indica se o objeto foi completamente decodificado."""
+        return self._state == "done"
+
+    def feed(self, chunk: str) -> List[Tuple[str, str, Any]]:
+        """
+        Processa um novo trecho de texto.
+
+        Returns:
+            Lista de eventos decodificados neste trecho
+
+        Raises:
+            ValueError: Se o texto não for um objeto JSON plano válido
+        """
+        events: List[Tuple[str, str, Any]] = []
+        delta: List[str] = []
+
+        for char in chunk:
+            state = self._state
+
+            if state == "in_value_string":
+                if self._escape is not None:
+                    decoded = self._consume_escape(char)
+                    if decoded:
+                        self._value.append(decoded)
+                        delta.append(decoded)
+                elif char == '\\':
+                    self._escape = ""
+                elif char < " ":
+                    raise ValueError(f"Caractere de controle sem escape na string: {char!r}")
+                elif char == '"':
+                    if delta:
+                        events.append(("value_delta", self._current_key, "".join(delta)))
+                        delta = []
+                    self._finish_value("".join(self._value))
+                    events.append(("value", self._current_key, self.values[self._current_key]))
+                else:
+                    self._value.append(char)
+                    delta.append(char)
+                continue
+
+            if state == "in_key":
+                if self._escape is not None:
+                    decoded = self._consume_escape(char)
+                    if decoded:
+                        self._key.append(decoded)
+                elif char == '\\':
+                    self._escape = ""
+                elif char < " ":
+                    raise ValueError(f"Caractere de controle sem escape na chave: {char!r}")
+                elif char == '"':
+                    self._current_key = "".join(self._key)
+                    self._state = "after_key"
+                else:
+                    self._key.append(char)
+                continue
+
+            if state == "in_nested_value":
+                self._value.append(char)
+                if self._nested_in_string:
+                    if self._nested_escape:
+                        self._nested_escape = False
+                    elif char == '\\':
+                        self._nested_escape = True
+                    elif char == '"':
+                        self._nested_in_string = False
+                elif char == '"':
+                    self._nested_in_string = True
+                elif char in "{[":
+                    self._depth += 1
+                elif char in "}]":
+                    self._depth -= 1
+                    if self._depth == 0:
+                        self._finish_value(self._decode_scalar("".join(self._value)))
+                        events.append(("value", self._current_key, self.values[self._current_key]))
+                continue
+
+            if state == "in_value_scalar":
+                if char in ",}" or char.isspace():
+                    self._finish_value(self._decode_scalar("".join(self._value)))
+                    events.append(("value", self._current_key, self.values[self._current_key]))
+                    self._after_value(char)
+                else:
+                    self._value.append(char)
+                continue
+
+            if char.isspace():
+                continue
+
+            if state == "before_object":
+                if char != '{':
+                    raise ValueError(f"Texto inesperado antes do objeto JSON: {char!r}")
+                self._state = "before_key"
+            elif state == "before_key":
+                if char == '"':
+                    self._key = []
+                    self._state = "in_key"
+                elif char == '}' and not self.values:
+                    self._state = "done"
+                else:
+                    raise ValueError(f"Caractere inesperado antes da chave: {char!r}")
+            elif state == "after_key":
+                if char != ':':
+                    raise ValueError(f"Esperado ':' após a chave, encontrado {char!r}")
+                self._state = "before_value"
+            elif state == "before_value":
+                self._value = []
+                if char == '"':
+                    self._state = "in_value_string"
+                elif char in "{[":
+                    self._value.append(char)
+                    self._depth = 1
+                    self._nested_in_string = False
+                    self._nested_escape = False
+                    self._state = "in_nested_value"
+                else:
+                    self._value.append(char)
+                    self._state = "in_value_scalar"
+            elif state == "after_value":
+                self._after_value(char)
+            elif state == "done":
+                raise ValueError(f"Texto inesperado após o objeto JSON: {char!r}")
+
+        if delta and self._state == "in_value_string":
+            events.append(("value_delta", self._current_key, "".join(delta)))
+
+        return events
+
+    def close(self) -> Dict[str, Any]:
+        """
+        Finaliza a leitura e retorna o objeto decodificado.
+
+        Raises:
+            ValueError: Se o objeto JSON estiver incompleto
+        """
+        if self._state == "in_value_scalar":
+            self._finish_value(self._decode_scalar("".join(self._value)))
+        if self._state != "done":
+            raise ValueError("Objeto JSON incompleto")
+        return self.values
+
+    def _after_value(self, char: str) -> None:
+        """Trata o separador após um valor."""
+        if char.isspace():
+            return
+        if char == ',':
+            self._state = "before_key"
+        elif char == '}':
+            self._state = "done"
+        else:
+            raise ValueError(f"Esperado ',' ou '}}' após o valor, encontrado {char!r}")
+
+    def _finish_value(self, value: Any) -> None:
+        """Registra o valor completo da chave atual."""
+        self.values[self._current_key] = value
+        self._value = []
+        self._state = "after_value"
+
+    def _consume_escape(self, char: str) -> str:
+        """Acumula uma sequência de escape e retorna o texto decodificado quando completa."""
+        self._escape += char
+        if self._escape[0] != 'u':
+            decoded = self._ESCAPES.get(self._escape)
+            self._escape = None
+            if decoded is None:
+                raise ValueError(f"Sequência de escape inválida: \\{char}")
+            return decoded
+
+        if len(self._escape) < 5:
+            return ""
+
+        code_point = int(self._escape[1:], 16)
+        self._escape = None
+        if 0xD800 <= code_point <= 0xDBFF:
+            self._high_surrogate = code_point
+            return ""
+        if 0xDC00 <= code_point <= 0xDFFF and self._high_surrogate is not None:
+            code_point = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code_point - 0xDC00)
+        self._high_surrogate = None
+        return chr(code_point)
+
+    @staticmethod
+    def _decode_scalar(raw: str) -> Any:
+        """Decodifica números, booleanos, null e valores aninhados completos."""
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Valor inválido: {raw!r}") from e
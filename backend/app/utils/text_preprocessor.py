@@ -0,0 +1,218 @@
+"""Pré-processamento NLP de alto desempenho para os textos dos emails."""
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Callable, List, Optional, Sequence
+
+import nltk
+from nltk.corpus import stopwords
+from nltk.stem import RSLPStemmer
+from nltk.tokenize import NLTKWordTokenizer
+
+nltk.download('rslp')
+nltk.download('stopwords')
+
+
+URL_PATTERN = re.compile(r'http[s]?://\S+')
+EMAIL_PATTERN = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+# Caracteres que o tokenizador do NLTK (usado por `word_tokenize`) sempre separa
+# das palavras: aspas, parênteses, `;@#$%&?!*` e os travessões (U+2012 a U+2015)
+_SPLIT_PUNCTUATION = str.maketrans({char: " " for char in ';@#$%&?!*()[]{}<>"`«»“”‘’„\u2012\u2013\u2014\u2015'})
+# Reticências ("..." ou mais pontos) e traço duplo
+_ELLIPSIS_OR_DOUBLE_DASH_PATTERN = re.compile(r"\.{2,}|--")
+# Dois-pontos e vírgula só são separados quando não vêm antes de um dígito ("10:30", "3,5")
+_COLON_COMMA_PATTERN = re.compile(r"[:,]([^\d])")
+_TRAILING_COLON_COMMA_PATTERN = re.compile(r"[:,]$")
+# Ponto final de sentença, seguido ou não de fechamento de aspas/parênteses
+# (o Punkt separa as sentenças antes da tokenização)
+_SENTENCE_PERIOD_PATTERN = re.compile(r"([^.\s])\.(?=[\]\)}>\"'»”’]*(?:\s|$))")
+# Contrações do inglês que o NLTK divide ("cannot" vira "can" e "not")
+_CONTRACTIONS_PATTERN = re.compile(
+    r"(?i)\b(can)(not)\b|\b(d)('ye)\b|\b(gim)(me)\b|\b(gon)(na)\b|\b(got)(ta)\b"
+    r"|\b(lem)(me)\b|\b(more)('n)\b|\b(wan)(na)(?=\s)"
+)
+_WORD_TOKENIZER = NLTKWordTokenizer()
+
+
+class TextPreprocessor:
+    """
+    Pré-processador com padrões pré-compilados, tokenização rápida e cache de radicais.
+
+    Produz a mesma saída do pipeline original (`word_tokenize` + RSLP) para os
+    tokens que sobrevivem ao filtro (alfabéticos, fora das stopwords e com mais
+    de 2 letras), sem as passagens de regex do Treebank nem o Punkt.
+    """
+
+    def __init__(self, stem_cache_size: int = 50000):
+        """Inicializa o pré-processador; os recursos do NLTK são carregados no primeiro uso."""
+        self.stem_cache_size = stem_cache_size
+        self._stop_words: Optional[frozenset] = None
+        self._stem: Optional[Callable[[str], str]] = None
+
+    def load(self) -> None:
+        """Carrega stopwords e regras do stemmer (idempotente)."""
+        if self._stem is None:
+            self._stop_words = frozenset(stopwords.words("portuguese"))
+            self._stem = lru_cache(maxsize=self.stem_cache_size)(RSLPStemmer().stem)
+
+    def preprocess(self, text: str, advanced_preprocessing: bool = False) -> str:
+        """
+        Pré-processamento NLP conforme especificações do desafio.
+
+        Técnicas aplicadas:
+        1. Tokenização - Divisão em palavras individuais
+        2. Normalização - Conversão para lowercase
+        3. Remoção de stopwords - Remove palavras sem valor semântico
+        4. Stemming - Reduz palavras ao radical para generalização
+        5. Filtragem - Remove tokens não alfabéticos e muito curtos
+        """
+        if not text or not text.strip():
+            return ""
+
+        text = URL_PATTERN.sub('[URL]', text)
+        text = EMAIL_PATTERN.sub('[EMAIL]', text)
+        text = WHITESPACE_PATTERN.sub(' ', text)
+
+        if advanced_preprocessing:
+            self.load()
+            stop_words = self._stop_words
+            stem = self._stem
+            return " ".join(
+                stem(w) for w in self.tokenize(text.lower())
+                if w not in stop_words and len(w) > 2
+            )
+
+        return text.strip()
+
+    def preprocess_many(
+        self,
+        texts: Sequence[str],
+        advanced_preprocessing: bool = True,
+        workers: int = 1,
+        chunksize: int = 64
+    ) -> List[str]:
+        """
+        Pré-processa vários textos de uma vez.
+
+        Args:
+            texts: Textos a processar
+            advanced_preprocessing: Mesmo significado de `preprocess`
+            workers: Quantidade de processos; 1 processa no processo atual
+            chunksize: Textos enviados por vez a cada processo
+        """
+        if workers <= 1 or len(texts) < chunksize:
+            return [self.preprocess(text, advanced_preprocessing) for text in texts]
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            if advanced_preprocessing:
+                return list(executor.map(_preprocess_advanced, texts, chunksize=chunksize))
+            return list(executor.map(_preprocess_basic, texts, chunksize=chunksize))
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        """
+        Retorna apenas os tokens alfabéticos que `word_tokenize` produziria.
+
+        Aplica só as regras do tokenizador do NLTK que mudam quais palavras
+        ficam isoladas; a pontuação vira espaço em vez de token. Como no
+        `word_tokenize`, um ponto seguido de espaço encerra a sentença;
+        abreviações que o Punkt não separaria ("etc. e") são a única diferença.
+        As regras de apóstrofo dependem da ordem exata das substituições do
+        NLTK, então textos com apóstrofo (raros em português) passam pelo
+        próprio tokenizador do NLTK.
+        """
+        text = _SENTENCE_PERIOD_PATTERN.sub(r"\1 ", text)
+        if "'" in text:
+            return [word for word in _WORD_TOKENIZER.tokenize(text) if word.isalpha()]
+
+        text = _ELLIPSIS_OR_DOUBLE_DASH_PATTERN.sub(" ", text.translate(_SPLIT_PUNCTUATION))
+        text = _TRAILING_COLON_COMMA_PATTERN.sub(" ", _COLON_COMMA_PATTERN.sub(r" \1", text))
+        text = _CONTRACTIONS_PATTERN.sub(_split_contraction, f" {text} ")
+        return [word for word in text.split() if word.isalpha()]
+
+
+def _split_contraction(match: re.Match) -> str:
+    """Separa as partes de uma contração encontrada pelos padrões de contrações."""
+    return " " + " ".join(part for part in match.groups() if part) + " "
+
+
+text_preprocessor = TextPreprocessor()
+
+
+def _preprocess_advanced(text: str) -> str:
+    """Função de nível de módulo para uso em processos filhos."""
+    return text_preprocessor.preprocess(text, advanced_preprocessing=True)
+
+
+def _preprocess_basic(text: str) -> str:
+    """Função de nível de módulo para uso em processos filhos."""
+    return text_preprocessor.preprocess(text)
+
+
+def nltk_preprocess(text: str) -> str:
+    """Implementação original (word_tokenize + RSLP sem cache), usada como referência no benchmark."""
+    from nltk.tokenize import word_tokenize
+
+    text = re.sub(r'http[s]?://\S+', '[URL]', text)
+    text = re.sub(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', '[EMAIL]', text)
+    text = re.sub(r'\s+', ' ', text)
+
+    stemmer = RSLPStemmer()
+    stop_words = set(stopwords.words("portuguese"))
+    tokens = word_tokenize(text.lower())
+    return " ".join(
+        stemmer.stem(w) for w in tokens
+        if w.isalpha() and w not in stop_words and len(w) > 2
+    )
+
+
+def benchmark(texts: Sequence[str], workers: int = 1) -> dict:
+    """
+    Compara desempenho e saída do pré-processador com a implementação original.
+
+    Returns:
+        Tokens por segundo de cada implementação e a fração de textos com saída idêntica
+    """
+    nltk.download('punkt_tab')
+
+    started_at = time.perf_counter()
+    reference = [nltk_preprocess(text) for text in texts]
+    reference_seconds = time.perf_counter() - started_at
+
+    preprocessor = TextPreprocessor()
+    started_at = time.perf_counter()
+    output = preprocessor.preprocess_many(texts, workers=workers)
+    fast_seconds = time.perf_counter() - started_at
+
+    token_count = sum(len(text.split()) for text in texts)
+    mismatches = [
+        {"text": text[:120], "expected": expected, "got": got}
+        for text, expected, got in zip(texts, reference, output)
+        if expected != got
+    ]
+    return {
+        "texts": len(texts),
+        "input_tokens": token_count,
+        "reference_tokens_per_second": round(token_count / reference_seconds) if reference_seconds else None,
+        "fast_tokens_per_second": round(token_count / fast_seconds) if fast_seconds else None,
+        "speedup": round(reference_seconds / fast_seconds, 1) if fast_seconds else None,
+        "identical_ratio": round(1 - len(mismatches) / len(texts), 4) if texts else 1.0,
+        "mismatch_examples": mismatches[:5]
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Benchmark do pré-processamento contra a implementação NLTK original.")
+    parser.add_argument("file", help="Arquivo texto com um email por linha")
+    parser.add_argument("--workers", type=int, default=1, help="Processos usados por preprocess_many")
+    args = parser.parse_args()
+
+    with open(args.file, encoding="utf-8") as f:
+        lines = [line.strip() for line in f if line.strip()]
+    print(json.dumps(benchmark(lines, workers=args.workers), indent=2, ensure_ascii=False))
@@ -1,19 +1,125 @@
 """Aplicação FastAPI para gerenciamento de emails."""
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
 from app.core.database import db_manager
+from app.core.events import event_broker
+from app.core.http_cache import CompressionMiddleware, http_cache_metrics
+from app.integrations.example_index import example_index, load_example_index
+from app.models.email import EmailSubmission
+from app.repositories.table_version_repository import TableVersionRepository
+from app.services.idempotency_service import cleanup_expired_keys
+from app.services.retention_service import maintain_partitions
+from app.utils.blob_store import blob_store
+from app.utils.text_preprocessor import text_preprocessor
 from app.api.v1.emails import router as emails_router
 
-db_manager.create_tables()
+# Indica se `preload` já rodou neste processo (ou no processo pai, antes do fork)
+_preloaded = False
+
+
+def prepare_database() -> None:
+    """
+    Cria tabelas e partições e aplica a retenção.
+    
+    Índices novos em tabelas existentes e a normalização de dados antigos
+    não rodam aqui: são migrações pontuais (`python -m app.core.migrations all`).
+    """
+    db_manager.create_tables()
+    with db_manager.SessionLocal() as db:
+        TableVersionRepository(db).ensure(EmailSubmission.__tablename__)
+    maintain_partitions()
+
+
+def preload() -> None:
+    """
+    Prepara o banco e carrega os recursos compartilhados uma única vez.
+    
+    Chamado pelo servidor multiprocesso (`server.py`) antes do fork: os
+    workers herdam corpora do NLTK, regras do stemmer e índice de exemplos
+    por copy-on-write, e não executam DDL.
+    """
+    global _preloaded
+    prepare_database()
+    try:
+        text_preprocessor.load()
+    except Exception as e:
+        print(f"Erro ao carregar recursos do NLTK: {str(e)}")
+    load_example_index()
+    _preloaded = True
+
+
+async def cleanup_idempotency_keys_periodically():
+    """Remove periodicamente as chaves de idempotência expiradas."""
+    while True:
+        try:
+            await run_in_threadpool(cleanup_expired_keys)
+        except Exception as e:
+            print(f"Erro ao remover chaves de idempotência expiradas: {str(e)}")
+        await asyncio.sleep(settings.idempotency_cleanup_interval_seconds)
+
+
+async def sync_example_index_periodically():
+    """
+    Indexa as submissões criadas ou reclassificadas por outros processos.
+
+    Cada worker tem seu próprio índice: os eventos de submissões marcam os IDs
+    a reindexar e esta tarefa os lê do banco junto com os IDs novos.
+    """
+    while True:
+        await asyncio.sleep(settings.few_shot_index_sync_interval_seconds)
+        await run_in_threadpool(load_example_index, False)
+
+
+async def maintain_partitions_periodically():
+    """Cria partições futuras e aplica a retenção periodicamente."""
+    while True:
+        await asyncio.sleep(settings.partition_maintenance_interval_seconds)
+        try:
+            result = await run_in_threadpool(maintain_partitions)
+            if result["created"] or result["removed"]:
+                print(f"Partições criadas: {result['created']}; removidas: {result['removed']}")
+            if result["removed"]:
+                # Linhas removidas sem eventos por submissão: os clientes recarregam tudo
+                # e os workers descartam do índice de exemplos o que foi removido
+                await event_broker.publish("resync", {"created_before": result["removed_before"]})
+        except Exception as e:
+            print(f"Erro na manutenção das partições: {str(e)}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Inicia e encerra os recursos compartilhados junto com a aplicação."""
+    if _preloaded:
+        # Índice herdado do processo pai: só indexa o que chegou desde o preload
+        await run_in_threadpool(load_example_index, False)
+    else:
+        await run_in_threadpool(preload)
+    event_broker.add_listener(example_index.handle_event)
+    await event_broker.start()
+    cleanup_task = asyncio.create_task(cleanup_idempotency_keys_periodically())
+    index_task = asyncio.create_task(sync_example_index_periodically())
+    partition_task = asyncio.create_task(maintain_partitions_periodically()) if db_manager.partitions else None
+    yield
+    cleanup_task.cancel()
+    index_task.cancel()
+    if partition_task:
+        partition_task.cancel()
+    await event_broker.stop()
+
 
 app = FastAPI(
     title=settings.app_name,
     version=settings.app_version,
     description="API para recebimento e gerenciamento de emails",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -22,6 +128,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["POST", "GET", "DELETE"],
     allow_headers=["*"],
+    expose_headers=["Idempotent-Replayed", "ETag"],
+)
+
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.gzip_minimum_size,
+    compresslevel=settings.gzip_compress_level,
+    exclude_path=rf"^{settings.api_v1_str}/emails/\d+/file$"
 )
 
 app.include_router(
@@ -35,3 +149,15 @@ app.include_router(
 def health_check():
     """Endpoint de liveness simples para verificação de saúde do serviço."""
     return {"status": "ok"}
+
+
+@app.get("/metrics/http-cache")
+def http_cache_metrics_report():
+    """Métricas do cache HTTP deste processo: taxa de 304 e bytes economizados."""
+    return http_cache_metrics.snapshot()
+
+
+@app.get("/metrics/blob-store")
+def blob_store_metrics_report():
+    """Métricas de gravação do blob store deste processo: deduplicação e amplificação de escrita."""
+    return blob_store.snapshot()
@@ -0,0 +1,177 @@
+"""
+Servidor opcional com múltiplos processos (pré-fork).
+
+A imagem padrão roda um único processo uvicorn (`fastapi run`); este
+supervisor é usado só quando configurado (ver o README), já que o ganho de
+vários workers depende dos núcleos disponíveis e deve ser medido no
+ambiente de implantação.
+
+O processo pai prepara o banco (tabelas e partições) e carrega
+os recursos compartilhados uma única vez, abre o socket e só então cria os
+workers com fork: eles herdam o que já foi carregado por copy-on-write.
+Cada worker descarta o pool de conexões e o cliente HTTP herdados e roda seu
+próprio servidor uvicorn no socket compartilhado. Workers que caem são
+recriados.
+
+Uso:
+    python server.py --workers 4 --port 8000
+"""
+import argparse
+import os
+import random
+import signal
+import socket
+import sys
+import time
+import traceback
+from typing import Dict, Optional
+
+import uvicorn
+
+from app.core.config import settings
+
+
+class PreforkServer:
+    """Supervisor que cria e mantém os processos workers."""
+
+    # Um worker que cai antes deste tempo conta como falha de inicialização
+    STARTUP_GRACE_SECONDS = 10
+    MAX_STARTUP_FAILURES = 5
+
+    def __init__(self, host: str, port: int, workers: int, log_level: str = "info"):
+        """Inicializa o supervisor."""
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.log_level = log_level
+        self.sock: Optional[socket.socket] = None
+        self.children: Dict[int, float] = {}
+        self.stopping = False
+        self.startup_failures = 0
+
+    def run(self) -> int:
+        """
+        Carrega a aplicação, cria os workers e os supervisiona até o encerramento.
+
+        Returns:
+            Código de saída do processo
+        """
+        if self.workers > 1 and settings.events_backend == "memory":
+            # Clientes de /events só receberiam os eventos do worker em que estão conectados
+            print("Erro: EVENTS_BACKEND=memory exige um único worker; use EVENTS_BACKEND=postgres ou --workers 1")
+            return 1
+
+        import main
+
+        main.preload()
+        # Conexões abertas durante o preload não podem ser compartilhadas com os workers
+        main.db_manager.engine.dispose()
+
+        self.sock = self._create_socket()
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+
+        print(f"Servidor ouvindo em {self.host}:{self.port} com {self.workers} worker(s)")
+        for _ in range(self.workers):
+            self._spawn_worker(main.app)
+
+        return self._supervise(main.app)
+
+    def _create_socket(self) -> socket.socket:
+        """Abre o socket de escuta compartilhado pelos workers."""
+        family = socket.AF_INET6 if ":" in self.host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def _spawn_worker(self, app) -> None:
+        """Cria um worker com fork."""
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                self._run_worker(app)
+            except BaseException:
+                traceback.print_exc()
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        self.children[pid] = time.monotonic()
+
+    def _run_worker(self, app) -> None:
+        """Reinicializa o estado herdado e roda o uvicorn no processo filho."""
+        from app.core.database import db_manager
+        from app.integrations.ai import reset_openai_client
+
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+        db_manager.reset_after_fork()
+        reset_openai_client()
+        # Evita que todos os workers sorteiem os mesmos atrasos de retentativa
+        random.seed()
+
+        config = uvicorn.Config(app, log_level=self.log_level, proxy_headers=True)
+        uvicorn.Server(config).run(sockets=[self.sock])
+
+    def _handle_stop(self, signum, frame) -> None:
+        """Encerra os workers de forma graciosa."""
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                # SIGTERM repetido é seguro no uvicorn (SIGINT repetido força a saída)
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _supervise(self, app) -> int:
+        """Aguarda os workers, recriando os que caírem."""
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+
+            started_at = self.children.pop(pid, None)
+            if self.stopping or started_at is None:
+                continue
+
+            exit_code = os.waitstatus_to_exitcode(status)
+            print(f"Worker {pid} encerrou (código {exit_code}); criando outro")
+            if time.monotonic() - started_at < self.STARTUP_GRACE_SECONDS:
+                self.startup_failures += 1
+                if self.startup_failures >= self.MAX_STARTUP_FAILURES:
+                    print("Workers falhando na inicialização; encerrando o servidor")
+                    self._handle_stop(signal.SIGTERM, None)
+                    continue
+                time.sleep(1)
+            else:
+                self.startup_failures = 0
+            self._spawn_worker(app)
+
+        return 1 if self.startup_failures >= self.MAX_STARTUP_FAILURES else 0
+
+
+def main(argv=None) -> int:
+    """Ponto de entrada da linha de comando."""
+    parser = argparse.ArgumentParser(description="Servidor multiprocesso da API de emails.")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"), help="Endereço de escuta")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8000")), help="Porta de escuta")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=settings.web_concurrency or os.cpu_count() or 1,
+        help="Quantidade de processos (padrão: WEB_CONCURRENCY ou núcleos disponíveis)"
+    )
+    parser.add_argument("--log-level", default="info", help="Nível de log do uvicorn")
+    args = parser.parse_args(argv)
+
+    server = PreforkServer(args.host, args.port, max(1, args.workers), log_level=args.log_level)
+    return server.run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
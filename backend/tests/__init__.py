@@ -0,0 +1,17 @@
+"""Testes do backend.
+
+Executar a partir de `backend/` com `python -m unittest discover -s tests -t .`
+(ou `pytest`). As variáveis obrigatórias de configuração recebem valores de
+teste quando não estão definidas; nenhum teste acessa a rede ou a OpenAI.
+"""
+import os
+
+for _name, _value in {
+    "APP_NAME": "Email Classifier (testes)",
+    "APP_VERSION": "0.0.0",
+    "DEBUG": "false",
+    "API_V1_STR": "/api/v1",
+    "DATABASE_URL": "sqlite://",
+    "OPENAI_API_KEY": "test-key",
+}.items():
+    os.environ.setdefault(_name, _value)
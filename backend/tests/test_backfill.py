@@ -0,0 +1,94 @@
+"""Testes da gravação do backfill quando linhas são excluídas durante a reclassificação."""
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from types import SimpleNamespace
+from unittest import mock
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.models.email import EmailSubmission
+from app.repositories.email_repository import EmailRepository
+from app.services.backfill_service import BackfillService
+
+
+def make_repository():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    for submission_id in (1, 2, 3):
+        db.add(EmailSubmission(
+            id=submission_id,
+            email_title=f"Email {submission_id}",
+            message="O sistema deu erro ao gerar o relatório",
+            type="Texto puro",
+            ai_classification="INDEFINIDO",
+            ai_suggested_reply="",
+            created_at=datetime(2026, 1, 1)
+        ))
+    db.commit()
+    return EmailRepository(db)
+
+
+def update(submission_id, classification="PRODUTIVO"):
+    return {"id": submission_id, "ai_classification": classification, "ai_suggested_reply": "Vamos analisar"}
+
+
+class BulkUpdateAiResultsTest(unittest.TestCase):
+    def setUp(self):
+        self.repository = make_repository()
+
+    def test_returns_only_rows_that_still_exist(self):
+        self.repository.db.query(EmailSubmission).filter(EmailSubmission.id == 2).delete()
+        self.repository.db.commit()
+
+        updated_ids = self.repository.bulk_update_ai_results([update(1), update(2), update(3)])
+
+        self.assertEqual(updated_ids, [1, 3])
+        self.assertEqual(self.repository.get_by_id(3).ai_classification, "PRODUTIVO")
+
+    def test_stores_the_canonical_classification(self):
+        self.repository.bulk_update_ai_results([update(1, " produtivo ")])
+
+        self.assertEqual(self.repository.get_by_id(1).ai_classification, "PRODUTIVO")
+
+
+class FakeIntegration:
+    def __init__(self, repository):
+        self.repository = repository
+        self.remembered = []
+
+    def classify_email(self, content, exclude_example_id=None):
+        if exclude_example_id == 2:
+            # A linha é excluída enquanto a IA a classifica
+            self.repository.db.query(EmailSubmission).filter(EmailSubmission.id == 2).delete()
+            self.repository.db.commit()
+        return {"classification": "PRODUTIVO", "suggested_reply": "Vamos analisar"}
+
+    def remember_example(self, submission_id, *args):
+        self.remembered.append(submission_id)
+
+
+class ProcessRowsTest(unittest.TestCase):
+    def test_deleted_rows_are_neither_failures_nor_published(self):
+        repository = make_repository()
+        integration = FakeIntegration(repository)
+        service = BackfillService(repository, lambda: integration, checkpoint_path="unused", requests_per_minute=0)
+        rows = repository.get_backfill_chunk(after_id=0, limit=10)
+        checkpoint = {"updated": 0}
+
+        with mock.patch("app.services.backfill_service.notify_workers") as notify:
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                failed_ids = service._process_rows(executor, rows, checkpoint)
+
+        self.assertEqual(failed_ids, [])
+        self.assertEqual(checkpoint["updated"], 2)
+        self.assertEqual(integration.remembered, [1, 3])
+        notify.assert_any_call("submission.updated", {"ids": [1, 3]})
+
+
+if __name__ == "__main__":
+    unittest.main()
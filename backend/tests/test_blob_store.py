@@ -0,0 +1,42 @@
+"""Testes da remoção de arquivos do blob store conferindo as referências."""
+import tempfile
+import unittest
+
+from app.utils.blob_store import BlobStore
+
+
+class DeleteUnreferencedTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = BlobStore(self.directory.name, fsync=False)
+        self.sha256 = self.store.put(b"conteudo do arquivo").sha256
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_removes_file_without_references(self):
+        self.assertTrue(self.store.delete_unreferenced(self.sha256, lambda sha256: False))
+        self.assertFalse(self.store.exists(self.sha256))
+        self.assertEqual(self.store.snapshot()["deleted"], 1)
+
+    def test_keeps_file_still_referenced(self):
+        self.assertFalse(self.store.delete_unreferenced(self.sha256, lambda sha256: True))
+        self.assertTrue(self.store.exists(self.sha256))
+
+    def test_restores_file_referenced_by_a_concurrent_upload(self):
+        # A segunda conferência vê a submissão gravada enquanto o arquivo era removido
+        answers = iter([False, True])
+
+        self.assertFalse(self.store.delete_unreferenced(self.sha256, lambda sha256: next(answers)))
+        self.assertTrue(self.store.exists(self.sha256))
+        with open(self.store.path(self.sha256), "rb") as f:
+            self.assertEqual(f.read(), b"conteudo do arquivo")
+
+    def test_missing_file_is_not_an_error(self):
+        self.store.delete_unreferenced(self.sha256, lambda sha256: False)
+
+        self.assertFalse(self.store.delete_unreferenced(self.sha256, lambda sha256: False))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,29 @@
+"""Testes da listagem de submissões do repositório."""
+import unittest
+from datetime import datetime
+
+from app.models.email import EmailSubmission
+from tests.test_backfill import make_repository
+
+
+class GetAllOrderTest(unittest.TestCase):
+    def test_lists_newest_first_with_id_as_tiebreaker(self):
+        repository = make_repository()
+        repository.db.add(EmailSubmission(
+            id=4,
+            email_title="Email 4",
+            message="Mensagem mais recente",
+            type="Texto puro",
+            ai_classification="PRODUTIVO",
+            ai_suggested_reply="",
+            created_at=datetime(2026, 2, 1)
+        ))
+        repository.db.commit()
+
+        submissions = repository.get_all(skip=0, limit=3, summary=True)
+
+        self.assertEqual([submission.id for submission in submissions], [4, 3, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+"""Testes do broker de eventos e da escolha do backend de eventos."""
+import asyncio
+import json
+import unittest
+
+from app.core.config import Settings
+from app.core.events import EventBroker
+
+
+class EventsBackendSettingTest(unittest.TestCase):
+    def test_defaults_to_postgres_with_postgres_database(self):
+        settings = Settings(DATABASE_URL="postgresql+psycopg2://user@localhost/db")
+
+        self.assertEqual(settings.events_backend, "postgres")
+
+    def test_defaults_to_memory_with_other_databases(self):
+        self.assertEqual(Settings(DATABASE_URL="sqlite://").events_backend, "memory")
+
+    def test_explicit_value_wins(self):
+        settings = Settings(DATABASE_URL="postgresql+psycopg2://user@localhost/db", EVENTS_BACKEND="memory")
+
+        self.assertEqual(settings.events_backend, "memory")
+
+
+class EventBrokerDispatchTest(unittest.TestCase):
+    def test_frame_uses_the_published_type(self):
+        async def scenario():
+            broker = EventBroker()
+            queue = broker._subscribe()
+            await broker.publish("stats.delta", {"total": 1})
+            return queue.get_nowait()
+
+        frame = asyncio.run(scenario())
+
+        event_line, data_line, _, _ = frame.split("\n")
+        self.assertEqual(event_line, "event: stats.delta")
+        self.assertEqual(json.loads(data_line.removeprefix("data: ")), {"type": "stats.delta", "data": {"total": 1}})
+
+    def test_full_queue_receives_resync(self):
+        async def scenario():
+            broker = EventBroker(queue_size=1)
+            queue = broker._subscribe()
+            await broker.publish("submission.deleted", {"ids": [1]})
+            await broker.publish("submission.deleted", {"ids": [2]})
+            return queue.get_nowait()
+
+        self.assertTrue(asyncio.run(scenario()).startswith("event: resync\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
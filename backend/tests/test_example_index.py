@@ -0,0 +1,169 @@
+"""Testes do índice de exemplos few-shot: conferência com o banco, limite e sincronização."""
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from app.integrations.example_index import ExampleIndex
+
+
+class ExampleIndexReconcileTest(unittest.TestCase):
+    def setUp(self):
+        self.index = ExampleIndex()
+        self.index.add(1, "sistem erro ajud", "O sistema deu erro", "PRODUTIVO", "Vamos analisar")
+        self.index.add(2, "sistem obrig", "Obrigado, o sistema voltou", "IMPRODUTIVO", "Nenhuma ação necessária")
+        self.index.add(3, "sistem lent", "O sistema está lento", "PRODUTIVO", "Vamos verificar")
+
+    def search(self):
+        return self.index.search("sistem", k=10, token_budget=1000)
+
+    @staticmethod
+    def row(classification, reply):
+        return SimpleNamespace(ai_classification=classification, ai_suggested_reply=reply)
+
+    def test_drops_deleted_and_unlabeled_rows_from_results_and_index(self):
+        current = {1: self.row("PRODUTIVO", "Vamos analisar"), 3: self.row("", "Classificação pendente")}
+
+        examples = self.index.reconcile(self.search(), current)
+
+        self.assertEqual([example["id"] for example in examples], [1])
+        self.assertEqual(len(self.index), 1)
+        self.assertEqual([example["id"] for example in self.search()], [1])
+
+    def test_uses_and_stores_current_label_of_relabeled_rows(self):
+        current = {
+            1: self.row("IMPRODUTIVO", "Nenhuma ação necessária"),
+            2: self.row("IMPRODUTIVO", "Nenhuma ação necessária"),
+            3: self.row("PRODUTIVO", "Vamos verificar")
+        }
+
+        examples = {example["id"]: example for example in self.index.reconcile(self.search(), current)}
+
+        self.assertEqual(examples[1]["classification"], "IMPRODUTIVO")
+        self.assertEqual(examples[1]["reply"], "Nenhuma ação necessária")
+        stored = {example["id"]: example for example in self.search()}
+        self.assertEqual(stored[1]["classification"], "IMPRODUTIVO")
+        self.assertEqual(len(self.index), 3)
+
+
+class ExampleIndexLimitTest(unittest.TestCase):
+    def test_evicts_oldest_examples_of_the_label_over_the_limit(self):
+        index = ExampleIndex(max_per_label=2)
+        for example_id in (1, 2, 3):
+            index.add(example_id, "sistem", "email", "PRODUTIVO", "resposta")
+        index.add(4, "sistem", "email", "IMPRODUTIVO", "resposta")
+
+        ids = {example["id"] for example in index.search("sistem", k=10, token_budget=1000)}
+
+        self.assertEqual(ids, {2, 3, 4})
+
+    def test_relabeled_example_counts_for_the_new_label(self):
+        index = ExampleIndex(max_per_label=1)
+        index.add(1, "sistem", "email", "PRODUTIVO", "resposta")
+        index.add(2, "sistem", "email", "IMPRODUTIVO", "resposta")
+        row = SimpleNamespace(ai_classification="IMPRODUTIVO", ai_suggested_reply="resposta")
+
+        index.reconcile(index.search("sistem", k=10, token_budget=1000), {1: row, 2: row})
+
+        self.assertEqual(len(index), 1)
+
+
+class FakeRepository:
+    """Submissões rotuladas em memória, com a interface usada pela sincronização."""
+
+    def __init__(self, rows):
+        self.rows = {row.id: row for row in rows}
+
+    def iter_labeled_examples(self, after_id=0, batch_size=1000):
+        return [self.rows[row_id] for row_id in sorted(self.rows) if row_id > after_id]
+
+    def get_labeled_examples(self, ids):
+        return [self.rows[row_id] for row_id in sorted(ids) if row_id in self.rows]
+
+
+def labeled(row_id, classification="PRODUTIVO", created_at=None):
+    return SimpleNamespace(
+        id=row_id,
+        message=f"sistema {row_id}",
+        ai_classification=classification,
+        ai_suggested_reply="ok",
+        created_at=created_at
+    )
+
+
+def preprocess_many(texts):
+    return ["sistem" for _ in texts]
+
+
+class ExampleIndexSyncTest(unittest.TestCase):
+    def test_remembered_example_does_not_skip_lower_ids(self):
+        index = ExampleIndex()
+        # Outro worker criou a 4 enquanto este indexava a 5 ao classificá-la
+        index.add(5, "sistem", "email", "PRODUTIVO", "ok")
+
+        index.sync_from_repository(FakeRepository([labeled(4), labeled(5)]), preprocess_many)
+
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.max_id, 5)
+
+    def test_events_mark_ids_reindexed_by_the_next_sync(self):
+        index = ExampleIndex()
+        repository = FakeRepository([labeled(1), labeled(2)])
+        index.sync_from_repository(repository, preprocess_many)
+        repository.rows[1] = labeled(1, "IMPRODUTIVO")
+        del repository.rows[2]
+
+        index.handle_event("submission.updated", json.dumps({"type": "submission.updated", "data": {"ids": [1, 2]}}))
+        index.sync_from_repository(repository, preprocess_many)
+
+        examples = index.search("sistem", k=10, token_budget=1000)
+        self.assertEqual([(example["id"], example["classification"]) for example in examples], [(1, "IMPRODUTIVO")])
+
+    def test_deleted_event_removes_ids(self):
+        index = ExampleIndex()
+        index.add(1, "sistem", "email", "PRODUTIVO", "ok")
+
+        index.handle_event("submission.deleted", json.dumps({"type": "submission.deleted", "data": {"ids": [1]}}))
+
+        self.assertEqual(len(index), 0)
+
+
+class ExampleIndexRetentionTest(unittest.TestCase):
+    def setUp(self):
+        self.index = ExampleIndex()
+        self.index.add(1, "sistem", "email", "PRODUTIVO", "ok", datetime(2025, 12, 31, 23, 0, tzinfo=timezone.utc))
+        self.index.add(2, "sistem", "email", "PRODUTIVO", "ok", datetime(2026, 1, 1))
+        self.index.add(3, "sistem", "email", "PRODUTIVO", "ok")
+
+    def ids(self, index):
+        return sorted(example["id"] for example in index.search("sistem", k=10, token_budget=1000))
+
+    def test_removes_examples_created_before_the_removed_partitions(self):
+        removed = self.index.remove_created_before(datetime(2026, 1, 1, tzinfo=timezone.utc))
+
+        self.assertEqual(removed, 1)
+        self.assertEqual(self.ids(self.index), [2, 3])
+
+    def test_resync_event_carries_the_range_to_other_workers(self):
+        payload = json.dumps({"type": "resync", "data": {"created_before": "2026-01-01T00:00:00+00:00"}})
+
+        self.index.handle_event("resync", payload)
+
+        self.assertEqual(self.ids(self.index), [2, 3])
+
+    def test_snapshot_keeps_creation_dates(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "index.json")
+            self.index.save(path)
+            loaded = ExampleIndex()
+            loaded.load(path)
+
+        loaded.remove_created_before(datetime(2026, 1, 1, 1, tzinfo=timezone.utc))
+
+        self.assertEqual(self.ids(loaded), [3])
+
+
+if __name__ == "__main__":
+    unittest.main()
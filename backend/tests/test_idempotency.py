@@ -0,0 +1,155 @@
+"""Testes do serviço de idempotência: cancelamento, concessão e espera entre workers."""
+import asyncio
+import json
+import threading
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api.v1.emails import _run_idempotent
+from app.models.idempotency import IdempotencyKey
+from app.repositories.idempotency_repository import IdempotencyRepository
+from app.schemas.email import EmailSubmissionResponse
+from app.services.idempotency_service import IdempotencyService
+
+
+class IdempotencyServiceTest(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        IdempotencyKey.__table__.create(engine)
+        self.Session = sessionmaker(bind=engine)
+        self.addCleanup(engine.dispose)
+
+    def service(self):
+        session = self.Session()
+        self.addCleanup(session.close)
+        return IdempotencyService(IdempotencyRepository(session))
+
+    def test_cancelled_request_releases_key_and_duplicate_runs_it(self):
+        calls = []
+
+        async def scenario():
+            first_started = asyncio.Event()
+
+            async def slow_operation():
+                calls.append("slow")
+                first_started.set()
+                await asyncio.sleep(10)
+                return 201, '{"id": 1}'
+
+            async def operation():
+                calls.append("retry")
+                return 201, '{"id": 2}'
+
+            original = asyncio.create_task(self.service().run("k", "f", slow_operation))
+            await first_started.wait()
+            duplicate = asyncio.create_task(self.service().run("k", "f", operation))
+            await asyncio.sleep(0)
+            original.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await original
+            return await asyncio.wait_for(duplicate, timeout=2)
+
+        status_code, body, replayed = asyncio.run(scenario())
+
+        self.assertEqual((status_code, body, replayed), (201, '{"id": 2}', False))
+        self.assertEqual(calls, ["slow", "retry"])
+        record = IdempotencyRepository(self.Session()).get("k")
+        self.assertEqual(record.status, IdempotencyRepository.COMPLETED)
+
+    def test_abandoned_processing_key_is_taken_over(self):
+        past = datetime.now(timezone.utc) - timedelta(seconds=1)
+        IdempotencyRepository(self.Session()).reserve("k", "f", past + timedelta(hours=1), locked_until=past)
+
+        async def operation():
+            return 201, '{"id": 3}'
+
+        result = asyncio.run(self.service().run("k", "f", operation))
+
+        self.assertEqual(result, (201, '{"id": 3}', False))
+
+    def test_take_over_happens_only_once(self):
+        past = datetime.now(timezone.utc) - timedelta(seconds=1)
+        repository = IdempotencyRepository(self.Session())
+        _, record = repository.reserve("k", "f", past + timedelta(hours=1), locked_until=past)
+        previous = record.locked_until
+        future = datetime.now(timezone.utc) + timedelta(minutes=5)
+
+        self.assertTrue(IdempotencyRepository(self.Session()).take_over("k", previous, future))
+        self.assertFalse(IdempotencyRepository(self.Session()).take_over("k", previous, future))
+
+    def test_waiting_for_other_worker_polls_outside_event_loop(self):
+        future = datetime.now(timezone.utc) + timedelta(minutes=5)
+        IdempotencyRepository(self.Session()).reserve("k", "f", future, locked_until=future)
+        service = self.service()
+        loop_thread = threading.get_ident()
+        poll_threads = []
+        original_get = service.idempotency_repository.get
+
+        def get(key):
+            poll_threads.append(threading.get_ident())
+            if len(poll_threads) == 3:
+                IdempotencyRepository(self.Session()).complete("k", 201, '{"id": 4}')
+            return original_get(key)
+
+        async def operation():
+            raise AssertionError("a operação não deve rodar de novo")
+
+        async def scenario():
+            nonlocal loop_thread
+            loop_thread = threading.get_ident()
+            with mock.patch.object(service.idempotency_repository, "get", side_effect=get), \
+                    mock.patch.object(IdempotencyService, "POLL_INTERVAL_SECONDS", 0.01):
+                return await service.run("k", "f", operation)
+
+        result = asyncio.run(scenario())
+
+        self.assertEqual(result, (201, '{"id": 4}', True))
+        # A primeira leitura é a da reserva que falhou; as demais são as consultas periódicas
+        self.assertEqual(len(poll_threads), 3)
+        self.assertNotIn(loop_thread, poll_threads[1:])
+
+
+class RunIdempotentResponseTest(unittest.TestCase):
+    def test_first_response_and_replay_send_the_stored_json(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        IdempotencyKey.__table__.create(engine)
+        self.addCleanup(engine.dispose)
+        submission = EmailSubmissionResponse(
+            id=1,
+            email_title="Relatório",
+            message="O relatório está em anexo, ação necessária",
+            type="Texto puro",
+            ai_classification="PRODUTIVO",
+            ai_suggested_reply="Vamos analisar",
+            created_at=datetime(2026, 1, 1, tzinfo=timezone.utc)
+        )
+        calls = []
+
+        async def submit():
+            calls.append(1)
+            return submission
+
+        async def scenario():
+            first = await _run_idempotent(sessionmaker(bind=engine)(), "k", "f", submit)
+            replay = await _run_idempotent(sessionmaker(bind=engine)(), "k", "f", submit)
+            return first, replay
+
+        first, replay = asyncio.run(scenario())
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(first.body, replay.body)
+        self.assertEqual(json.loads(first.body), submission.model_dump(mode="json"))
+        self.assertEqual(replay.headers["Idempotent-Replayed"], "true")
+        self.assertEqual(replay.headers["content-type"], "application/json")
+        stored = IdempotencyRepository(sessionmaker(bind=engine)()).get("k").response_body
+        self.assertEqual(stored.encode("utf-8"), first.body)
+
+
+if __name__ == "__main__":
+    unittest.main()
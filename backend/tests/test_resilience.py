@@ -0,0 +1,282 @@
+"""
+Testes da camada de resiliência contra um servidor HTTP local que imita a API
+de chat da OpenAI, com latência e erros injetados.
+"""
+import asyncio
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import openai
+from openai import OpenAI
+
+from app.integrations.ai import OpenAIIntegration
+from app.integrations.resilience import (
+    AdaptiveConcurrencyLimiter,
+    CircuitBreaker,
+    CircuitOpenError,
+    LLMUnavailableError,
+    ResilientCaller
+)
+from app.services.email_service import EmailService
+from tests.test_streaming import FakeEmailRepository
+
+
+class FakeChatServer:
+    """
+    Servidor local de /v1/chat/completions.
+
+    `responses` é uma fila de (status HTTP, atraso em segundos); quando vazia,
+    responde 200 sem atraso. `on_request` é chamado antes de cada resposta.
+    """
+
+    def __init__(self):
+        self.responses = []
+        self.requests = 0
+        self.on_request = None
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with server._lock:
+                    server.requests += 1
+                    status, delay = server.responses.pop(0) if server.responses else (200, 0)
+                if server.on_request:
+                    server.on_request()
+                time.sleep(delay)
+                if status == 200:
+                    body = {
+                        "id": "chatcmpl-test",
+                        "object": "chat.completion",
+                        "created": 0,
+                        "model": "gpt-4",
+                        "choices": [{
+                            "index": 0,
+                            "finish_reason": "stop",
+                            "message": {"role": "assistant", "content": '{"classification": "Produtivo", "suggested_reply": "Ok"}'}
+                        }]
+                    }
+                else:
+                    body = {"error": {"message": f"erro {status}", "type": "server_error"}}
+                payload = json.dumps(body).encode("utf-8")
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class ResilientCallerTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeChatServer()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        self.client = OpenAI(api_key="test-key", base_url=self.server.base_url, max_retries=0)
+        self.addCleanup(self.client.close)
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout_seconds=0.2)
+        self.limiter = AdaptiveConcurrencyLimiter(initial_limit=4, min_limit=1, max_limit=8, latency_target_seconds=5)
+        self.caller = ResilientCaller(
+            self.limiter,
+            self.breaker,
+            max_attempts=3,
+            timeout_seconds=2,
+            backoff_base_seconds=0.01,
+            backoff_max_seconds=0.02
+        )
+
+    def complete(self):
+        return self.caller.call(lambda timeout: self.client.chat.completions.create(
+            model="gpt-4",
+            messages=[{"role": "user", "content": "oi"}],
+            timeout=timeout
+        ))
+
+    def test_retries_count_as_a_single_breaker_failure(self):
+        self.server.responses = [(500, 0)] * 3
+
+        with self.assertRaises(LLMUnavailableError):
+            self.complete()
+
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(self.breaker.failures, 1)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_retry_succeeds_after_transient_errors(self):
+        self.server.responses = [(503, 0), (429, 0)]
+
+        response = self.complete()
+
+        self.assertEqual(response.choices[0].message.content, '{"classification": "Produtivo", "suggested_reply": "Ok"}')
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(self.breaker.failures, 0)
+        self.assertLess(self.limiter.limit, 4)
+
+    def test_breaker_opens_after_threshold_of_failed_calls(self):
+        self.server.responses = [(500, 0)] * 6
+
+        for _ in range(2):
+            with self.assertRaises(LLMUnavailableError):
+                self.complete()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+        requests_before = self.server.requests
+        with self.assertRaises(CircuitOpenError):
+            self.complete()
+        self.assertEqual(self.server.requests, requests_before)
+
+    def test_stops_retrying_when_breaker_opens_during_the_call(self):
+        self.server.responses = [(500, 0)] * 3
+        # Simula outras chamadas concorrentes abrindo o circuito durante a primeira tentativa
+        self.server.on_request = lambda: (self.breaker.record_failure(), self.breaker.record_failure())
+
+        with self.assertRaises(LLMUnavailableError):
+            self.complete()
+
+        self.assertEqual(self.server.requests, 1)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    def test_half_open_probe_is_not_retried_and_reopens_on_failure(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        time.sleep(0.25)
+        self.server.responses = [(500, 0)] * 3
+
+        with self.assertRaises(LLMUnavailableError):
+            self.complete()
+
+        self.assertEqual(self.server.requests, 1)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    def test_half_open_probe_closes_on_success(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        time.sleep(0.25)
+
+        self.complete()
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(self.breaker.failures, 0)
+
+    def test_probe_without_limiter_slot_is_released(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        time.sleep(0.25)
+        self.limiter.in_flight = int(self.limiter.limit)
+        self.caller.timeout_seconds = 0.05
+
+        with self.assertRaises(LLMUnavailableError):
+            self.complete()
+
+        self.limiter.in_flight = 0
+        self.caller.timeout_seconds = 2
+        self.complete()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_client_errors_leave_the_breaker_unchanged(self):
+        self.server.responses = [(500, 0)] * 3 + [(400, 0), (422, 0)]
+        with self.assertRaises(LLMUnavailableError):
+            self.complete()
+
+        for error in (openai.BadRequestError, openai.UnprocessableEntityError):
+            with self.assertRaises(error):
+                self.complete()
+
+        self.assertEqual(self.breaker.failures, 1)
+        self.assertEqual(self.server.requests, 5)
+
+    def test_auth_and_configuration_errors_count_as_failures(self):
+        self.server.responses = [(401, 0), (404, 0)]
+
+        with self.assertRaises(openai.AuthenticationError):
+            self.complete()
+        with self.assertRaises(openai.NotFoundError):
+            self.complete()
+
+        self.assertEqual(self.server.requests, 2)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    def test_half_open_probe_with_client_error_is_released(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        time.sleep(0.25)
+        self.server.responses = [(400, 0)]
+
+        with self.assertRaises(openai.BadRequestError):
+            self.complete()
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.complete()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_slow_responses_time_out_within_deadline(self):
+        self.server.responses = [(200, 1.0)] * 3
+        self.caller.timeout_seconds = 0.3
+
+        started_at = time.monotonic()
+        with self.assertRaises(LLMUnavailableError):
+            self.complete()
+
+        self.assertLess(time.monotonic() - started_at, 1.0)
+        self.assertEqual(self.breaker.failures, 1)
+        self.assertLess(self.limiter.limit, 4)
+
+
+class ClassifyOffEventLoopTest(unittest.TestCase):
+    def test_submit_text_email_does_not_block_event_loop(self):
+        integration = mock.Mock(spec=OpenAIIntegration)
+
+        def slow_classify(text, exclude_example_id=None):
+            time.sleep(0.3)
+            return {"classification": "PRODUTIVO", "suggested_reply": "Ok"}
+
+        integration.classify_email.side_effect = slow_classify
+        service = EmailService(FakeEmailRepository(), integration)
+
+        async def scenario():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            task = asyncio.create_task(ticker())
+            response = await service.submit_text_email("Suporte", "Preciso de ajuda com o sistema")
+            task.cancel()
+            return response, ticks
+
+        response, ticks = asyncio.run(scenario())
+
+        self.assertEqual(response.ai_classification, "PRODUTIVO")
+        self.assertGreater(ticks, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
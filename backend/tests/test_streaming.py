@@ -0,0 +1,195 @@
+"""Testes da classificação em streaming e do parser JSON incremental."""
+import asyncio
+import json
+import threading
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+from unittest import mock
+
+from app.integrations.ai import OpenAIIntegration
+from app.repositories.email_repository import EmailRepository
+from app.services.email_service import EmailService
+from app.utils.json_stream import IncrementalJsonParser
+
+
+class FakeStreamingCompletion:
+    """
+    Resposta de chat em streaming simulada.
+
+    Envia a classificação no primeiro chunk e só libera o restante da resposta
+    depois que `release` é sinalizado (ou após `timeout`), registrando quando
+    a resposta terminou de ser gerada.
+    """
+
+    def __init__(self, text: str, first_chunk_size: int, timeout: float = 5.0):
+        self.text = text
+        self.first_chunk_size = first_chunk_size
+        self.timeout = timeout
+        self.release = threading.Event()
+        self.finished = threading.Event()
+
+    def create(self, stream=False, **kwargs):
+        assert stream, "a variante em streaming deve pedir stream=True"
+
+        def chunks():
+            yield self._chunk(self.text[:self.first_chunk_size])
+            self.release.wait(self.timeout)
+            for start in range(self.first_chunk_size, len(self.text), 8):
+                yield self._chunk(self.text[start:start + 8])
+            self.finished.set()
+
+        return chunks()
+
+    @staticmethod
+    def _chunk(content: str):
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+
+class FakeEmailRepository(EmailRepository):
+    """Repositório em memória que só implementa a gravação usada pelo streaming."""
+
+    def __init__(self):
+        super().__init__(db=None)
+        self.created = []
+
+    def create(self, email_data, ai_data):
+        row = SimpleNamespace(
+            id=len(self.created) + 1,
+            email_title=email_data.email_title,
+            message=email_data.content,
+            type=email_data.type,
+            ai_classification=ai_data["classification"],
+            ai_suggested_reply=ai_data["suggested_reply"],
+            extracted_text=None,
+            file_sha256=None,
+            created_at=datetime.now()
+        )
+        self.created.append(row)
+        return row
+
+
+class StreamingTimeToFirstByteTest(unittest.TestCase):
+    """O primeiro evento deve sair antes de a IA terminar de gerar a resposta."""
+
+    def setUp(self):
+        self.response_text = json.dumps({
+            "classification": "Produtivo",
+            "suggested_reply": "Recebemos sua solicitação e retornaremos em breve com uma solução."
+        }, ensure_ascii=False)
+        first_chunk_size = self.response_text.index(",") + 1
+        self.completion = FakeStreamingCompletion(self.response_text, first_chunk_size)
+
+        patcher = mock.patch.object(
+            OpenAIIntegration, "_preprocess_text", staticmethod(lambda text, advanced_preprocessing=False: text.lower())
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.integration = OpenAIIntegration()
+        self.integration.client = SimpleNamespace(chat=SimpleNamespace(completions=self.completion))
+        self.integration.remember_example = lambda *args: None
+
+    def test_integration_emits_classification_before_completion_ends(self):
+        events = self.integration.stream_classify_email("Preciso de ajuda com o sistema")
+
+        first = next(events)
+        self.assertEqual(first, {"event": "classification", "classification": "PRODUTIVO"})
+        self.assertFalse(self.completion.finished.is_set())
+
+        self.completion.release.set()
+        rest = list(events)
+        self.assertTrue(self.completion.finished.is_set())
+        self.assertEqual(rest[-1]["event"], "result")
+        self.assertEqual(
+            "".join(event["text"] for event in rest if event["event"] == "reply_delta"),
+            rest[-1]["suggested_reply"]
+        )
+
+    def test_service_yields_first_event_before_completion_ends(self):
+        repository = FakeEmailRepository()
+        service = EmailService(repository, self.integration)
+
+        async def consume():
+            received = []
+            async for event in service.stream_text_email("Suporte", "Preciso de ajuda com o sistema"):
+                if not received:
+                    self.assertFalse(self.completion.finished.is_set())
+                    self.assertEqual(repository.created, [])
+                    self.completion.release.set()
+                received.append(event)
+            return received
+
+        received = asyncio.run(asyncio.wait_for(consume(), timeout=self.completion.timeout / 2))
+
+        self.assertEqual(received[0]["event"], "classification")
+        self.assertEqual(received[-1]["event"], "submission")
+        self.assertEqual(received[-1]["submission"]["ai_classification"], "PRODUTIVO")
+        self.assertEqual(len(repository.created), 1)
+
+
+class IncrementalJsonParserTest(unittest.TestCase):
+    """O parser deve aceitar o mesmo que `json.loads` para objetos."""
+
+    def feed_in_chunks(self, text, size):
+        parser = IncrementalJsonParser()
+        for start in range(0, len(text), size):
+            parser.feed(text[start:start + size])
+        return parser.close()
+
+    def test_matches_json_loads_for_any_chunking(self):
+        text = ' {"classification": "Produtivo", "suggested_reply": "Olá\\n\\"equipe\\" \\u00e9 \\ud83d\\ude00", "score": 0.5, "ok": true} \n'
+        for size in (1, 2, 3, 7, len(text)):
+            self.assertEqual(self.feed_in_chunks(text, size), json.loads(text))
+
+    def test_rejects_text_before_object(self):
+        for text in ('```json\n{"classification": "Produtivo"}\n```', 'Resposta: {"classification": "Produtivo"}'):
+            with self.assertRaises(ValueError):
+                json.loads(text)
+            with self.assertRaises(ValueError):
+                self.feed_in_chunks(text, 4)
+
+    def test_rejects_text_after_object(self):
+        with self.assertRaises(ValueError):
+            self.feed_in_chunks('{"classification": "Produtivo"} obrigado', 4)
+
+    def test_nested_values_are_decoded_whole(self):
+        text = '{"classification": "PRODUTIVO", "confidence": {"score": 0.9, "motivos": ["prazo", "a}b\\"]"]}, "tags": [[1], []], "suggested_reply": "Ok"}'
+        for size in (1, 3, len(text)):
+            with self.subTest(size=size):
+                self.assertEqual(self.feed_in_chunks(text, size), json.loads(text))
+
+    def test_nested_values_do_not_emit_partial_events(self):
+        parser = IncrementalJsonParser()
+        events = parser.feed('{"confidence": {"score": 0.9}, "suggested_reply": "Ok"}')
+
+        self.assertEqual(
+            events,
+            [("value", "confidence", {"score": 0.9}), ("value_delta", "suggested_reply", "Ok"), ("value", "suggested_reply", "Ok")]
+        )
+
+    def test_rejects_what_json_loads_rejects(self):
+        for text in (
+            '{"suggested_reply": "linha\nquebrada"}',
+            '{"chave\t": 1}',
+            '{"confidence": {"score": }}',
+            '{"tags": [1, 2}',
+        ):
+            with self.subTest(text=text):
+                with self.assertRaises(ValueError):
+                    json.loads(text)
+                with self.assertRaises(ValueError):
+                    self.feed_in_chunks(text, 2)
+
+    def test_unparseable_stream_falls_back_to_error_response(self):
+        with mock.patch.object(OpenAIIntegration, "_preprocess_text", staticmethod(lambda text, advanced_preprocessing=False: text)):
+            integration = OpenAIIntegration()
+            completion = FakeStreamingCompletion('Claro! {"classification": "Produtivo"}', first_chunk_size=8, timeout=0)
+            integration.client = SimpleNamespace(chat=SimpleNamespace(completions=completion))
+            events = list(integration.stream_classify_email("Preciso de ajuda"))
+
+        self.assertEqual(events[-1], {"event": "result", **OpenAIIntegration._parse_error_response()})
+
+
+if __name__ == "__main__":
+    unittest.main()
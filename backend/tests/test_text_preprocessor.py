@@ -0,0 +1,63 @@
+"""Testes de equivalência do tokenizador rápido com o `word_tokenize` do NLTK."""
+import random
+import unittest
+
+from nltk.tokenize import NLTKWordTokenizer
+
+from app.utils.text_preprocessor import TextPreprocessor
+
+# Pedaços combinados aleatoriamente: palavras, pontuação que o NLTK separa (ou
+# não), aspas, travessões, reticências, números com ":"/"," e clíticos
+PIECES = [
+    "ação", "fim", "vem", "depois", "é", "olá", "x", "s", "t", "ll", "n",
+    " ", " ", " ", "\t", "\n", "...", "..", "…", "—", "–", "-", "--",
+    "'", "''", '"', "`", "``", ",", ":", ";", "!", "?", "(", ")", "[", "]",
+    "{", "}", "<", ">", "«", "»", "“", "”", "‘", "’", "„", "@", "#", "$",
+    "%", "&", "*", "/", "+", "=", "_", "|", "1", "2.5", "10:30", "3,5",
+    "'s", "n't", "'ll", "'re", "'m", "'d", "cannot", "gonna", "wanna",
+    "gimme", "'tis", "d'ye", "more'n", "d'água",
+]
+
+
+class TokenizeEquivalenceTest(unittest.TestCase):
+    reference = NLTKWordTokenizer()
+
+    def expected(self, text):
+        # `word_tokenize` aplica este tokenizador a cada sentença; os textos
+        # abaixo têm uma sentença só
+        return [token for token in self.reference.tokenize(text) if token.isalpha()]
+
+    def test_matches_nltk_on_known_cases(self):
+        cases = [
+            "espera...depois vem",
+            "texto—travessão",
+            "texto – travessão",
+            "fim…depois",
+            "Olá, tudo bem? Segue (anexo) o relatório: reunião às 10:30, custo 3,5.",
+            "Ele disse \"obrigado\" e «até logo».",
+            "Caixa d'água e 'aspas simples' no fim'",
+            "I can't go, it's John's cannot gonna wanna 'tis",
+            "fim's'",
+            "x--y [nota] {chave} <tag> a@b #1 $5 50% R&D *ênfase*",
+            "Fim da frase.'",
+        ]
+        for text in cases:
+            with self.subTest(text=text):
+                self.assertEqual(TextPreprocessor.tokenize(text), self.expected(text))
+
+    def test_reviewed_cases_keep_both_words(self):
+        self.assertEqual(TextPreprocessor.tokenize("espera...depois vem"), ["espera", "depois", "vem"])
+        self.assertEqual(TextPreprocessor.tokenize("texto—travessão"), ["texto", "travessão"])
+
+    def test_matches_nltk_on_random_texts(self):
+        rng = random.Random(0)
+        for _ in range(5000):
+            text = "".join(rng.choice(PIECES) for _ in range(rng.randint(1, 8)))
+            if rng.random() < 0.3:
+                text += rng.choice([".", ".'", '."', ".)", ". "])
+            with self.subTest(text=text):
+                self.assertEqual(TextPreprocessor.tokenize(text), self.expected(text))
+
+
+if __name__ == "__main__":
+    unittest.main()
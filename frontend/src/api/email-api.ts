@@ -4,21 +4,32 @@ export class EmailApi  {
     this.baseUrl = import.meta.env.VITE_API_BASE_URL;
   }
 
-  async getEmails(skip: number, limit: number) : Promise<EmailResponse> {
-    const response = await fetch(`${this.baseUrl}/emails/?skip=${skip}&limit=${limit}`);
-    return response.json();
-  }
-
-  async searchEmails(skip: number, limit: number, email_title: string) : Promise<EmailResponse> {
+  async getEmails(skip: number, limit: number, filters: EmailFilters = {}) : Promise<EmailResponse> {
     const params = new URLSearchParams({
       skip: skip.toString(),
       limit: limit.toString(),
-      email_title: email_title
+      view: 'summary'
     });
+    if (filters.email_title) {
+      params.append('email_title', filters.email_title);
+    }
+    filters.ai_classification?.forEach(value => params.append('ai_classification', value));
+    filters.type?.forEach(value => params.append('type', value));
+    if (filters.created_from) {
+      params.append('created_from', filters.created_from);
+    }
+    if (filters.created_to) {
+      params.append('created_to', filters.created_to);
+    }
+
     const response = await fetch(`${this.baseUrl}/emails/?${params}`);
     return response.json();
   }
 
+  async searchEmails(skip: number, limit: number, email_title: string) : Promise<EmailResponse> {
+    return this.getEmails(skip, limit, { email_title });
+  }
+
   async deleteEmails(ids: number[]): Promise<DeleteEmailsResponse> {
     const response = await fetch(`${this.baseUrl}/emails/`, {
       method: 'DELETE',
@@ -69,6 +80,88 @@ export class EmailApi  {
     return response.json();
   }
 
+  async createEmailTextStream(email_title: string, content: string, handlers: SubmissionStreamHandlers): Promise<EmailSubmissionResponse> {
+    const response = await fetch(`${this.baseUrl}/emails/text/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({ email_title, content })
+    });
+
+    return this.readSubmissionStream(response, handlers);
+  }
+
+  async createEmailFileStream(email_title: string, file: File, handlers: SubmissionStreamHandlers): Promise<EmailSubmissionResponse> {
+    const formData = new FormData();
+    formData.append('email_title', email_title);
+    formData.append('file', file);
+
+    const response = await fetch(`${this.baseUrl}/emails/file/stream`, {
+      method: 'POST',
+      body: formData
+    });
+
+    return this.readSubmissionStream(response, handlers);
+  }
+
+  private async readSubmissionStream(response: Response, handlers: SubmissionStreamHandlers): Promise<EmailSubmissionResponse> {
+    if (!response.ok || !response.body) {
+      const errorData = await response.json().catch(() => ({ detail: 'Erro desconhecido' }));
+      throw new Error(errorData.detail || `HTTP error! status: ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let boundary = buffer.indexOf('\n\n');
+      while (boundary !== -1) {
+        const frame = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        boundary = buffer.indexOf('\n\n');
+
+        const data = frame.split('\n').find(line => line.startsWith('data: '));
+        if (!data) continue;
+
+        const event = JSON.parse(data.slice('data: '.length));
+        switch (event.event) {
+          case 'classification':
+            handlers.onClassification?.(event.classification);
+            break;
+          case 'reply_delta':
+            handlers.onReplyDelta?.(event.text);
+            break;
+          case 'submission':
+            return event.submission;
+          case 'error':
+            throw new Error(event.detail);
+        }
+      }
+    }
+
+    throw new Error('Conexão encerrada antes do fim do processamento');
+  }
+
+  async getEmail(id: number): Promise<EmailSubmissionResponse> {
+    const response = await fetch(`${this.baseUrl}/emails/${id}`);
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    return response.json();
+  }
+
+  getEmailFileUrl(id: number): string {
+    return `${this.baseUrl}/emails/${id}/file`;
+  }
+
   async getEmailStats(): Promise<EmailStatsResponse> {
     const response = await fetch(`${this.baseUrl}/emails/stats`);
     
@@ -78,31 +171,93 @@ export class EmailApi  {
 
     return response.json();
   }
+
+  subscribeEvents(handlers: EmailEventHandlers): EventSource {
+    const source = new EventSource(`${this.baseUrl}/emails/events`);
+    const parse = (event: MessageEvent) => JSON.parse(event.data).data;
+
+    source.onopen = () => handlers.onOpen?.();
+    source.onerror = () => handlers.onError?.();
+    source.addEventListener('submission.created', (event) => handlers.onSubmissionCreated?.(parse(event as MessageEvent)));
+    source.addEventListener('submission.deleted', (event) => handlers.onSubmissionDeleted?.(parse(event as MessageEvent)));
+    source.addEventListener('submission.updated', (event) => handlers.onSubmissionUpdated?.(parse(event as MessageEvent)));
+    source.addEventListener('stats.delta', (event) => handlers.onStatsDelta?.(parse(event as MessageEvent)));
+    source.addEventListener('resync', () => handlers.onResync?.());
+
+    return source;
+  }
+}
+
+export interface SubmissionStreamHandlers {
+  onClassification?: (classification: string) => void;
+  onReplyDelta?: (text: string) => void;
+}
+
+export interface SubmissionCreatedEvent {
+  submission?: EmailSubmissionListItem;
+  id?: number;
+}
+
+export interface SubmissionDeletedEvent {
+  ids: number[];
+}
+
+export interface SubmissionUpdatedEvent {
+  ids: number[];
+}
+
+export interface EmailEventHandlers {
+  onOpen?: () => void;
+  onError?: () => void;
+  onSubmissionCreated?: (event: SubmissionCreatedEvent) => void;
+  onSubmissionDeleted?: (event: SubmissionDeletedEvent) => void;
+  onSubmissionUpdated?: (event: SubmissionUpdatedEvent) => void;
+  onStatsDelta?: (delta: EmailStatsResponse) => void;
+  onResync?: () => void;
 }
 
 export interface EmailResponse {
-  submissions: {
+  submissions: EmailSummary[];
+  total: number;
+  facets?: EmailFacets;
+}
+
+export interface EmailFilters {
+  email_title?: string;
+  ai_classification?: string[];
+  type?: string[];
+  created_from?: string;
+  created_to?: string;
+}
+
+export interface EmailFacets {
+  ai_classification: Record<string, number>;
+  type: Record<string, number>;
+}
+
+export interface EmailSummary {
   id: number;
   email_title: string;
-  message: string;
   type: string | "Texto puro" | "TXT" | "PDF";
   ai_classification: string;
-  ai_suggested_reply: string;
   created_at: string;
-  }[];
-  total: number;
 }
 
-export interface EmailSubmissionResponse {
+export interface EmailSubmissionListItem {
   id: number;
   email_title: string;
   message: string;
   type: string;
   ai_classification: string;
   ai_suggested_reply: string;
+  file_sha256?: string | null;
   created_at: string;
 }
 
+export interface EmailSubmissionResponse extends EmailSubmissionListItem {
+  extracted_text?: string | null;
+}
+
 export interface DeleteEmailsResponse {
   deleted_count: number;
   deleted_ids: number[];
@@ -0,0 +1,107 @@
+import React, { useEffect, useState } from 'react';
+import { Modal, Descriptions, Spin, Typography, Tag, message } from 'antd';
+import { EmailApi } from '../../api/email-api';
+import type { EmailSubmissionResponse } from '../../api/email-api';
+
+const { Paragraph, Text } = Typography;
+
+interface EmailDetailModalProps {
+  emailId: number | null;
+  onClose: () => void;
+}
+
+const emailApi = new EmailApi();
+
+const EmailDetailModal: React.FC<EmailDetailModalProps> = ({ emailId, onClose }) => {
+  const [loading, setLoading] = useState(false);
+  const [email, setEmail] = useState<EmailSubmissionResponse | null>(null);
+
+  useEffect(() => {
+    if (emailId === null) {
+      setEmail(null);
+      return;
+    }
+
+    let cancelled = false;
+    setLoading(true);
+    emailApi.getEmail(emailId)
+      .then(data => {
+        if (!cancelled) {
+          setEmail(data);
+        }
+      })
+      .catch(error => {
+        console.log(error);
+        if (!cancelled) {
+          message.error('Erro ao carregar email');
+          onClose();
+        }
+      })
+      .finally(() => {
+        if (!cancelled) {
+          setLoading(false);
+        }
+      });
+
+    return () => {
+      cancelled = true;
+    };
+  }, [emailId]);
+
+  const isFile = email?.type === 'PDF' || email?.type === 'TXT';
+
+  return (
+    <Modal
+      title={email?.email_title ?? 'Detalhes do email'}
+      open={emailId !== null}
+      onCancel={onClose}
+      footer={null}
+      width={720}
+    >
+      <Spin spinning={loading}>
+        {email && (
+          <Descriptions column={1} bordered size="small">
+            <Descriptions.Item label="Tipo">
+              <Tag>{email.type}</Tag>
+            </Descriptions.Item>
+            <Descriptions.Item label="Classificação IA">
+              {email.ai_classification || 'Não classificado'}
+            </Descriptions.Item>
+            <Descriptions.Item label={isFile ? 'Arquivo' : 'Conteúdo'}>
+              {isFile ? (
+                email.file_sha256 ? (
+                  <a href={emailApi.getEmailFileUrl(email.id)} download={email.message}>
+                    {email.message}
+                  </a>
+                ) : (
+                  <Text italic>{email.message}</Text>
+                )
+              ) : (
+                <Paragraph style={{ whiteSpace: 'pre-wrap', marginBottom: 0 }}>
+                  {email.message}
+                </Paragraph>
+              )}
+            </Descriptions.Item>
+            {isFile && email.extracted_text && (
+              <Descriptions.Item label="Texto Extraído">
+                <Paragraph style={{ whiteSpace: 'pre-wrap', marginBottom: 0 }} ellipsis={{ rows: 8, expandable: true }}>
+                  {email.extracted_text}
+                </Paragraph>
+              </Descriptions.Item>
+            )}
+            <Descriptions.Item label="Resposta Sugerida">
+              <Paragraph style={{ whiteSpace: 'pre-wrap', marginBottom: 0 }}>
+                {email.ai_suggested_reply || 'Nenhuma sugestão'}
+              </Paragraph>
+            </Descriptions.Item>
+            <Descriptions.Item label="Data de Criação">
+              {new Date(email.created_at).toLocaleString('pt-BR')}
+            </Descriptions.Item>
+          </Descriptions>
+        )}
+      </Spin>
+    </Modal>
+  );
+};
+
+export default EmailDetailModal;
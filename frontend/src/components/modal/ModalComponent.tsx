@@ -1,5 +1,5 @@
 import React, { useState } from 'react';
-import { Button, Modal, Form, Input, message, Upload, Space } from 'antd';
+import { Button, Modal, Form, Input, message, Upload, Space, Alert, Tag } from 'antd';
 import { PlusOutlined, InboxOutlined } from '@ant-design/icons';
 import type { UploadProps } from 'antd';
 import { EmailApi } from '../../api/email-api';
@@ -23,9 +23,21 @@ const ModalComponent: React.FC<ModalComponentProps> = ({ onEmailAdded }) => {
   const [submitType, setSubmitType] = useState<'text' | 'file'>('text');
   const [fileList, setFileList] = useState<File[]>([]);
   const [charCount, setCharCount] = useState(0);
+  const [streamClassification, setStreamClassification] = useState<string | null>(null);
+  const [streamReply, setStreamReply] = useState('');
 
   const emailApi = new EmailApi();
 
+  const streamHandlers = {
+    onClassification: (classification: string) => setStreamClassification(classification),
+    onReplyDelta: (text: string) => setStreamReply(prev => prev + text),
+  };
+
+  const resetStream = () => {
+    setStreamClassification(null);
+    setStreamReply('');
+  };
+
   const countCharsWithoutSpaces = (text: string) => {
     return text.replace(/\s/g, '').length;
   };
@@ -41,16 +53,18 @@ const ModalComponent: React.FC<ModalComponentProps> = ({ onEmailAdded }) => {
     setFileList([]);
     setSubmitType('text');
     setCharCount(0);
+    resetStream();
   };
 
   const handleOk = async () => {
     try {
       setConfirmLoading(true);
+      resetStream();
       
       if (submitType === 'text') {
         try {
           const values = await form.validateFields();
-          await emailApi.createEmailText(values.email_title, values.content);
+          await emailApi.createEmailTextStream(values.email_title, values.content, streamHandlers);
           message.success('Email processado com sucesso!');
         } catch (validationError: unknown) {
           if (validationError && typeof validationError === 'object' && 'errorFields' in validationError) {
@@ -80,7 +94,7 @@ const ModalComponent: React.FC<ModalComponentProps> = ({ onEmailAdded }) => {
             return;
           }
           
-          await emailApi.createEmailFile(values.email_title, file);
+          await emailApi.createEmailFileStream(values.email_title, file, streamHandlers);
           message.success('Arquivo processado com sucesso!');
         } catch (validationError: unknown) {
           if (validationError && typeof validationError === 'object' && 'errorFields' in validationError) {
@@ -118,6 +132,7 @@ const ModalComponent: React.FC<ModalComponentProps> = ({ onEmailAdded }) => {
 
   const handleCancel = () => {
     setOpen(false);
+    resetStream();
     form.resetFields();
     setFileList([]);
   };
@@ -275,6 +290,14 @@ const ModalComponent: React.FC<ModalComponentProps> = ({ onEmailAdded }) => {
               </Dragger>
             </Form.Item>
           )}
+
+          {confirmLoading && streamClassification && (
+            <Alert
+              type="info"
+              message={<Space>Classificação: <Tag color="processing">{streamClassification}</Tag></Space>}
+              description={streamReply || 'Gerando sugestão de resposta...'}
+            />
+          )}
         </Form>
       </Modal>
     </>
@@ -1,22 +1,22 @@
-import React, { useEffect, useState, useCallback } from 'react';
-import { Button, Flex, Table, Input, message, Card, Tag, Typography, Tooltip, Space, Statistic, Row, Col } from 'antd';
+import React, { useEffect, useState, useCallback, useRef } from 'react';
+import { Button, Flex, Table, Input, message, Card, Tag, Typography, Tooltip, Space, Statistic, Row, Col, Select, DatePicker } from 'antd';
 import { DeleteOutlined, SearchOutlined, MailOutlined, RobotOutlined, FileTextOutlined, FilePdfOutlined, ClockCircleOutlined, CheckCircleOutlined, ExclamationCircleOutlined } from '@ant-design/icons';
 import type { TableColumnsType } from 'antd';
 import ModalComponent from '../components/modal/ModalComponent';
+import EmailDetailModal from '../components/modal/EmailDetailModal';
 import { EmailApi } from '../api/email-api';
-import type { EmailStatsResponse } from '../api/email-api';
+import type { EmailFacets, EmailFilters, EmailStatsResponse, SubmissionCreatedEvent, SubmissionDeletedEvent, SubmissionUpdatedEvent } from '../api/email-api';
 import '../styles/MainPage.css';
 
 const { Search } = Input;
+const { RangePicker } = DatePicker;
 const { Title, Text } = Typography;
 
 interface EmailType {
   id: number;
   email_title: string;
-  message: string;
   type: string;
   ai_classification: string;
-  ai_suggested_reply: string;
   created_at: string;
   key?: number;
 }
@@ -81,31 +81,6 @@ const columns: TableColumnsType<EmailType> = [
     ),
     width: 200
   },
-  { 
-    title: <Space><FileTextOutlined />Conteúdo</Space>, 
-    dataIndex: 'message', 
-    sorter: (a, b) => a.message.localeCompare(b.message),
-    render: (text: string, record: EmailType) => {
-      if (record.type === 'PDF' || record.type === 'TXT') {
-        return (
-          <Tooltip title={`Arquivo: ${text}`}>
-            <Text type="secondary" italic>
-              {truncateText(text, 35)}
-            </Text>
-          </Tooltip>
-        );
-      }
-      
-      return (
-        <Tooltip title={text.length > 400 ? `${text.substring(0, 400)}...` : text}>
-          <Text>
-            {text.length > 50 ? `${text.substring(0, 50)}...` : text}
-          </Text>
-        </Tooltip>
-      );
-    },
-    width: 250
-  },
   { 
     title: <Space><FileTextOutlined />Tipo</Space>, 
     dataIndex: 'type', 
@@ -131,19 +106,6 @@ const columns: TableColumnsType<EmailType> = [
     ),
     width: 150
   },
-  { 
-    title: <Space><RobotOutlined />Resposta Sugerida</Space>, 
-    dataIndex: 'ai_suggested_reply', 
-    sorter: (a, b) => a.ai_suggested_reply.localeCompare(b.ai_suggested_reply),
-    render: (reply: string) => (
-      <Tooltip title={reply}>
-        <Text type="secondary" italic>
-          {truncateText(reply, 50) || 'Nenhuma sugestão'}
-        </Text>
-      </Tooltip>
-    ),
-    width: 300
-  },
   { 
     title: <Space><ClockCircleOutlined />Data de Criação</Space>, 
     dataIndex: 'created_at',
@@ -170,12 +132,34 @@ const columns: TableColumnsType<EmailType> = [
 
 const emailApi = new EmailApi();
 
+const CLASSIFICATION_OPTIONS = ['PRODUTIVO', 'IMPRODUTIVO', ''];
+const TYPE_OPTIONS = ['Texto puro', 'TXT', 'PDF'];
+
+const facetOptions = (values: string[], counts: Record<string, number>, emptyLabel: string) => {
+  const allValues = [...values, ...Object.keys(counts).filter(value => !values.includes(value))];
+  return allValues.map(value => ({
+    value,
+    label: `${value || emptyLabel} (${counts[value] ?? 0})`
+  }));
+};
+
+const isFiltered = (view: { searchText: string; filters: EmailFilters }) => (
+  view.searchText.trim() !== '' ||
+  !!view.filters.ai_classification?.length ||
+  !!view.filters.type?.length ||
+  !!view.filters.created_from ||
+  !!view.filters.created_to
+);
+
 const MainPage: React.FC = () => {
   const [selectedRowKeys, setSelectedRowKeys] = useState<React.Key[]>([]);
+  const [detailEmailId, setDetailEmailId] = useState<number | null>(null);
   const [loading, setLoading] = useState(false);
   const [dataSource, setDataSource] = useState<EmailType[]>([]);
   const [searchText, setSearchText] = useState('');
   const [searchTimeout, setSearchTimeout] = useState<ReturnType<typeof setTimeout> | null>(null);
+  const [filters, setFilters] = useState<EmailFilters>({});
+  const [facets, setFacets] = useState<EmailFacets>({ ai_classification: {}, type: {} });
   const [stats, setStats] = useState<EmailStatsResponse>({
     total: 0,
     produtivos: 0,
@@ -195,6 +179,16 @@ const MainPage: React.FC = () => {
       `${range[0]}-${range[1]} de ${total} itens`,
   });
 
+  const liveRef = useRef({ connected: false, hasConnected: false });
+  const viewRef = useRef({ current: 1, pageSize: 5, searchText: '', filters: {} as EmailFilters, visibleIds: [] as number[] });
+  viewRef.current = {
+    current: pagination.current,
+    pageSize: pagination.pageSize,
+    searchText,
+    filters,
+    visibleIds: dataSource.map(item => item.id)
+  };
+
   const fetchStats = async () => {
     try {
       const statsData = await emailApi.getEmailStats();
@@ -204,17 +198,19 @@ const MainPage: React.FC = () => {
     }
   };
 
-  const fetchData = async (page: number = 1, pageSize: number = 5, searchTitle: string = '') => {
+  const fetchData = async (
+    page: number = 1,
+    pageSize: number = 5,
+    searchTitle: string = '',
+    activeFilters: EmailFilters = viewRef.current.filters
+  ) => {
     setLoading(true);
     try {
       const skip = (page - 1) * pageSize;
-      let data;
-      
-      if (searchTitle.trim()) {
-        data = await emailApi.searchEmails(skip, pageSize, searchTitle);
-      } else {
-        data = await emailApi.getEmails(skip, pageSize);
-      }
+      const data = await emailApi.getEmails(skip, pageSize, {
+        ...activeFilters,
+        email_title: searchTitle.trim() || undefined
+      });
       
       const dataWithKeys = data.submissions.map((item: EmailType) => ({
         ...item,
@@ -222,6 +218,9 @@ const MainPage: React.FC = () => {
       }));
       
       setDataSource(dataWithKeys);
+      if (data.facets) {
+        setFacets(data.facets);
+      }
       setPagination(prev => ({
         ...prev,
         current: page,
@@ -236,7 +235,116 @@ const MainPage: React.FC = () => {
     }
   };
 
+  const refetchCurrentPage = () => {
+    const view = viewRef.current;
+    fetchData(view.current, view.pageSize, view.searchText);
+  };
+
+  const handleSubmissionCreated = (event: SubmissionCreatedEvent) => {
+    const submission = event.submission;
+    // A listagem começa pelas mais recentes: fora da primeira página, a nova
+    // submissão desloca os itens exibidos
+    if (!submission || isFiltered(viewRef.current) || viewRef.current.current !== 1) {
+      refetchCurrentPage();
+      return;
+    }
+
+    setDataSource(prev => {
+      if (prev.some(item => item.id === submission.id)) {
+        return prev;
+      }
+      const { id, email_title, type, ai_classification, created_at } = submission;
+      return [{ id, email_title, type, ai_classification, created_at, key: id }, ...prev].slice(0, viewRef.current.pageSize);
+    });
+    setPagination(prev => ({ ...prev, total: prev.total + 1 }));
+  };
+
+  const handleSubmissionDeleted = (event: SubmissionDeletedEvent) => {
+    if (isFiltered(viewRef.current)) {
+      refetchCurrentPage();
+      return;
+    }
+
+    const deletedIds = new Set(event.ids);
+    setSelectedRowKeys(prev => prev.filter(key => !deletedIds.has(Number(key))));
+    setPagination(prev => ({ ...prev, total: Math.max(prev.total - event.ids.length, 0) }));
+    if (viewRef.current.visibleIds.some(id => deletedIds.has(id))) {
+      refetchCurrentPage();
+    }
+  };
+
+  const handleSubmissionUpdated = (event: SubmissionUpdatedEvent) => {
+    const updatedIds = new Set(event.ids);
+    if (isFiltered(viewRef.current) || viewRef.current.visibleIds.some(id => updatedIds.has(id))) {
+      refetchCurrentPage();
+    }
+  };
+
+  const handleStatsDelta = (delta: EmailStatsResponse) => {
+    setStats(prev => ({
+      total: prev.total + delta.total,
+      produtivos: prev.produtivos + delta.produtivos,
+      improdutivos: prev.improdutivos + delta.improdutivos,
+      nao_classificados: prev.nao_classificados + delta.nao_classificados,
+      pdf: prev.pdf + delta.pdf,
+      txt: prev.txt + delta.txt,
+      texto_puro: prev.texto_puro + delta.texto_puro
+    }));
+
+    if (!isFiltered(viewRef.current)) {
+      // Sem filtros, as facetas coincidem com as estatísticas gerais
+      const addCounts = (counts: Record<string, number>, changes: Record<string, number>) => {
+        const next = { ...counts };
+        Object.entries(changes).forEach(([value, change]) => {
+          next[value] = Math.max((next[value] ?? 0) + change, 0);
+        });
+        return next;
+      };
+      setFacets(prev => ({
+        ai_classification: addCounts(prev.ai_classification, {
+          PRODUTIVO: delta.produtivos,
+          IMPRODUTIVO: delta.improdutivos,
+          '': delta.nao_classificados
+        }),
+        type: addCounts(prev.type, {
+          'Texto puro': delta.texto_puro,
+          TXT: delta.txt,
+          PDF: delta.pdf
+        })
+      }));
+    }
+  };
+
+  const handleResync = () => {
+    refetchCurrentPage();
+    fetchStats();
+  };
+
+  useEffect(() => {
+    const source = emailApi.subscribeEvents({
+      onOpen: () => {
+        if (liveRef.current.hasConnected) {
+          handleResync();
+        }
+        liveRef.current = { connected: true, hasConnected: true };
+      },
+      onError: () => {
+        liveRef.current = { ...liveRef.current, connected: false };
+      },
+      onSubmissionCreated: handleSubmissionCreated,
+      onSubmissionDeleted: handleSubmissionDeleted,
+      onSubmissionUpdated: handleSubmissionUpdated,
+      onStatsDelta: handleStatsDelta,
+      onResync: handleResync,
+    });
+
+    return () => source.close();
+  }, []);
+
   const handleEmailAdded = () => {
+    if (liveRef.current.connected) {
+      return;
+    }
     fetchData(pagination.current, pagination.pageSize, searchText);
     fetchStats();
   };
@@ -279,6 +387,13 @@ const MainPage: React.FC = () => {
     }
   };
 
+  const handleFiltersChange = (changes: Partial<EmailFilters>) => {
+    const nextFilters = { ...filters, ...changes };
+    setFilters(nextFilters);
+    setPagination(prev => ({ ...prev, current: 1 }));
+    fetchData(1, pagination.pageSize, searchText, nextFilters);
+  };
+
   const handleTableChange = (page: number, pageSize: number) => {
     fetchData(page, pageSize, searchText);
   };
@@ -317,11 +432,13 @@ const MainPage: React.FC = () => {
       
       if (pagination.current > 1 && pagination.total - result.deleted_count <= (pagination.current - 1) * pagination.pageSize) {
         handleTableChange(pagination.current - 1, pagination.pageSize);
-      } else {
+      } else if (!liveRef.current.connected) {
         fetchData(pagination.current, pagination.pageSize, searchText);
       }
       
-      fetchStats();
+      if (!liveRef.current.connected) {
+        fetchStats();
+      }
       
     } catch (error) {
       console.log(error)
@@ -433,16 +550,43 @@ const MainPage: React.FC = () => {
           )}
         </Flex>
         
-        <Search
-          placeholder="Pesquisar por título do email..."
-          allowClear
-          enterButton={<SearchOutlined />}
-          size="middle"
-          style={{ width: 300 }}
-          onSearch={handleSearch}
-          onChange={handleInputChange}
-          loading={loading}
-        />
+        <Flex align="center" gap="small" wrap>
+          <Select
+            mode="multiple"
+            allowClear
+            placeholder="Classificação"
+            style={{ minWidth: 200 }}
+            value={filters.ai_classification ?? []}
+            options={facetOptions(CLASSIFICATION_OPTIONS, facets.ai_classification, 'Não classificado')}
+            onChange={(values: string[]) => handleFiltersChange({ ai_classification: values.length ? values : undefined })}
+          />
+          <Select
+            mode="multiple"
+            allowClear
+            placeholder="Tipo"
+            style={{ minWidth: 160 }}
+            value={filters.type ?? []}
+            options={facetOptions(TYPE_OPTIONS, facets.type, '-')}
+            onChange={(values: string[]) => handleFiltersChange({ type: values.length ? values : undefined })}
+          />
+          <RangePicker
+            placeholder={['Criado de', 'até']}
+            onChange={(dates) => handleFiltersChange({
+              created_from: dates?.[0]?.startOf('day').toISOString(),
+              created_to: dates?.[1]?.add(1, 'day').startOf('day').toISOString()
+            })}
+          />
+          <Search
+            placeholder="Pesquisar por título do email..."
+            allowClear
+            enterButton={<SearchOutlined />}
+            size="middle"
+            style={{ width: 300 }}
+            onSearch={handleSearch}
+            onChange={handleInputChange}
+            loading={loading}
+          />
+        </Flex>
       </Flex>
       
       <Table<EmailType>  
@@ -455,7 +599,16 @@ const MainPage: React.FC = () => {
         columns={columns} 
         dataSource={dataSource}
         loading={loading}
-        scroll={{ x: 1200 }}
+        scroll={{ x: 800 }}
+        onRow={(record) => ({
+          onClick: (event) => {
+            if ((event.target as HTMLElement).closest('.ant-table-selection-column')) {
+              return;
+            }
+            setDetailEmailId(record.id);
+          },
+          style: { cursor: 'pointer' }
+        })}
         pagination={{
           ...pagination,
           onChange: handleTableChange,
@@ -475,7 +628,7 @@ const MainPage: React.FC = () => {
               </div>
               <div className="empty-state-subtitle">
                 <Text type="secondary">
-                  {searchText ? 'Tente ajustar sua pesquisa' : 'Adicione alguns emails para começar'}
+                  {isFiltered({ searchText, filters }) ? 'Tente ajustar sua pesquisa' : 'Adicione alguns emails para começar'}
                 </Text>
               </div>
             </div>
@@ -487,6 +640,8 @@ const MainPage: React.FC = () => {
       />
         </Flex>
       </Card>
+
+      <EmailDetailModal emailId={detailEmailId} onClose={() => setDetailEmailId(null)} />
     </div>
   );
 };